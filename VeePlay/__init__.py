@@ -7,7 +7,11 @@ from flask_mail import Mail
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 import boto3
+from botocore.config import Config as BotoConfig
+import os
 from datetime import timedelta
+from VeePlay.db_routing import RoutingSession, ReplicaRouter
+from VeePlay.main.metrics import TimedQueuePool, init_app as init_metrics
 
 bcrypt = Bcrypt()
 login_manager = LoginManager()
@@ -16,18 +20,33 @@ login_manager.login_message_category = "info"
 mail = Mail()
 cors = CORS()
 jwt = JWTManager()
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-        "pool_pre_ping": True,
-        "pool_recycle": 1800,
-    }
+    if app.config["METRICS_ENABLED"]:
+        # pool checkout waits are timed by the pool class itself
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+            "poolclass": TimedQueuePool,
+            **app.config["SQLALCHEMY_ENGINE_OPTIONS"],
+        }
     db.init_app(app)
+    with app.app_context():
+        app.replica_router = ReplicaRouter(
+            app,
+            (db.engines[key] for key in app.config["SQLALCHEMY_BINDS"]),
+            check_interval=app.config["DB_REPLICA_CHECK_INTERVAL"],
+            max_lag=app.config["DB_REPLICA_MAX_LAG"],
+        )
+        if app.config["METRICS_ENABLED"]:
+            init_metrics(
+                app,
+                db.engines.values(),
+                slow_request_ms=app.config["METRICS_SLOW_REQUEST_MS"],
+            )
     bcrypt.init_app(app)
     login_manager.init_app(app)
     mail.init_app(app)
@@ -35,12 +54,159 @@ def create_app():
     jwt.init_app(app)
     app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(days=7)
 
-    app.s3_client = boto3.client(
-        "s3",
+    aws = boto3.Session(
         aws_access_key_id=app.config["AWS_ACCESS_KEY_ID"],
         aws_secret_access_key=app.config["AWS_SECRET_ACCESS_KEY"],
         region_name=app.config["AWS_BUCKET_REGION"],
     )
+    app.s3_client = aws.client("s3", config=BotoConfig(signature_version="s3v4"))
+
+    from VeePlay.content.signing import SigV4Signer, Boto3Signer
+
+    app.s3_signer = Boto3Signer(app.s3_client, app.config["AWS_BUCKET_NAME"])
+    credentials = aws.get_credentials()
+    if app.config["PRESIGN_SIGNER"] == "local" and credentials is not None:
+        try:
+            app.s3_signer = SigV4Signer(
+                credentials,
+                app.config["AWS_BUCKET_NAME"],
+                app.config["AWS_BUCKET_REGION"],
+            )
+        except ValueError as e:
+            app.logger.warning("Presigning through boto3: %s", e)
+
+    from VeePlay.content.utils import PresignedUrlCache
+
+    app.presign_cache = PresignedUrlCache(
+        maxsize=app.config["PRESIGN_CACHE_SIZE"],
+        ttl=int(
+            app.config["PRESIGN_EXPIRES"] * app.config["PRESIGN_CACHE_REFRESH_RATIO"]
+        ),
+    )
+
+    from VeePlay.content.playback import (
+        PlaybackAuthorizer,
+        CloudFrontCookieSigner,
+        PlaybackTokenSigner,
+    )
+
+    app.playback = None
+    playback_auth = app.config["PLAYBACK_AUTH"]
+    if playback_auth != "presign":
+        if not app.config["PLAYBACK_BASE_URL"]:
+            raise ValueError(f"PLAYBACK_AUTH={playback_auth} needs PLAYBACK_BASE_URL")
+        if playback_auth == "cloudfront":
+            with open(app.config["CLOUDFRONT_PRIVATE_KEY_PATH"], "rb") as f:
+                playback_signer = CloudFrontCookieSigner(
+                    app.config["CLOUDFRONT_KEY_PAIR_ID"], f.read()
+                )
+        elif playback_auth == "token":
+            if not app.config["PLAYBACK_TOKEN_SECRET"]:
+                raise ValueError("PLAYBACK_AUTH=token needs PLAYBACK_TOKEN_SECRET")
+            playback_signer = PlaybackTokenSigner(app.config["PLAYBACK_TOKEN_SECRET"])
+        else:
+            raise ValueError(f"Unknown PLAYBACK_AUTH {playback_auth!r}")
+        app.playback = PlaybackAuthorizer(
+            playback_signer,
+            app.config["PLAYBACK_BASE_URL"],
+            ttl=app.config["PLAYBACK_TTL"],
+            refresh_ratio=app.config["PRESIGN_CACHE_REFRESH_RATIO"],
+        )
+
+    from VeePlay.content.catalog import Catalog
+
+    app.catalog = Catalog(
+        app,
+        ttl=app.config["CATALOG_TTL"],
+        check_interval=app.config["CATALOG_VERSION_CHECK_INTERVAL"],
+    )
+
+    from VeePlay.main.utils import ResponseCache
+
+    app.response_cache = ResponseCache(
+        maxsize=app.config["RESPONSE_CACHE_SIZE"],
+        ttl=app.config["RESPONSE_CACHE_TTL"],
+    )
+
+    from VeePlay.content.watch import WatchProgressBuffer
+
+    app.watch_buffer = WatchProgressBuffer(
+        app,
+        interval=app.config["WATCH_FLUSH_INTERVAL"],
+        max_pending=app.config["WATCH_FLUSH_SIZE"],
+        max_attempts=app.config["WATCH_FLUSH_MAX_ATTEMPTS"],
+    )
+
+    from VeePlay.users.hashing import PasswordHasher
+
+    app.password_hasher = PasswordHasher(
+        workers=app.config["PASSWORD_HASH_WORKERS"],
+        max_queue=app.config["PASSWORD_HASH_QUEUE"],
+        rounds=app.config["BCRYPT_LOG_ROUNDS"],
+        timeout=app.config["PASSWORD_HASH_TIMEOUT"],
+    )
+
+    from VeePlay.users.mailer import MailQueue
+
+    app.mail_queue = MailQueue(
+        app,
+        sender=app.config["MAIL_DEFAULT_SENDER"],
+        workers=app.config["MAIL_QUEUE_WORKERS"],
+        max_attempts=app.config["MAIL_MAX_ATTEMPTS"],
+        retry_backoff=app.config["MAIL_RETRY_BACKOFF"],
+        poll_interval=app.config["MAIL_OUTBOX_POLL"],
+    )
+
+    from VeePlay.users.identity import UserCache, RedisUserBackend
+
+    app.user_cache = UserCache(
+        maxsize=app.config["USER_CACHE_SIZE"],
+        ttl=app.config["USER_CACHE_TTL"],
+        backend=(
+            RedisUserBackend(
+                app.config["USER_CACHE_REDIS_URL"], ttl=app.config["USER_CACHE_TTL"]
+            )
+            if app.config["USER_CACHE_REDIS_URL"]
+            else None
+        ),
+    )
+
+    from VeePlay.users.tokens import UsedTokenStore
+
+    app.used_tokens = UsedTokenStore(
+        app,
+        bloom_bits=app.config["USED_TOKEN_BLOOM_BITS"],
+        purge_batch=app.config["USED_TOKEN_PURGE_BATCH"],
+        purge_interval=app.config["USED_TOKEN_PURGE_INTERVAL"],
+    )
+
+    from VeePlay.users.avatars import AvatarProcessor, LocalAvatarStore, S3AvatarStore
+
+    if app.config["AVATAR_STORAGE"] == "s3":
+        avatar_store = S3AvatarStore(
+            app.s3_client,
+            app.config["AWS_BUCKET_NAME"],
+            prefix=app.config["AVATAR_S3_PREFIX"],
+        )
+    else:
+        avatar_store = LocalAvatarStore(
+            os.path.join(app.root_path, "static", "profile_pics")
+        )
+    app.avatar_processor = AvatarProcessor(
+        app,
+        avatar_store,
+        staging_dir=app.config["AVATAR_STAGING_DIR"],
+        sizes=app.config["AVATAR_SIZES"],
+        formats=app.config["AVATAR_FORMATS"],
+        max_bytes=app.config["AVATAR_MAX_BYTES"],
+        max_pixels=app.config["AVATAR_MAX_PIXELS"],
+        workers=app.config["AVATAR_WORKERS"],
+        max_queue=app.config["AVATAR_QUEUE"],
+    )
+
+    from VeePlay.content.ingest import ingest_catalog
+
+    app.cli.add_command(ingest_catalog)
 
     from VeePlay.main.routes import main
     from VeePlay.users.routes import users
@@ -0,0 +1,229 @@
+import contextlib
+import hashlib
+import time
+from a2wsgi import WSGIMiddleware
+from flask_jwt_extended import decode_token
+from jwt import ExpiredSignatureError, InvalidTokenError
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response
+from starlette.routing import Mount, Route, request_response
+from VeePlay import create_app
+from VeePlay.content.queries import (
+    keyset_page,
+    split_page,
+    genre_select,
+    genre_facets_select,
+    continue_watching_select,
+)
+from VeePlay.content.routes import (
+    continue_watching_payload,
+    filter_payload,
+    genres_payload,
+    parse_filter_args,
+)
+from VeePlay.content.utils import parse_limit, parse_page_args
+from VeePlay.main.metrics import instrument_engine
+from VeePlay.main.utils import CachedResponse
+
+
+def async_database_url(uri):
+    """Map a psycopg2 URL to asyncpg, which takes ``ssl`` instead of ``sslmode``."""
+    url = make_url(uri).set(drivername="postgresql+asyncpg")
+    query = dict(url.query)
+    sslmode = query.pop("sslmode", None)
+    query.pop("channel_binding", None)
+    connect_args = {"ssl": sslmode} if sslmode and sslmode != "disable" else {}
+    return url.set(query=query), connect_args
+
+
+class AsyncContent:
+    """Async handlers for the content routes that wait on Postgres.
+
+    Everything else in the Flask app is served unchanged through the WSGI
+    bridge; the catalog snapshot routes never touch the database on the
+    request path, so they gain nothing from running on the event loop.
+    """
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.config = flask_app.config
+        self.engine = None
+
+    @contextlib.asynccontextmanager
+    async def lifespan(self, app):
+        url, connect_args = async_database_url(self.config["SQLALCHEMY_DATABASE_URI"])
+        self.engine = create_async_engine(
+            url,
+            connect_args=connect_args,
+            pool_size=self.config["ASYNC_DB_POOL_SIZE"],
+            max_overflow=self.config["ASYNC_DB_MAX_OVERFLOW"],
+            pool_recycle=1800,
+        )
+        if self.config["METRICS_ENABLED"]:
+            instrument_engine(self.engine.sync_engine)
+        # the first snapshot load is blocking; do it before taking traffic
+        await run_in_threadpool(self._load_catalog)
+        try:
+            yield
+        finally:
+            await self.engine.dispose()
+
+    def _load_catalog(self):
+        with self.flask_app.app_context():
+            self.flask_app.catalog.get()
+
+    def _load_user(self, user_id):
+        with self.flask_app.app_context():
+            return self.flask_app.user_cache.get(user_id)
+
+    async def _fetch(self, stmt):
+        async with self.engine.connect() as conn:
+            return (await conn.execute(stmt)).all()
+
+    def _json(self, payload, status=200):
+        return Response(
+            self.flask_app.json.dumps(payload),
+            status_code=status,
+            media_type="application/json",
+        )
+
+    def _page_args(self, request, default=None):
+        return parse_page_args(
+            request.query_params,
+            default or self.config["PAGE_SIZE"],
+            self.config["MAX_PAGE_SIZE"],
+        )
+
+    async def _cached(self, request, build):
+        # same keys, TTL and catalog versioning as main.utils.cached_response;
+        # these bodies hold no presigned URLs, so only the TTL bounds them.
+        # Both routes only speak JSON
+        cache = self.flask_app.response_cache
+        version = self.flask_app.catalog.get().version
+        key = (
+            request.url.path,
+            tuple(sorted(request.query_params.multi_items())),
+            False,
+        )
+        entry = cache.get(key, version)
+        if entry is None:
+            response = await build()
+            if response.status_code != 200:
+                return response
+            body = response.body
+            entry = CachedResponse(
+                body,
+                hashlib.blake2b(body, digest_size=16).hexdigest(),
+                response.media_type,
+                time.monotonic() + cache.ttl,
+                version,
+            )
+            cache.set(key, entry)
+        return self._conditional(request, entry)
+
+    def _conditional(self, request, entry):
+        etag = f'"{entry.etag}"'
+        tags = [
+            t.strip().removeprefix("W/")
+            for t in request.headers.get("if-none-match", "").split(",")
+        ]
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "public, max-age=%d"
+            % max(0, int(entry.expires_at - time.monotonic())),
+            "Vary": "Accept, Accept-Encoding",
+        }
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+        return Response(entry.body, media_type=entry.mimetype, headers=headers)
+
+    async def filter_by_genre(self, request):
+        async def build():
+            try:
+                genres, match_all = parse_filter_args(request.query_params)
+                limit, cursor = self._page_args(request)
+                stmt = keyset_page(genre_select(genres, match_all), limit, cursor)
+            except ValueError as e:
+                return self._json({"message": str(e)}, 400)
+            rows, next_cursor = split_page(await self._fetch(stmt), limit)
+            return self._json(filter_payload(rows, next_cursor))
+
+        return await self._cached(request, build)
+
+    async def genre_counts(self, request):
+        async def build():
+            return self._json(genres_payload(await self._fetch(genre_facets_select())))
+
+        return await self._cached(request, build)
+
+    async def continue_watching(self, request):
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme != "Bearer" or not token:
+            return self._json({"msg": "Missing Authorization Header"}, 401)
+        try:
+            with self.flask_app.app_context():
+                user_id = int(decode_token(token)["sub"])
+        except ExpiredSignatureError:
+            return self._json({"msg": "Token has expired"}, 401)
+        except (InvalidTokenError, KeyError, ValueError) as e:
+            return self._json({"msg": str(e)}, 422)
+        # the same check as @jwt_required: the token's user must still exist
+        if await run_in_threadpool(self._load_user, user_id) is None:
+            return self._json({"msg": f"Error loading the user {user_id}"}, 401)
+
+        try:
+            limit = parse_limit(
+                request.query_params,
+                self.config["CONTINUE_WATCHING_LIMIT"],
+                self.config["MAX_PAGE_SIZE"],
+            )
+        except ValueError as e:
+            return self._json({"message": str(e)}, 400)
+
+        history = await self._fetch(continue_watching_select(user_id, limit))
+        with self.flask_app.app_context():
+            payload = continue_watching_payload(history)
+        return self._json(payload)
+
+
+def _with_cors(handler):
+    # Flask-CORS only covers the routes still served by Flask
+    return CORSMiddleware(
+        request_response(handler),
+        allow_origins=["*"],
+        allow_methods=["GET"],
+        allow_headers=["*"],
+    )
+
+
+def create_asgi_app(flask_app=None):
+    """Wrap the Flask app for ASGI servers.
+
+    /filter, /genres and /continue-watching are answered on the event loop
+    with asyncpg; every other route goes through the WSGI bridge.
+    """
+    flask_app = flask_app or create_app()
+    handlers = AsyncContent(flask_app)
+    methods = ["GET", "HEAD", "OPTIONS"]
+    return Starlette(
+        routes=[
+            Route("/filter", _with_cors(handlers.filter_by_genre), methods=methods),
+            Route("/genres", _with_cors(handlers.genre_counts), methods=methods),
+            Route(
+                "/continue-watching",
+                _with_cors(handlers.continue_watching),
+                methods=methods,
+            ),
+            Mount(
+                "/",
+                app=WSGIMiddleware(
+                    flask_app, workers=flask_app.config["ASGI_WSGI_THREADS"]
+                ),
+            ),
+        ],
+        lifespan=handlers.lifespan,
+    )
@@ -7,6 +7,17 @@ load_dotenv()
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY")
     SQLALCHEMY_DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI")
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+    }
+    DB_REPLICA_URLS = [u for u in os.getenv("DB_REPLICA_URLS", "").split(",") if u]
+    SQLALCHEMY_BINDS = {f"replica{i}": url for i, url in enumerate(DB_REPLICA_URLS)}
+    DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", 10))
+    DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", 0))
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
     AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
     AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
@@ -17,3 +28,62 @@ class Config:
     MAIL_USE_SSL = True
     MAIL_USERNAME = os.getenv("MAIL_USER")
     MAIL_PASSWORD = os.getenv("MAIL_PASSWORD")
+    MAIL_DEFAULT_SENDER = os.getenv("MAIL_DEFAULT_SENDER", "noreply@gmail.com")
+    PRESIGN_EXPIRES = int(os.getenv("PRESIGN_EXPIRES", 3600))
+    PRESIGN_CACHE_SIZE = int(os.getenv("PRESIGN_CACHE_SIZE", 10000))
+    PRESIGN_CACHE_REFRESH_RATIO = float(os.getenv("PRESIGN_CACHE_REFRESH_RATIO", 0.5))
+    PRESIGN_SIGNER = os.getenv("PRESIGN_SIGNER", "local")
+    PLAYBACK_AUTH = os.getenv("PLAYBACK_AUTH", "presign")
+    PLAYBACK_BASE_URL = os.getenv("PLAYBACK_BASE_URL")
+    PLAYBACK_TTL = int(os.getenv("PLAYBACK_TTL", 14400))
+    PLAYBACK_TOKEN_SECRET = os.getenv("PLAYBACK_TOKEN_SECRET")
+    PLAYBACK_COOKIE_DOMAIN = os.getenv("PLAYBACK_COOKIE_DOMAIN")
+    CLOUDFRONT_KEY_PAIR_ID = os.getenv("CLOUDFRONT_KEY_PAIR_ID")
+    CLOUDFRONT_PRIVATE_KEY_PATH = os.getenv("CLOUDFRONT_PRIVATE_KEY_PATH")
+    PAGE_SIZE = int(os.getenv("PAGE_SIZE", 50))
+    MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 200))
+    CATALOG_TTL = int(os.getenv("CATALOG_TTL", 300))
+    CATALOG_VERSION_CHECK_INTERVAL = float(
+        os.getenv("CATALOG_VERSION_CHECK_INTERVAL", 5)
+    )
+    SEARCH_LIMIT = int(os.getenv("SEARCH_LIMIT", 20))
+    PLAYBACK_BATCH_SIZE = int(os.getenv("PLAYBACK_BATCH_SIZE", 200))
+    WATCH_FLUSH_INTERVAL = float(os.getenv("WATCH_FLUSH_INTERVAL", 5))
+    WATCH_FLUSH_SIZE = int(os.getenv("WATCH_FLUSH_SIZE", 500))
+    WATCH_FLUSH_MAX_ATTEMPTS = int(os.getenv("WATCH_FLUSH_MAX_ATTEMPTS", 3))
+    CONTINUE_WATCHING_LIMIT = int(os.getenv("CONTINUE_WATCHING_LIMIT", 10))
+    HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", 20))
+    RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 1000))
+    RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", 60))
+    BCRYPT_LOG_ROUNDS = int(os.getenv("BCRYPT_LOG_ROUNDS", 12))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", 4))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", 10))
+    MAIL_QUEUE_WORKERS = int(os.getenv("MAIL_QUEUE_WORKERS", 1))
+    MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", 5))
+    MAIL_RETRY_BACKOFF = int(os.getenv("MAIL_RETRY_BACKOFF", 30))
+    MAIL_OUTBOX_POLL = int(os.getenv("MAIL_OUTBOX_POLL", 30))
+    AVATAR_STORAGE = os.getenv("AVATAR_STORAGE", "local")
+    AVATAR_S3_PREFIX = os.getenv("AVATAR_S3_PREFIX", "profile_pics/")
+    AVATAR_STAGING_DIR = os.getenv("AVATAR_STAGING_DIR")
+    AVATAR_SIZES = [int(s) for s in os.getenv("AVATAR_SIZES", "64,125,256").split(",")]
+    AVATAR_FORMATS = os.getenv("AVATAR_FORMATS", "webp,jpeg").split(",")
+    AVATAR_MAX_BYTES = int(os.getenv("AVATAR_MAX_BYTES", 10 * 1024 * 1024))
+    # Werkzeug refuses larger bodies before spooling them: the avatar plus
+    # room for the other form fields and multipart framing
+    MAX_CONTENT_LENGTH = AVATAR_MAX_BYTES + 64 * 1024
+    AVATAR_MAX_PIXELS = int(os.getenv("AVATAR_MAX_PIXELS", 40_000_000))
+    AVATAR_WORKERS = int(os.getenv("AVATAR_WORKERS", 2))
+    AVATAR_QUEUE = int(os.getenv("AVATAR_QUEUE", 16))
+    RESET_TOKEN_MAX_AGE = int(os.getenv("RESET_TOKEN_MAX_AGE", 900))
+    USED_TOKEN_BLOOM_BITS = int(os.getenv("USED_TOKEN_BLOOM_BITS", 1 << 20))
+    USED_TOKEN_PURGE_BATCH = int(os.getenv("USED_TOKEN_PURGE_BATCH", 1000))
+    USED_TOKEN_PURGE_INTERVAL = int(os.getenv("USED_TOKEN_PURGE_INTERVAL", 3600))
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 30))
+    USER_CACHE_REDIS_URL = os.getenv("USER_CACHE_REDIS_URL")
+    ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", 20))
+    ASYNC_DB_MAX_OVERFLOW = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", 10))
+    ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", 10))
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_SLOW_REQUEST_MS = float(os.getenv("METRICS_SLOW_REQUEST_MS", 0))
@@ -0,0 +1,292 @@
+import bisect
+import itertools
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from VeePlay import db
+from VeePlay.db_routing import use_primary
+from VeePlay.models import CatalogVersion, Content, Season, Episode, Video
+from VeePlay.content.queries import catalog_query, cursor_id
+from VeePlay.content.utils import encode_cursor
+from VeePlay.content.search import SearchIndex
+
+VideoEntry = namedtuple("VideoEntry", "id s3_path thumbnail_path duration")
+EpisodeEntry = namedtuple(
+    "EpisodeEntry",
+    "id episode_no title description s3_path thumbnail_path duration season_id",
+)
+SeasonEntry = namedtuple("SeasonEntry", "id season_number content_id episodes")
+ContentEntry = namedtuple(
+    "ContentEntry",
+    "id name description type poster trailer genre seasons movie_video",
+)
+
+CATALOG_MODELS = (Content, Season, Episode, Video)
+
+
+def bump_catalog_version(connection):
+    """Increment the shared catalog version in ``connection``'s transaction."""
+    dialect = connection.dialect.name
+    insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+    stmt = insert(CatalogVersion).values(id=1, version=1)
+    connection.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[CatalogVersion.id],
+            set_={"version": CatalogVersion.version + 1},
+        )
+    )
+
+
+def read_catalog_version():
+    # catalog_version is not a replica table, so this reads the primary
+    return db.session.scalar(select(CatalogVersion.version)) or 0
+
+
+def _video_entry(video):
+    if video is None:
+        return None
+    return VideoEntry(video.id, video.s3_path, video.thumbnail_path, video.duration)
+
+
+def _content_entry(content):
+    seasons = tuple(
+        SeasonEntry(
+            season.id,
+            season.season_number,
+            season.content_id,
+            tuple(
+                EpisodeEntry(
+                    ep.id,
+                    ep.episode_no,
+                    ep.title,
+                    ep.description,
+                    ep.s3_path,
+                    ep.thumbnail_path,
+                    ep.duration,
+                    ep.season_id,
+                )
+                for ep in sorted(season.episodes, key=lambda e: (e.episode_no, e.id))
+            ),
+        )
+        for season in sorted(content.seasons, key=lambda s: (s.season_number, s.id))
+    )
+    return ContentEntry(
+        content.id,
+        content.name,
+        content.description,
+        content.type,
+        content.poster,
+        content.trailer,
+        tuple(content.genre or ()),
+        seasons,
+        _video_entry(content.movie_video),
+    )
+
+
+class _Listing:
+    __slots__ = ("entries", "ids")
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.ids = [e.id for e in entries]
+
+    def _start(self, cursor):
+        return bisect.bisect_right(self.ids, cursor_id(cursor)) if cursor else 0
+
+    def after(self, cursor=None, limit=None):
+        """Iterate entries past ``cursor`` without copying the listing."""
+        start = self._start(cursor)
+        stop = start + limit if limit is not None else None
+        return itertools.islice(self.entries, start, stop)
+
+    def page(self, limit, cursor=None):
+        start = self._start(cursor)
+        items = self.entries[start : start + limit]
+        if start + limit < len(self.entries):
+            return items, encode_cursor(items[-1].id)
+        return items, None
+
+
+class CatalogSnapshot:
+    """Read-only, fully indexed copy of the catalog.
+
+    Built once from the database and then shared by every request thread;
+    nothing in it is ever mutated after construction.
+    """
+
+    def __init__(self, contents, version=0):
+        self.version = version
+        contents = tuple(sorted(contents, key=lambda c: c.id))
+        by_id = {}
+        by_name = {}
+        episodes = {}
+        episodes_by_id = {}
+        for c in contents:
+            by_id[c.id] = c
+            by_name.setdefault((c.type, c.name), c)
+            for season in c.seasons:
+                for ep in season.episodes:
+                    episodes.setdefault((c.id, season.season_number, ep.episode_no), ep)
+                    episodes_by_id[ep.id] = (c, ep)
+
+        self.contents = _Listing(contents)
+        self.shows = _Listing(tuple(c for c in contents if c.type == "S"))
+        self.movies = _Listing(tuple(c for c in contents if c.type == "M"))
+        self.by_id = MappingProxyType(by_id)
+        self.by_name = MappingProxyType(by_name)
+        self.episodes = MappingProxyType(episodes)
+        # episode id -> (show, episode), for batch lookups
+        self.episodes_by_id = MappingProxyType(episodes_by_id)
+        self.search_index = SearchIndex(contents)
+        # pre-encoded JSON per (view, entity), see content.serializers
+        self.templates = {}
+
+    @classmethod
+    def load(cls, version=0):
+        return cls((_content_entry(c) for c in catalog_query().all()), version)
+
+    def get(self, content_type, name):
+        return self.by_name.get((content_type, name))
+
+    def episode(self, content_id, season_number, episode_no):
+        return self.episodes.get((content_id, season_number, episode_no))
+
+    def search(self, query, limit, cursor=None):
+        offset = cursor_id(cursor) if cursor else 0
+        items, has_more = self.search_index.search(query, limit, offset)
+        return items, encode_cursor(offset + limit) if has_more else None
+
+
+class Catalog:
+    """Holds the current CatalogSnapshot and swaps in new ones.
+
+    Readers always get the last complete snapshot without taking a lock.
+    After ``invalidate()`` (or once ``ttl`` seconds have passed) the next
+    reader starts a background rebuild and keeps serving the old snapshot
+    until the new one replaces it in a single reference assignment. Only
+    the very first load blocks.
+
+    Writes made by other processes are noticed through the
+    ``catalog_version`` row: every ``check_interval`` seconds a reader
+    starts a background check, which rebuilds if the row has moved since
+    the snapshot was loaded. ``check_interval=0`` leaves that to ``ttl``.
+    """
+
+    def __init__(self, app, ttl=300, check_interval=5):
+        self.app = app
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._built_at = 0.0
+        self._checked_at = 0.0
+        self._shared_version = None
+        self._generation = 0
+        self._built_generation = -1
+        self._builds = 0
+        self._build_lock = threading.Lock()
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._build_lock:
+                if self._snapshot is None:
+                    self._build()
+            return self._snapshot
+        if (self._is_stale() or self._check_due()) and self._build_lock.acquire(
+            blocking=False
+        ):
+            threading.Thread(target=self._background_build, daemon=True).start()
+        return snapshot
+
+    def invalidate(self):
+        self._generation += 1
+
+    def rebuild(self):
+        with self._build_lock:
+            self._build()
+        return self._snapshot
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version if snapshot else 0,
+            "contents": len(snapshot.contents.entries) if snapshot else 0,
+            "templates": len(snapshot.templates) if snapshot else 0,
+            "age": time.monotonic() - self._built_at if snapshot else 0.0,
+        }
+
+    def _is_stale(self):
+        if self._built_generation != self._generation:
+            return True
+        return self.ttl > 0 and time.monotonic() - self._built_at > self.ttl
+
+    def _check_due(self):
+        return (
+            self.check_interval > 0
+            and time.monotonic() - self._checked_at > self.check_interval
+        )
+
+    def _build(self):
+        generation = self._generation
+        self._builds += 1
+        # read first: a write committed during the load bumps it again
+        shared_version = read_catalog_version()
+        if generation != self._built_generation:
+            # rebuilding after a catalog write; a replica may not have it yet
+            with use_primary(db.session):
+                self._snapshot = CatalogSnapshot.load(self._builds)
+        else:
+            self._snapshot = CatalogSnapshot.load(self._builds)
+        self._built_at = self._checked_at = time.monotonic()
+        self._built_generation = generation
+        self._shared_version = shared_version
+
+    def _background_build(self):
+        # runs with _build_lock held by the reader that started it
+        try:
+            with self.app.app_context():
+                if not self._is_stale():
+                    self._checked_at = time.monotonic()
+                    if read_catalog_version() == self._shared_version:
+                        return
+                    # written elsewhere; a replica may not have it yet
+                    self.invalidate()
+                self._build()
+        except Exception:
+            self.app.logger.exception("Catalog snapshot rebuild failed")
+        finally:
+            self._build_lock.release()
+
+
+def get_catalog():
+    return current_app.catalog.get()
+
+
+@event.listens_for(Session, "after_flush")
+def _track_catalog_changes(session, flush_context):
+    if session.info.get("catalog_changed"):
+        return
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, CATALOG_MODELS):
+            session.info["catalog_changed"] = True
+            # commits with the write, so other processes rebuild too
+            bump_catalog_version(session.connection())
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_catalog_on_commit(session):
+    if session.info.pop("catalog_changed", False) and has_app_context():
+        catalog = getattr(current_app, "catalog", None)
+        if catalog is not None:
+            catalog.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_catalog_changes(session):
+    session.info.pop("catalog_changed", None)
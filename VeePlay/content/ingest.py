@@ -0,0 +1,368 @@
+import csv
+import io
+import json
+import time
+import click
+from flask.cli import with_appcontext
+from VeePlay import db
+
+# staging tables live for the session and are emptied by every commit;
+# row_no keeps manifest order so the last duplicate wins
+STAGING_DDL = """
+CREATE TEMP TABLE IF NOT EXISTS stage_content (
+    row_no bigserial, type varchar(1), name varchar(120), description text,
+    poster varchar(120), trailer varchar(120), genre varchar[],
+    video_s3_path varchar(200), video_thumbnail_path varchar(200),
+    video_duration integer
+) ON COMMIT DELETE ROWS;
+CREATE TEMP TABLE IF NOT EXISTS stage_episode (
+    row_no bigserial, content_type varchar(1), content_name varchar(120),
+    season_number integer, episode_no integer, title varchar(120),
+    description text, s3_path varchar(200), thumbnail_path varchar(200),
+    duration integer
+) ON COMMIT DELETE ROWS;
+"""
+
+COPY_CONTENT = """
+COPY stage_content (type, name, description, poster, trailer, genre,
+                    video_s3_path, video_thumbnail_path, video_duration)
+FROM STDIN WITH (FORMAT csv)
+"""
+COPY_EPISODE = """
+COPY stage_episode (content_type, content_name, season_number, episode_no,
+                    title, description, s3_path, thumbnail_path, duration)
+FROM STDIN WITH (FORMAT csv)
+"""
+
+# Upserts keyed on the natural keys; rows that did not change are skipped
+# so re-running a manifest leaves no dead tuples behind. DISTINCT ON folds
+# duplicates inside one batch, which ON CONFLICT DO UPDATE cannot take,
+# keeping the one that came last in the manifest. The batch's transaction
+# also bumps catalog_version so serving processes rebuild their snapshots.
+UPSERT_SQL = """
+INSERT INTO video (s3_path, thumbnail_path, duration)
+SELECT DISTINCT ON (video_s3_path)
+       video_s3_path, video_thumbnail_path, video_duration
+FROM stage_content WHERE video_s3_path IS NOT NULL
+ORDER BY video_s3_path, row_no DESC
+ON CONFLICT (s3_path) DO UPDATE
+   SET thumbnail_path = EXCLUDED.thumbnail_path, duration = EXCLUDED.duration
+ WHERE (video.thumbnail_path, video.duration)
+       IS DISTINCT FROM (EXCLUDED.thumbnail_path, EXCLUDED.duration);
+
+INSERT INTO content
+       (type, name, description, poster, trailer, genre, movie_video_id)
+SELECT DISTINCT ON (s.type, s.name)
+       s.type, s.name, s.description, s.poster, s.trailer, s.genre, v.id
+FROM stage_content s LEFT JOIN video v ON v.s3_path = s.video_s3_path
+ORDER BY s.type, s.name, s.row_no DESC
+ON CONFLICT (type, name) DO UPDATE
+   SET description = EXCLUDED.description, poster = EXCLUDED.poster,
+       trailer = EXCLUDED.trailer, genre = EXCLUDED.genre,
+       movie_video_id = EXCLUDED.movie_video_id
+ WHERE (content.description, content.poster, content.trailer, content.genre,
+        content.movie_video_id)
+       IS DISTINCT FROM (EXCLUDED.description, EXCLUDED.poster,
+        EXCLUDED.trailer, EXCLUDED.genre, EXCLUDED.movie_video_id);
+
+INSERT INTO season (content_id, season_number)
+SELECT DISTINCT c.id, e.season_number
+FROM stage_episode e
+JOIN content c ON c.type = e.content_type AND c.name = e.content_name
+ON CONFLICT (content_id, season_number) DO NOTHING;
+
+INSERT INTO episode
+       (season_id, episode_no, title, description, s3_path, thumbnail_path,
+        duration)
+SELECT DISTINCT ON (s.id, e.episode_no)
+       s.id, e.episode_no, e.title, e.description, e.s3_path,
+       e.thumbnail_path, e.duration
+FROM stage_episode e
+JOIN content c ON c.type = e.content_type AND c.name = e.content_name
+JOIN season s ON s.content_id = c.id AND s.season_number = e.season_number
+WHERE e.episode_no IS NOT NULL
+ORDER BY s.id, e.episode_no, e.row_no DESC
+ON CONFLICT (season_id, episode_no) DO UPDATE
+   SET title = EXCLUDED.title, description = EXCLUDED.description,
+       s3_path = EXCLUDED.s3_path, thumbnail_path = EXCLUDED.thumbnail_path,
+       duration = EXCLUDED.duration
+ WHERE (episode.title, episode.description, episode.s3_path,
+        episode.thumbnail_path, episode.duration)
+       IS DISTINCT FROM (EXCLUDED.title, EXCLUDED.description,
+        EXCLUDED.s3_path, EXCLUDED.thumbnail_path, EXCLUDED.duration);
+
+INSERT INTO catalog_version (id, version) VALUES (1, 1)
+ON CONFLICT (id) DO UPDATE SET version = catalog_version.version + 1;
+"""
+
+CONTENT_FIELDS = ("name", "description", "poster", "trailer")
+EPISODE_FIELDS = ("title", "description", "s3_path", "thumbnail_path", "duration")
+VIDEO_FIELDS = ("s3_path", "thumbnail_path")
+
+
+class ManifestError(ValueError):
+    def __init__(self, line, message):
+        super().__init__(f"line {line}: {message}")
+
+
+def _pg_array(values):
+    quoted = ('"' + v.replace("\\", "\\\\").replace('"', '\\"') + '"' for v in values)
+    return "{" + ",".join(quoted) + "}"
+
+
+def _genres(value):
+    if isinstance(value, str):
+        value = value.split("|")
+    # /filter matches lower-cased genre names
+    return [g.strip().lower() for g in value or () if g and g.strip()]
+
+
+def _require(record, fields, line, what):
+    missing = [f for f in fields if record.get(f) in (None, "")]
+    if missing:
+        raise ManifestError(line, f"{what} is missing {', '.join(missing)}")
+
+
+def _int(value, line, field):
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ManifestError(line, f"{field} must be an integer")
+
+
+def read_jsonl(stream):
+    """Yield ``(line, record)`` with one content record per line.
+
+    Shows carry ``seasons: [{season_number, episodes: [...]}]``, movies a
+    ``video: {s3_path, thumbnail_path, duration}`` object.
+    """
+    for line, raw in enumerate(stream, 1):
+        if raw.strip():
+            try:
+                yield line, json.loads(raw)
+            except ValueError as e:
+                raise ManifestError(line, f"invalid JSON ({e})")
+
+
+def read_csv(stream):
+    """Yield ``(line, record)`` from a flat CSV with one row per episode.
+
+    Consecutive rows with the same type and name are folded into one
+    record; movie rows use ``s3_path``/``thumbnail_path``/``duration`` for
+    the movie's video and leave the season columns empty. Genres are
+    ``|``-separated.
+    """
+    current = None
+    start = None
+    for line, row in enumerate(csv.DictReader(stream), 2):
+        key = (row.get("type"), row.get("name"))
+        if current is None or key != (current["type"], current["name"]):
+            if current is not None:
+                current["seasons"] = list(current["seasons"].values())
+                yield start, current
+            current = {
+                "type": row.get("type"),
+                "name": row.get("name"),
+                "description": row.get("description"),
+                "poster": row.get("poster"),
+                "trailer": row.get("trailer"),
+                "genre": row.get("genre", ""),
+                "seasons": {},
+            }
+            start = line
+            if (row.get("type") or "").upper() == "M" and row.get("s3_path"):
+                current["video"] = {
+                    "s3_path": row.get("s3_path"),
+                    "thumbnail_path": row.get("thumbnail_path"),
+                    "duration": row.get("duration"),
+                }
+        if row.get("season_number"):
+            season = current["seasons"].setdefault(
+                row["season_number"],
+                {"season_number": row["season_number"], "episodes": []},
+            )
+            if row.get("episode_no"):
+                season["episodes"].append(
+                    {
+                        "episode_no": row["episode_no"],
+                        "title": row.get("title"),
+                        "description": row.get("episode_description"),
+                        "s3_path": row.get("s3_path"),
+                        "thumbnail_path": row.get("thumbnail_path"),
+                        "duration": row.get("duration"),
+                    }
+                )
+    if current is not None:
+        current["seasons"] = list(current["seasons"].values())
+        yield start, current
+
+
+class CatalogLoader:
+    """COPYs manifest records into staging tables and upserts them in batches.
+
+    At most ``batch_size`` staged rows (contents plus episodes) are held in
+    memory; each batch is loaded and committed in its own transaction.
+    """
+
+    def __init__(self, connection, batch_size=5000, progress=None):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.progress = progress
+        self.contents = 0
+        self.episodes = 0
+        self.batches = 0
+        self._started = time.perf_counter()
+        self._reset()
+        with self.connection.cursor() as cur:
+            cur.execute(STAGING_DDL)
+        self.connection.commit()
+
+    def _reset(self):
+        self._content_buf = io.StringIO()
+        self._episode_buf = io.StringIO()
+        self._content_csv = csv.writer(self._content_buf)
+        self._episode_csv = csv.writer(self._episode_buf)
+        self._pending = 0
+        self._pending_contents = 0
+        self._pending_episodes = 0
+
+    def add(self, line, record):
+        ctype = (record.get("type") or "").upper()
+        if ctype not in ("S", "M"):
+            raise ManifestError(line, 'type must be "S" or "M"')
+        _require(record, CONTENT_FIELDS, line, "content")
+        name = record["name"]
+
+        video = record.get("video") or {}
+        if video:
+            _require(video, VIDEO_FIELDS, line, "video")
+        self._content_csv.writerow(
+            (
+                ctype,
+                name,
+                record["description"],
+                record["poster"],
+                record["trailer"],
+                _pg_array(_genres(record.get("genre"))),
+                video.get("s3_path"),
+                video.get("thumbnail_path"),
+                _int(video.get("duration"), line, "video duration"),
+            )
+        )
+        self._pending += 1
+        self._pending_contents += 1
+
+        for season in record.get("seasons") or ():
+            number = _int(season.get("season_number"), line, "season_number")
+            if number is None:
+                raise ManifestError(line, "season is missing season_number")
+            episodes = season.get("episodes") or ()
+            if not episodes:
+                # keeps a season without episodes
+                self._episode_csv.writerow((ctype, name, number) + (None,) * 6)
+                self._pending += 1
+            for ep in episodes:
+                _require(ep, EPISODE_FIELDS, line, "episode")
+                self._episode_csv.writerow(
+                    (
+                        ctype,
+                        name,
+                        number,
+                        _int(ep.get("episode_no"), line, "episode_no"),
+                        ep["title"],
+                        ep["description"],
+                        ep["s3_path"],
+                        ep["thumbnail_path"],
+                        _int(ep["duration"], line, "duration"),
+                    )
+                )
+                self._pending += 1
+                self._pending_episodes += 1
+
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        self._content_buf.seek(0)
+        self._episode_buf.seek(0)
+        try:
+            with self.connection.cursor() as cur:
+                cur.copy_expert(COPY_CONTENT, self._content_buf)
+                cur.copy_expert(COPY_EPISODE, self._episode_buf)
+                cur.execute(UPSERT_SQL)
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        self.contents += self._pending_contents
+        self.episodes += self._pending_episodes
+        self.batches += 1
+        self._reset()
+        if self.progress is not None:
+            self.progress(self.report())
+
+    def report(self):
+        elapsed = time.perf_counter() - self._started
+        rows = self.contents + self.episodes
+        return {
+            "batches": self.batches,
+            "contents": self.contents,
+            "episodes": self.episodes,
+            "seconds": round(elapsed, 2),
+            "rows_per_sec": round(rows / elapsed, 1) if elapsed else 0.0,
+        }
+
+
+@click.command("ingest-catalog")
+@click.argument("manifest", type=click.File("r", encoding="utf-8"))
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(["jsonl", "csv"]),
+    default=None,
+    help="Manifest format; guessed from the file extension by default.",
+)
+@click.option("--batch-size", default=5000, show_default=True)
+@click.option("--quiet", is_flag=True, help="Only print the final report.")
+@with_appcontext
+def ingest_catalog(manifest, fmt, batch_size, quiet):
+    """Upsert contents, seasons, episodes and movie videos from MANIFEST.
+
+    MANIFEST is a JSON-lines or CSV file ("-" reads stdin). Contents are
+    matched on (type, name), seasons on (content, season_number), episodes
+    on (season, episode_no) and movie videos on s3_path. Batches are
+    committed as they go, so after an error the manifest can be fixed and
+    loaded again from the start.
+    """
+    if fmt is None:
+        fmt = "csv" if manifest.name.lower().endswith(".csv") else "jsonl"
+    records = read_csv(manifest) if fmt == "csv" else read_jsonl(manifest)
+
+    def progress(report):
+        click.echo(json.dumps(report), err=True)
+
+    # raw psycopg2 connection on the primary: COPY is not available through
+    # the ORM, and replica routing only applies to ORM sessions
+    raw = db.engine.raw_connection()
+    try:
+        loader = CatalogLoader(
+            raw.driver_connection,
+            batch_size=batch_size,
+            progress=None if quiet else progress,
+        )
+        try:
+            for line, record in records:
+                loader.add(line, record)
+            loader.flush()
+        except ManifestError as e:
+            raise click.ClickException(str(e))
+    finally:
+        raw.close()
+
+    # every committed batch bumped catalog_version, so serving processes
+    # rebuild within CATALOG_VERSION_CHECK_INTERVAL
+    click.echo(json.dumps(loader.report()))
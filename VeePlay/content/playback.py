@@ -0,0 +1,205 @@
+import base64
+import hashlib
+import hmac
+import json
+import posixpath
+import re
+import time
+from urllib.parse import quote, urlsplit
+from VeePlay.content.utils import PresignedUrlCache
+
+try:
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import padding
+except ImportError:  # pragma: no cover - only needed for PLAYBACK_AUTH=cloudfront
+    hashes = None
+
+# a manifest's whole directory (its segments and renditions) is covered by
+# one credential; any other object is covered on its own
+MANIFEST_EXTENSIONS = (".m3u8", ".mpd")
+
+# CloudFront's URL-safe base64 alphabet
+_B64_OUT = bytes.maketrans(b"+=/", b"-_~")
+_B64_IN = bytes.maketrans(b"-_~", b"+=/")
+
+
+def _b64encode(data):
+    return base64.b64encode(data).translate(_B64_OUT).decode("ascii")
+
+
+def _b64decode(text):
+    return base64.b64decode(text.encode("ascii").translate(_B64_IN), validate=True)
+
+
+def resource_path(s3_path):
+    """Key pattern that a credential for ``s3_path`` grants access to."""
+    if s3_path.lower().endswith(MANIFEST_EXTENSIONS) and "/" in s3_path:
+        return posixpath.dirname(s3_path) + "/*"
+    return s3_path
+
+
+def build_policy(resource, expires):
+    """CloudFront custom policy JSON, compact as CloudFront expects it."""
+    statement = {
+        "Resource": resource,
+        "Condition": {"DateLessThan": {"AWS:EpochTime": int(expires)}},
+    }
+    return json.dumps({"Statement": [statement]}, separators=(",", ":"))
+
+
+def resource_matches(pattern, url):
+    """CloudFront wildcard match: ``*`` is any run of characters, ``?`` one."""
+    regex = re.escape(pattern).replace(r"\*", ".*").replace(r"\?", ".")
+    return re.fullmatch(regex, url) is not None
+
+
+def check_policy(policy, url, now=None):
+    """True if the decoded ``policy`` allows ``url`` at ``now``."""
+    try:
+        statement = json.loads(policy)["Statement"][0]
+        expires = statement["Condition"]["DateLessThan"]["AWS:EpochTime"]
+        resource = statement["Resource"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return False
+    now = time.time() if now is None else now
+    return now < expires and resource_matches(resource, url)
+
+
+class CloudFrontCookieSigner:
+    """Issues CloudFront signed cookies with a custom policy.
+
+    Needs ``cryptography`` and a CloudFront key pair (or trusted key group
+    key); CloudFront checks the RSA-SHA1 signature with the public half.
+    """
+
+    kind = "cookie"
+    field = "cookies"
+
+    def __init__(self, key_pair_id, private_key_pem):
+        if hashes is None:
+            raise RuntimeError(
+                "PLAYBACK_AUTH=cloudfront requires `pip install cryptography`"
+            )
+        self.key_pair_id = key_pair_id
+        self.private_key = serialization.load_pem_private_key(
+            private_key_pem, password=None
+        )
+
+    def issue(self, resource, expires):
+        policy = build_policy(resource, expires).encode("utf-8")
+        signature = self.private_key.sign(policy, padding.PKCS1v15(), hashes.SHA1())
+        return {
+            "CloudFront-Policy": _b64encode(policy),
+            "CloudFront-Signature": _b64encode(signature),
+            "CloudFront-Key-Pair-Id": self.key_pair_id,
+        }
+
+
+def verify_cloudfront_cookies(cookies, url, public_keys, now=None):
+    """Check signed cookies for ``url`` as CloudFront would.
+
+    ``public_keys`` maps key pair ids to PEM public keys. For tests and
+    local playback servers; production requests are checked by CloudFront.
+    """
+    if hashes is None:
+        raise RuntimeError("Verifying CloudFront cookies requires cryptography")
+    from cryptography.exceptions import InvalidSignature
+
+    pem = public_keys.get(cookies.get("CloudFront-Key-Pair-Id"))
+    if pem is None:
+        return False
+    try:
+        policy = _b64decode(cookies["CloudFront-Policy"])
+        signature = _b64decode(cookies["CloudFront-Signature"])
+        serialization.load_pem_public_key(pem).verify(
+            signature, policy, padding.PKCS1v15(), hashes.SHA1()
+        )
+    except (KeyError, ValueError, InvalidSignature):
+        return False
+    return check_policy(policy, url, now)
+
+
+class PlaybackTokenSigner:
+    """Issues HMAC-SHA256 query tokens carrying the same policy.
+
+    For a self-hosted edge or a CloudFront function that shares ``secret``;
+    ``verify`` is what such an edge runs.
+    """
+
+    kind = "query"
+    field = "token"
+
+    def __init__(self, secret):
+        self.secret = secret.encode("utf-8")
+
+    def _sign(self, policy):
+        return hmac.new(self.secret, policy, hashlib.sha256).digest()
+
+    def issue(self, resource, expires):
+        policy = build_policy(resource, expires).encode("utf-8")
+        return f"{_b64encode(policy)}.{_b64encode(self._sign(policy))}"
+
+    def verify(self, token, url, now=None):
+        try:
+            encoded_policy, encoded_signature = token.split(".")
+            policy = _b64decode(encoded_policy)
+            signature = _b64decode(encoded_signature)
+        except ValueError:
+            return False
+        if not hmac.compare_digest(signature, self._sign(policy)):
+            return False
+        return check_policy(policy, url, now)
+
+
+class PlaybackAuthorizer:
+    """Hands out a manifest URL plus one credential per playable title.
+
+    Credentials cover ``resource_path`` of the video, so a player can fetch
+    every segment of an HLS/DASH rendition without a signature per object.
+    They are reused for ``ttl * refresh_ratio`` seconds, like presigned URLs.
+    """
+
+    def __init__(self, signer, base_url, ttl=14400, refresh_ratio=0.5, maxsize=10000):
+        self.signer = signer
+        self.base_url = base_url.rstrip("/")
+        self.ttl = ttl
+        self.cache = PresignedUrlCache(maxsize=maxsize, ttl=int(ttl * refresh_ratio))
+
+    def url(self, path):
+        return f"{self.base_url}/{quote(path, safe='/~*')}"
+
+    def grant(self, s3_path):
+        resource = self.url(resource_path(s3_path))
+        cached = self.cache.get(resource)
+        if cached is not None:
+            credential = cached[0]
+        else:
+            expires = int(time.time()) + self.ttl
+            credential = {
+                "type": self.signer.kind,
+                "resource": resource,
+                "expires": expires,
+                self.signer.field: self.signer.issue(resource, expires),
+            }
+            self.cache.set(resource, credential, time.monotonic() + self.ttl)
+        return {"manifest_url": self.url(s3_path), "credential": credential}
+
+    def stats(self):
+        return self.cache.stats()
+
+
+def set_playback_cookies(response, credential, domain):
+    """Also send cookie credentials as cookies scoped to their resource."""
+    path = urlsplit(credential["resource"]).path.rstrip("*") or "/"
+    for name, value in credential["cookies"].items():
+        response.set_cookie(
+            name,
+            value,
+            expires=credential["expires"],
+            path=path,
+            domain=domain,
+            secure=True,
+            httponly=True,
+            samesite="None",
+        )
+    return response
@@ -0,0 +1,74 @@
+from sqlalchemy import func, select, true
+from sqlalchemy.orm import joinedload, selectinload
+from VeePlay.models import Content, Season, WatchHistory
+from VeePlay.content.utils import encode_cursor
+
+
+def catalog_query():
+    # contents + movie videos in one JOIN, then one IN-query each for the
+    # seasons and episodes of every loaded show
+    return Content.query.options(
+        joinedload(Content.movie_video),
+        selectinload(Content.seasons).selectinload(Season.episodes),
+    )
+
+
+def cursor_id(cursor):
+    if len(cursor) != 1 or not isinstance(cursor[0], int):
+        raise ValueError("Invalid cursor")
+    return cursor[0]
+
+
+def keyset_page(stmt, limit, cursor=None):
+    """Keyset pagination on ``Content.id``; never issues an OFFSET.
+
+    Selects one row more than ``limit``; pass the result to ``split_page``.
+    """
+    if cursor:
+        stmt = stmt.where(Content.id > cursor_id(cursor))
+    return stmt.order_by(Content.id).limit(limit + 1)
+
+
+def split_page(rows, limit):
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1].id)
+    return rows, None
+
+
+def genre_select(genres, match_all=False):
+    # @> / && keep the predicate indexable by ix_content_genre (GIN)
+    stmt = select(Content.id, Content.name, Content.type, Content.genre)
+    if match_all:
+        return stmt.where(Content.genre.contains(genres))
+    return stmt.where(Content.genre.overlap(genres))
+
+
+def genre_facets_select():
+    genre = func.unnest(Content.genre).table_valued("genre").render_derived()
+    return (
+        select(genre.c.genre, func.count(Content.id), func.array_agg(Content.id))
+        .select_from(Content)
+        .join(genre, true())
+        .group_by(genre.c.genre)
+        .order_by(genre.c.genre)
+    )
+
+
+def continue_watching_select(user_id, limit):
+    # walks ix_watch_history_user_last_watched and stops after `limit` rows
+    return (
+        select(
+            WatchHistory.content_id,
+            WatchHistory.progress,
+            WatchHistory.last_watched,
+            Content.name,
+            Content.type,
+            Content.genre,
+            Content.poster,
+        )
+        .join(Content, WatchHistory.content_id == Content.id)
+        .where(WatchHistory.user_id == user_id)
+        .order_by(WatchHistory.last_watched.desc())
+        .limit(limit)
+    )
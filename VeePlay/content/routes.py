@@ -1,134 +1,117 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from VeePlay.models import db, Content, Season, Episode, WatchHistory
-from VeePlay.content.utils import generate_presigned_url
+from VeePlay.models import db
+from VeePlay.content.utils import generate_presigned_url, get_limit, get_page_args
+from VeePlay.content.queries import (
+    keyset_page,
+    split_page,
+    genre_select,
+    genre_facets_select,
+    continue_watching_select,
+)
+from VeePlay.content.catalog import get_catalog
+from VeePlay.content.playback import set_playback_cookies
+from VeePlay.content.serializers import (
+    Raw,
+    render,
+    render_list,
+    json_response,
+    summary_view,
+    show_view,
+    movie_view,
+    movie_video_view,
+    episode_view,
+    movie_playback_view,
+    episode_playback_view,
+    extend,
+    wants_ndjson,
+    ndjson_page_args,
+    ndjson_response,
+)
+from VeePlay.main.utils import cached_response
 
 content = Blueprint("content", __name__)
 
 
 @content.route("/shows", methods=["GET"])
+@cached_response
 def get_all_shows():
-    shows = Content.query.filter_by(type="S").all()
-    result = [
+    catalog = get_catalog()
+    try:
+        if wants_ndjson():
+            limit, cursor = ndjson_page_args()
+            entries = catalog.shows.after(cursor, limit)
+            return ndjson_response(catalog, summary_view, entries)
+        limit, cursor = get_page_args()
+        shows, next_cursor = catalog.shows.page(limit, cursor)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    return json_response(
         {
-            "name": show.name,
-            "description": show.description,
-            "poster": generate_presigned_url(show.poster),
-            "trailer": generate_presigned_url(show.trailer),
-            "genre": show.genre,
+            "shows": render_list(catalog, summary_view, shows),
+            "next_cursor": next_cursor,
         }
-        for show in shows
-    ]
-    return jsonify(result), 200
+    )
 
 
 @content.route("/movies", methods=["GET"])
+@cached_response
 def get_all_movies():
-    movies = Content.query.filter_by(type="M").all()
-    result = [
+    catalog = get_catalog()
+    try:
+        if wants_ndjson():
+            limit, cursor = ndjson_page_args()
+            entries = catalog.movies.after(cursor, limit)
+            return ndjson_response(catalog, summary_view, entries)
+        limit, cursor = get_page_args()
+        movies, next_cursor = catalog.movies.page(limit, cursor)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    return json_response(
         {
-            "name": movie.name,
-            "description": movie.description,
-            "poster": generate_presigned_url(movie.poster),
-            "trailer": generate_presigned_url(movie.trailer),
-            "genre": movie.genre,
+            "movies": render_list(catalog, summary_view, movies),
+            "next_cursor": next_cursor,
         }
-        for movie in movies
-    ]
-    return jsonify(result), 200
+    )
 
 
 @content.route("/shows/<string:show_name>", methods=["GET"])
+@cached_response
 def get_show_details(show_name):
-    show = Content.query.filter_by(name=show_name, type="S").first()
+    catalog = get_catalog()
+    show = catalog.get("S", show_name)
     if not show:
         return jsonify({"message": "Show not found"}), 404
-
-    seasons = [
-        {
-            "season_number": season.season_number,
-            "episodes": [
-                {
-                    "episode_no": ep.episode_no,
-                    "title": ep.title,
-                    "description": ep.description,
-                    "thumbnail": generate_presigned_url(ep.thumbnail_path),
-                    "video_url": generate_presigned_url(ep.s3_path),
-                }
-                for ep in season.episodes
-            ],
-        }
-        for season in show.seasons
-    ]
-
-    return (
-        jsonify(
-            {
-                "name": show.name,
-                "description": show.description,
-                "trailer": generate_presigned_url(show.trailer),
-                "poster": generate_presigned_url(show.poster),
-                "genre": show.genre,
-                "seasons": seasons,
-            }
-        ),
-        200,
-    )
+    return json_response(Raw(render(catalog, show_view, show)))
 
 
 @content.route("/movies/<string:movie_name>", methods=["GET"])
+@cached_response
 def get_movie_details(movie_name):
-    movie = Content.query.filter_by(name=movie_name, type="M").first()
+    catalog = get_catalog()
+    movie = catalog.get("M", movie_name)
     if not movie:
         return jsonify({"message": "Movie not found"}), 404
-
-    video = movie.movie_video
-    return (
-        jsonify(
-            {
-                "name": movie.name,
-                "description": movie.description,
-                "trailer": generate_presigned_url(movie.trailer),
-                "poster": generate_presigned_url(movie.poster),
-                "genre": movie.genre,
-                "video": {
-                    "s3_path": generate_presigned_url(video.s3_path) if video else None,
-                    "thumbnail_path": (
-                        generate_presigned_url(video.thumbnail_path) if video else None
-                    ),
-                    "duration": video.duration if video else None,
-                },
-            }
-        ),
-        200,
-    )
+    return json_response(Raw(render(catalog, movie_view, movie)))
 
 
 @content.route("/movies/<string:movie_name>/video", methods=["GET"])
 @jwt_required()
 def get_movie_video(movie_name):
-    movie = Content.query.filter_by(name=movie_name, type="M").first()
+    catalog = get_catalog()
+    movie = catalog.get("M", movie_name)
     if not movie or not movie.movie_video:
         return jsonify({"message": "Video not found"}), 404
-
-    video = movie.movie_video
-
-    signed_url = generate_presigned_url(video.s3_path)
-
-    signed_thumbnail = (
-        generate_presigned_url(video.thumbnail_path) if video.thumbnail_path else None
-    )
-
-    return (
-        jsonify(
-            {
-                "s3_path": signed_url,
-                "thumbnail_path": signed_thumbnail,
-                "duration": video.duration,
-            }
-        ),
-        200,
+    body, grant = playback_body(
+        catalog,
+        movie.movie_video.s3_path,
+        movie_video_view,
+        movie_playback_view,
+        movie,
     )
+    return playback_response(body, grant)
 
 
 @content.route(
@@ -137,87 +120,175 @@ def get_movie_video(movie_name):
 )
 @jwt_required()
 def get_episode(show_name, season_number, episode_number):
-    show = Content.query.filter_by(name=show_name, type="S").first()
+    catalog = get_catalog()
+    show = catalog.get("S", show_name)
     if not show:
         return jsonify({"message": "Show not found"}), 404
 
-    season = Season.query.filter_by(
-        content_id=show.id, season_number=season_number
-    ).first()
-    if not season:
-        return jsonify({"message": "Season not found"}), 404
-
-    episode = Episode.query.filter_by(
-        season_id=season.id, episode_no=episode_number
-    ).first()
+    episode = catalog.episode(show.id, season_number, episode_number)
     if not episode:
+        if not any(s.season_number == season_number for s in show.seasons):
+            return jsonify({"message": "Season not found"}), 404
         return jsonify({"message": "Episode not found"}), 404
-    return (
-        jsonify(
-            {
-                "show_id": show.id,
-                "title": str(episode.title),
-                "description": str(episode.description),
-                "s3_path": generate_presigned_url(episode.s3_path),
-                "thumbnail_path": generate_presigned_url(episode.thumbnail_path),
-                "duration": episode.duration,
-            }
-        ),
-        200,
+    body, grant = playback_body(
+        catalog, episode.s3_path, episode_view, episode_playback_view, show, episode
     )
+    return playback_response(body, grant)
 
 
-@content.route("/continue-watching", methods=["GET"])
+def playback_body(catalog, s3_path, presigned_view, playback_view, *entities):
+    """Rendered video entry and its grant (None while presigning URLs).
+
+    With PLAYBACK_AUTH set the entry carries a manifest URL and one
+    credential for the title's path instead of a presigned ``s3_path``.
+    """
+    playback = current_app.playback
+    if playback is None:
+        return render(catalog, presigned_view, *entities), None
+    grant = playback.grant(s3_path)
+    return extend(render(catalog, playback_view, *entities), grant), grant
+
+
+def playback_response(body, grant):
+    response = json_response(Raw(body))
+    domain = current_app.config["PLAYBACK_COOKIE_DOMAIN"]
+    if grant is not None and grant["credential"]["type"] == "cookie" and domain:
+        set_playback_cookies(response, grant["credential"], domain)
+    return response
+
+
+def parse_id_list(data, field, limit):
+    ids = data.get(field, [])
+    if not isinstance(ids, list):
+        raise ValueError(f"{field} must be a list of integers")
+    # checked before the ids are read, so a huge list costs nothing
+    if len(ids) > limit:
+        raise ValueError(f"At most {limit} videos per request")
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise ValueError(f"{field} must be a list of integers")
+    return list(dict.fromkeys(ids))
+
+
+@content.route("/playback/urls", methods=["POST"])
 @jwt_required()
-def continue_watching():
-    user_email = get_jwt_identity()
-
-    history = (
-        db.session.query(WatchHistory)
-        .join(Content, WatchHistory.content_id == Content.id)
-        .filter(WatchHistory.user_email == user_email)
-        .order_by(WatchHistory.last_watched.desc())
-        .limit(10)
-        .all()
+def playback_urls():
+    """Signed video URLs for many episodes and movies in one request.
+
+    A show's content id stands for all of its episodes, so a client can
+    fetch a whole season or series up front.
+    """
+    data = request.get_json(silent=True) or {}
+    limit = current_app.config["PLAYBACK_BATCH_SIZE"]
+    try:
+        episode_ids = parse_id_list(data, "episode_ids", limit)
+        content_ids = parse_id_list(data, "content_ids", limit)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    too_many = f"At most {limit} videos per request"
+    if len(episode_ids) + len(content_ids) > limit:
+        return jsonify({"message": too_many}), 400
+
+    catalog = get_catalog()
+    episodes = {}
+    movies = {}
+    missing = {"episode_ids": [], "content_ids": []}
+    for episode_id in episode_ids:
+        found = catalog.episodes_by_id.get(episode_id)
+        if found is None:
+            missing["episode_ids"].append(episode_id)
+        else:
+            episodes[episode_id] = found
+    for content_id in content_ids:
+        entry = catalog.by_id.get(content_id)
+        if entry is None or (entry.type == "M" and not entry.movie_video):
+            missing["content_ids"].append(content_id)
+        elif entry.type == "M":
+            movies[content_id] = entry
+        else:
+            for season in entry.seasons:
+                for ep in season.episodes:
+                    episodes[ep.id] = (entry, ep)
+        # a show's id expands to all of its episodes
+        if len(episodes) + len(movies) > limit:
+            return jsonify({"message": too_many}), 400
+
+    return json_response(
+        {
+            "episodes": {
+                str(episode_id): Raw(
+                    playback_body(
+                        catalog,
+                        ep.s3_path,
+                        episode_view,
+                        episode_playback_view,
+                        show,
+                        ep,
+                    )[0]
+                )
+                for episode_id, (show, ep) in episodes.items()
+            },
+            "movies": {
+                str(content_id): Raw(
+                    playback_body(
+                        catalog,
+                        movie.movie_video.s3_path,
+                        movie_video_view,
+                        movie_playback_view,
+                        movie,
+                    )[0]
+                )
+                for content_id, movie in movies.items()
+            },
+            "missing": missing,
+        }
     )
 
-    results = []
-    for entry in history:
-        results.append(
-            {
-                "content_id": entry.content.id,
-                "title": entry.content.title,
-                "type": entry.content.type,
-                "genre": entry.content.genre,
-                "thumbnail": generate_presigned_url(entry.content.thumbnail),
-                "last_watched": entry.last_watched.isoformat(),
-            }
-        )
 
-    return jsonify(results), 200
+def continue_watching_payload(history):
+    return [
+        {
+            "content_id": entry.content_id,
+            "title": entry.name,
+            "type": entry.type,
+            "genre": entry.genre,
+            "thumbnail": generate_presigned_url(entry.poster),
+            "progress": entry.progress,
+            "last_watched": entry.last_watched.isoformat(),
+        }
+        for entry in history
+    ]
+
+
+@content.route("/continue-watching", methods=["GET"])
+@jwt_required()
+def continue_watching():
+    user_id = int(get_jwt_identity())
+    try:
+        limit = get_limit(current_app.config["CONTINUE_WATCHING_LIMIT"])
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    history = db.session.execute(continue_watching_select(user_id, limit)).all()
+    return jsonify(continue_watching_payload(history)), 200
 
 
 @content.route("/watch_history", methods=["POST"])
 @jwt_required()
 def update_watch_history():
-    user_id = get_jwt_identity()
-    data = request.get_json()
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True) or {}
     content_id = data.get("content_id")
     progress = data.get("progress", 0)
 
-    history = WatchHistory.query.filter_by(
-        user_id=user_id, content_id=content_id
-    ).first()
-
-    if history:
-        history.progress = progress
-    else:
-        history = WatchHistory(
-            user_id=user_id, content_id=content_id, progress=progress
-        )
-        db.session.add(history)
+    if not all(
+        isinstance(value, int) and not isinstance(value, bool)
+        for value in (content_id, progress)
+    ):
+        return jsonify({"message": "content_id and progress must be integers"}), 400
+    if content_id not in get_catalog().by_id:
+        return jsonify({"message": "Content not found"}), 404
 
-    db.session.commit()
+    current_app.watch_buffer.add(user_id, content_id, progress)
     return jsonify({"message": "Watch history updated"}), 200
 
 
@@ -228,38 +299,71 @@ def search_content():
     if not query:
         return jsonify({"message": 'Query parameter "q" is required'}), 400
 
-    matched_content = Content.query.filter(Content.name.ilike(f"%{query}%")).all()
+    catalog = get_catalog()
+    try:
+        limit, cursor = get_page_args(current_app.config["SEARCH_LIMIT"])
+        matched_content, next_cursor = catalog.search(query, limit, cursor)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
 
-    results = {"movies": [], "shows": []}
-
-    for item in matched_content:
-        content_data = {
-            "name": item.name,
-            "genre": item.genre,
-            "description": item.description,
-            "poster": generate_presigned_url(item.poster),
-            "trailer": generate_presigned_url(item.trailer),
+    return json_response(
+        {
+            "movies": render_list(
+                catalog, summary_view, (c for c in matched_content if c.type == "M")
+            ),
+            "shows": render_list(
+                catalog, summary_view, (c for c in matched_content if c.type == "S")
+            ),
+            "next_cursor": next_cursor,
         }
-        if item.type == "M":
-            results["movies"].append(content_data)
-        elif item.type == "S":
-            results["shows"].append(content_data)
+    )
 
-    return jsonify(results), 200
 
+def parse_filter_args(args):
+    """Return ``(genres, match_all)``; raises ValueError on bad input."""
+    genres = [g.strip().lower() for g in args.get("genre", "").split(",") if g.strip()]
+    if not genres:
+        raise ValueError("Genre parameter is required")
 
-@content.route("/filter")
-def filter_by_genre():
-    genre = request.args.get("genre", "").strip().lower()
-    if not genre:
-        return jsonify({"message": "Genre parameter is required"}), 400
+    mode = args.get("mode", "any").lower()
+    if mode not in ("any", "all"):
+        raise ValueError('mode must be "any" or "all"')
+    return genres, mode == "all"
 
-    filtered_content = Content.query.filter(Content.genre.any(genre)).all()
-    movies = [
-        {"name": c.name, "genre": c.genre} for c in filtered_content if c.type == "M"
-    ]
-    shows = [
-        {"name": c.name, "genre": c.genre} for c in filtered_content if c.type == "S"
-    ]
 
-    return jsonify({"movies": movies, "shows": shows}), 200
+def filter_payload(rows, next_cursor):
+    return {
+        "movies": [{"name": c.name, "genre": c.genre} for c in rows if c.type == "M"],
+        "shows": [{"name": c.name, "genre": c.genre} for c in rows if c.type == "S"],
+        "next_cursor": next_cursor,
+    }
+
+
+def genres_payload(facets):
+    return {
+        "genres": [
+            {"genre": genre, "count": count, "content_ids": sorted(ids)}
+            for genre, count, ids in facets
+        ]
+    }
+
+
+@content.route("/filter")
+@cached_response
+def filter_by_genre():
+    try:
+        genres, match_all = parse_filter_args(request.args)
+        limit, cursor = get_page_args()
+        stmt = keyset_page(genre_select(genres, match_all), limit, cursor)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    rows, next_cursor = split_page(db.session.execute(stmt).all(), limit)
+    return jsonify(filter_payload(rows, next_cursor)), 200
+
+
+@content.route("/genres")
+@cached_response
+def genre_counts():
+    facets = db.session.execute(genre_facets_select()).all()
+    return jsonify(genres_payload(facets)), 200
@@ -0,0 +1,93 @@
+import heapq
+import re
+from collections import Counter, defaultdict
+
+_WORD_RE = re.compile(r"\w+")
+
+NAME_WEIGHT = 1.0
+DESCRIPTION_WEIGHT = 0.4
+MIN_SCORE = 0.3
+MIN_CANDIDATES = 200
+
+
+def trigrams(text):
+    """pg_trgm style trigrams: each word padded with two leading spaces and
+    one trailing space, lower-cased."""
+    grams = set()
+    for word in _WORD_RE.findall(text.lower()):
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i : i + 3])
+    return grams
+
+
+class SearchIndex:
+    """In-process trigram inverted index over content names and descriptions.
+
+    Names are ranked by trigram similarity (shared / union, as pg_trgm's
+    ``similarity``); descriptions by the share of query trigrams they
+    contain. Names containing the query are always candidates and get a
+    bonus (more for a prefix or exact match), so every old ILIKE match is
+    still found and ranks first.
+    """
+
+    def __init__(self, contents):
+        self.contents = tuple(contents)
+        self._names = [c.name.lower() for c in self.contents]
+        self._name_sizes = []
+        self._name_postings = defaultdict(list)
+        self._description_postings = defaultdict(list)
+
+        for doc, c in enumerate(self.contents):
+            name_grams = trigrams(c.name)
+            self._name_sizes.append(len(name_grams))
+            for gram in name_grams:
+                self._name_postings[gram].append(doc)
+            for gram in trigrams(c.description or ""):
+                self._description_postings[gram].append(doc)
+
+    def search(self, query, limit=20, offset=0):
+        """Return ``(entries, has_more)`` ordered by descending relevance."""
+        query = query.strip().lower()
+        grams = trigrams(query)
+        if not grams:
+            return [], False
+
+        name_hits = Counter()
+        description_hits = Counter()
+        for gram in grams:
+            name_hits.update(self._name_postings.get(gram, ()))
+            description_hits.update(self._description_postings.get(gram, ()))
+
+        # only the documents sharing the most trigrams with the query can
+        # reach the top of the ranking; skip scoring the long tail
+        window = max(MIN_CANDIDATES, 4 * (offset + limit))
+        candidates = {doc for doc, _ in name_hits.most_common(window)}
+        candidates.update(doc for doc, _ in description_hits.most_common(window))
+        # a name containing the query shares a trigram with it unless a query
+        # word is under three characters ("ta" in "star"); only then scan
+        if min(len(word) for word in _WORD_RE.findall(query)) < 3:
+            pool = range(len(self._names))
+        else:
+            pool = name_hits
+        candidates.update(doc for doc in pool if query in self._names[doc])
+
+        scored = []
+        for doc in candidates:
+            shared = name_hits[doc]
+            score = NAME_WEIGHT * shared / (len(grams) + self._name_sizes[doc] - shared)
+            score += DESCRIPTION_WEIGHT * description_hits[doc] / len(grams)
+
+            name = self._names[doc]
+            if name == query:
+                score += 3
+            elif name.startswith(query):
+                score += 2
+            elif query in name:
+                score += 1
+
+            if score >= MIN_SCORE:
+                scored.append((-score, self.contents[doc].id, doc))
+
+        page = heapq.nsmallest(offset + limit, scored)[offset:]
+        return [self.contents[doc] for _, _, doc in page], offset + limit < len(scored)
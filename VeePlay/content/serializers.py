@@ -0,0 +1,325 @@
+import json
+import re
+import secrets
+from flask import Response, request, stream_with_context
+from VeePlay.content.utils import generate_presigned_urls, decode_cursor
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+if orjson is not None:
+
+    def dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+
+else:
+
+    def dumps(obj):
+        return json.dumps(
+            obj, separators=(",", ":"), sort_keys=True, ensure_ascii=False
+        ).encode("utf-8")
+
+
+class Url:
+    """Marks an S3 key that is presigned when the template is rendered."""
+
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+
+class Raw:
+    """Already-encoded JSON spliced into an envelope as is."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+
+NDJSON = "application/x-ndjson"
+# stream output is flushed in chunks of about this size; the first record is
+# sent on its own so clients start parsing right away
+STREAM_CHUNK = 64 * 1024
+
+# placeholders cannot collide with catalog text: they contain a NUL and a
+# per-process nonce
+_NONCE = secrets.token_hex(4)
+_SLOT_RE = re.compile(rb'"\\u0000' + _NONCE.encode() + rb'(\d+)\\u0000"')
+
+
+class Template:
+    """Pre-encoded JSON for one entity with holes for its presigned URLs.
+
+    Encoding happens once; ``render`` only signs (or looks up) each URL and
+    joins byte strings.
+    """
+
+    __slots__ = ("fragments", "keys")
+
+    def __init__(self, obj):
+        keys = []
+
+        def swap(value):
+            if isinstance(value, Url):
+                if not value.key:
+                    return None
+                keys.append(value.key)
+                return f"\x00{_NONCE}{len(keys) - 1}\x00"
+            if isinstance(value, dict):
+                return {k: swap(v) for k, v in value.items()}
+            if isinstance(value, (list, tuple)):
+                return [swap(v) for v in value]
+            return value
+
+        parts = _SLOT_RE.split(dumps(swap(obj)))
+        self.fragments = tuple(parts[0::2])
+        self.keys = tuple(keys[int(i)] for i in parts[1::2])
+
+    def render(self):
+        fragments = self.fragments
+        out = [fragments[0]]
+        urls = generate_presigned_urls(self.keys) if self.keys else ()
+        for url, fragment in zip(urls, fragments[1:]):
+            out.append(dumps(url))
+            out.append(fragment)
+        return b"".join(out)
+
+
+def content_view(content):
+    """Full record with seasons and episodes, as listed on /home."""
+    is_show = content.type.lower() == "s"  # 'S' for show
+    video = content.movie_video
+    return {
+        "id": content.id,
+        "name": content.name,
+        "description": content.description,
+        "type": content.type,
+        "poster": Url(content.poster),
+        "trailer": Url(content.trailer),
+        "genre": list(content.genre),
+        "seasons": (
+            [
+                {
+                    "id": season.id,
+                    "season_number": season.season_number,
+                    "episodes": [
+                        {
+                            "id": ep.id,
+                            "title": ep.title,
+                            "description": ep.description,
+                            "episode_no": ep.episode_no,
+                            "video": {
+                                "s3_path": Url(ep.s3_path),
+                                "thumbnail_url": Url(ep.thumbnail_path),
+                                "duration": ep.duration,
+                            },
+                        }
+                        for ep in season.episodes
+                    ],
+                }
+                for season in content.seasons
+            ]
+            if is_show
+            else []
+        ),
+        "video": (
+            {
+                "id": video.id,
+                "s3_path": Url(video.s3_path),
+                "thumbnail_url": video.thumbnail_path,
+                "duration": video.duration,
+            }
+            if content.type.lower() == "m" and video
+            else None
+        ),
+    }
+
+
+def summary_view(content):
+    """Listing card used by /shows, /movies and /search."""
+    return {
+        "name": content.name,
+        "description": content.description,
+        "poster": Url(content.poster),
+        "trailer": Url(content.trailer),
+        "genre": list(content.genre),
+    }
+
+
+def show_view(show):
+    """Show page; video URLs are fetched per episode or with /playback/urls."""
+    return {
+        "name": show.name,
+        "description": show.description,
+        "trailer": Url(show.trailer),
+        "poster": Url(show.poster),
+        "genre": list(show.genre),
+        "seasons": [
+            {
+                "season_number": season.season_number,
+                "episodes": [
+                    {
+                        "id": ep.id,
+                        "episode_no": ep.episode_no,
+                        "title": ep.title,
+                        "description": ep.description,
+                        "thumbnail": Url(ep.thumbnail_path),
+                    }
+                    for ep in season.episodes
+                ],
+            }
+            for season in show.seasons
+        ],
+    }
+
+
+def movie_view(movie):
+    video = movie.movie_video
+    return {
+        "name": movie.name,
+        "description": movie.description,
+        "trailer": Url(movie.trailer),
+        "poster": Url(movie.poster),
+        "genre": list(movie.genre),
+        "video": {
+            "s3_path": Url(video.s3_path) if video else None,
+            "thumbnail_path": Url(video.thumbnail_path) if video else None,
+            "duration": video.duration if video else None,
+        },
+    }
+
+
+def movie_video_view(movie):
+    video = movie.movie_video
+    return {
+        "s3_path": Url(video.s3_path),
+        "thumbnail_path": Url(video.thumbnail_path),
+        "duration": video.duration,
+    }
+
+
+def movie_playback_view(movie):
+    """``movie_video_view`` for PLAYBACK_AUTH modes; the video comes as a grant."""
+    video = movie.movie_video
+    return {
+        "thumbnail_path": Url(video.thumbnail_path),
+        "duration": video.duration,
+    }
+
+
+def episode_playback_view(show, episode):
+    """``episode_view`` for PLAYBACK_AUTH modes; the video comes as a grant."""
+    return {
+        "id": episode.id,
+        "show_id": show.id,
+        "title": str(episode.title),
+        "description": str(episode.description),
+        "thumbnail_path": Url(episode.thumbnail_path),
+        "duration": episode.duration,
+    }
+
+
+def episode_view(show, episode):
+    return {
+        "id": episode.id,
+        "show_id": show.id,
+        "title": str(episode.title),
+        "description": str(episode.description),
+        "s3_path": Url(episode.s3_path),
+        "thumbnail_path": Url(episode.thumbnail_path),
+        "duration": episode.duration,
+    }
+
+
+def render(snapshot, view, *entities):
+    """Render ``view(*entities)`` from the template cached on ``snapshot``.
+
+    Snapshots are immutable, so their templates never go stale; a new
+    snapshot starts with an empty cache.
+    """
+    key = (view, *(e.id for e in entities))
+    template = snapshot.templates.get(key)
+    if template is None:
+        template = Template(view(*entities))
+        snapshot.templates[key] = template
+    return template.render()
+
+
+def render_list(snapshot, view, entities):
+    return Raw(b"[" + b",".join(render(snapshot, view, e) for e in entities) + b"]")
+
+
+def encode(obj):
+    """``dumps`` that splices in ``Raw`` values at the top level."""
+    if isinstance(obj, Raw):
+        return obj.data
+    if not isinstance(obj, dict):
+        return dumps(obj)
+    items = (dumps(k) + b":" + encode(v) for k, v in sorted(obj.items()))
+    return b"{" + b",".join(items) + b"}"
+
+
+def extend(rendered, obj):
+    """Add the keys of ``obj`` to the rendered JSON object ``rendered``."""
+    extra = encode(obj)
+    if extra == b"{}":
+        return rendered
+    if rendered == b"{}":
+        return extra
+    return rendered[:-1] + b"," + extra[1:]
+
+
+def json_response(obj, status=200):
+    return Response(encode(obj), status=status, mimetype="application/json")
+
+
+def wants_ndjson():
+    best = request.accept_mimetypes.best_match(["application/json", NDJSON])
+    return best == NDJSON
+
+
+def ndjson_page_args():
+    """``(limit, cursor_values)`` for a streamed listing.
+
+    ``limit`` is optional (None streams to the end) and not capped by
+    MAX_PAGE_SIZE, since streaming does not buffer the page.
+    """
+    limit = request.args.get("limit")
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError("limit must be an integer")
+        if limit < 1:
+            raise ValueError("limit must be positive")
+    cursor = request.args.get("cursor")
+    return limit, decode_cursor(cursor) if cursor else None
+
+
+def ndjson_response(snapshot, view, entities):
+    """Stream one rendered record per line as they are produced.
+
+    Only the current chunk is held in memory, however many entities there
+    are.
+    """
+
+    def generate():
+        buf = []
+        size = 0
+        first = True
+        for entity in entities:
+            line = render(snapshot, view, entity) + b"\n"
+            buf.append(line)
+            size += len(line)
+            if first or size >= STREAM_CHUNK:
+                yield b"".join(buf)
+                buf, size, first = [], 0, False
+        if buf:
+            yield b"".join(buf)
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON)
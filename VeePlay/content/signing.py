@@ -0,0 +1,135 @@
+import hashlib
+import hmac
+import ipaddress
+import re
+import time
+from urllib.parse import quote
+
+ALGORITHM = "AWS4-HMAC-SHA256"
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+
+# bucket names S3 accepts today; legacy names get host rules from botocore
+# that are not worth copying, so they are signed through boto3 instead
+_BUCKET_NAME = re.compile(r"^[a-z0-9][a-z0-9.-]{1,61}[a-z0-9]$")
+
+
+def _hmac(key, msg):
+    return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
+
+
+def _quote_param(value):
+    return quote(value, safe="-_.~")
+
+
+def _is_ip_address(value):
+    try:
+        ipaddress.ip_address(value)
+    except ValueError:
+        return False
+    return True
+
+
+def s3_base_url(bucket, region):
+    """Scheme, host and path prefix botocore uses for ``bucket`` objects."""
+    if not _BUCKET_NAME.match(bucket or "") or _is_ip_address(bucket):
+        raise ValueError(f"Unsupported bucket name {bucket!r}")
+    if "." not in bucket:
+        return f"https://{bucket}.s3.amazonaws.com", ""
+    if region in (None, "", "us-east-1", "aws-global"):
+        return "https://s3.amazonaws.com", f"/{bucket}"
+    return f"https://s3.{region}.amazonaws.com", f"/{bucket}"
+
+
+class SigV4Signer:
+    """Presigns S3 GET URLs with SigV4 query authentication, locally.
+
+    Produces the same URLs as ``generate_presigned_url("get_object")`` on a
+    boto3 client configured with ``signature_version="s3v4"``, without
+    botocore's request and event machinery. The signing key is derived once
+    per UTC day and each URL costs one SHA-256 and one HMAC. Nothing is
+    locked: threads that derive the same day's key at once just compute it
+    twice.
+    """
+
+    service = "s3"
+
+    def __init__(self, credentials, bucket, region, clock=time.time):
+        # botocore Credentials; refreshable ones renew themselves on access
+        self.credentials = credentials
+        self.bucket = bucket
+        self.region = region or "us-east-1"
+        self.clock = clock
+        base, self.path_prefix = s3_base_url(bucket, region)
+        self.base_url = base + self.path_prefix
+        self.host = base.split("://", 1)[1]
+        self._signing_key = (None, None, None)
+
+    def signing_key(self, datestamp, secret_key):
+        cached_date, cached_secret, key = self._signing_key
+        if cached_date == datestamp and cached_secret == secret_key:
+            return key
+        key = _hmac(("AWS4" + secret_key).encode("utf-8"), datestamp)
+        key = _hmac(key, self.region)
+        key = _hmac(key, self.service)
+        key = _hmac(key, "aws4_request")
+        self._signing_key = (datestamp, secret_key, key)
+        return key
+
+    def sign(self, key, expires_in, now=None):
+        return self.sign_many([key], expires_in, now)[0]
+
+    def sign_many(self, keys, expires_in, now=None):
+        """Presigned URLs for ``keys``, all signed at the same instant."""
+        creds = self.credentials.get_frozen_credentials()
+        stamp = time.gmtime(self.clock() if now is None else now)
+        amz_date = time.strftime("%Y%m%dT%H%M%SZ", stamp)
+        datestamp = amz_date[:8]
+        scope = f"{datestamp}/{self.region}/{self.service}/aws4_request"
+        signing_key = self.signing_key(datestamp, creds.secret_key)
+
+        params = [
+            ("X-Amz-Algorithm", ALGORITHM),
+            ("X-Amz-Credential", f"{creds.access_key}/{scope}"),
+            ("X-Amz-Date", amz_date),
+            ("X-Amz-Expires", str(int(expires_in))),
+            ("X-Amz-SignedHeaders", "host"),
+        ]
+        if creds.token:
+            params.append(("X-Amz-Security-Token", creds.token))
+        query = "&".join(f"{k}={_quote_param(v)}" for k, v in params)
+        canonical_query = "&".join(f"{k}={_quote_param(v)}" for k, v in sorted(params))
+        # everything after the path is the same for every key
+        request_tail = (
+            f"\n{canonical_query}\nhost:{self.host}\n\nhost\n{UNSIGNED_PAYLOAD}"
+        )
+        string_prefix = f"{ALGORITHM}\n{amz_date}\n{scope}\n"
+
+        urls = []
+        for key in keys:
+            # S3 paths are signed as sent, without a second round of encoding
+            path = "/" + quote(key, safe="/~")
+            canonical_request = "GET\n" + self.path_prefix + path + request_tail
+            digest = hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()
+            signature = hmac.new(
+                signing_key, (string_prefix + digest).encode("utf-8"), hashlib.sha256
+            ).hexdigest()
+            urls.append(f"{self.base_url}{path}?{query}&X-Amz-Signature={signature}")
+        return urls
+
+
+class Boto3Signer:
+    """The ``SigV4Signer`` interface on top of a boto3 client."""
+
+    def __init__(self, client, bucket):
+        self.client = client
+        self.bucket = bucket
+
+    def sign(self, key, expires_in, now=None):
+        return self.client.generate_presigned_url(
+            ClientMethod="get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=expires_in,
+        )
+
+    def sign_many(self, keys, expires_in, now=None):
+        return [self.sign(key, expires_in) for key in keys]
@@ -1,12 +1,172 @@
-from flask import current_app
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, request, g, has_request_context
+from VeePlay.main.metrics import record_presign
+
+
+class PresignedUrlCache:
+    """LRU cache of signed URLs keyed by S3 key.
+
+    Each URL is handed out for ``ttl`` seconds (a fraction of its real
+    ``ExpiresIn`` window) and then re-signed, so clients always receive a
+    URL with at least ``expires - ttl`` seconds of validity left.
+    """
+
+    def __init__(self, maxsize=10000, ttl=1800):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return ``(url, expires_at)`` or None; ``expires_at`` is monotonic."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0], entry[2]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+        return None
+
+    def set(self, key, url, expires_at):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        refresh_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (url, refresh_at, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+def _note_url_expiry(expires_at):
+    # lets response caching know how long the URLs in a body stay valid
+    if has_request_context():
+        earliest = g.get("presign_expires_at")
+        if earliest is None or expires_at < earliest:
+            g.presign_expires_at = expires_at
 
 
 def generate_presigned_url(s3_key):
-    s3 = current_app.s3_client
-    bucket_name = current_app.config["AWS_BUCKET_NAME"]
+    return generate_presigned_urls([s3_key])[0]
+
+
+def generate_presigned_urls(s3_keys):
+    """Presigned URLs for ``s3_keys``, in order.
+
+    Cache misses are signed together in one ``sign_many`` call.
+    """
+    cache = current_app.presign_cache
+    urls = []
+    missing = {}
+    earliest = None
+    for i, key in enumerate(s3_keys):
+        cached = cache.get(key)
+        if cached is None:
+            missing.setdefault(key, []).append(i)
+            urls.append(None)
+            continue
+        record_presign(hit=True)
+        urls.append(cached[0])
+        if earliest is None or cached[1] < earliest:
+            earliest = cached[1]
+
+    if missing:
+        expires_in = current_app.config["PRESIGN_EXPIRES"]
+        start = time.monotonic()
+        expires_at = start + expires_in
+        signed = current_app.s3_signer.sign_many(list(missing), expires_in)
+        seconds = (time.monotonic() - start) / len(missing)
+        for (key, positions), url in zip(missing.items(), signed):
+            record_presign(hit=False, seconds=seconds)
+            cache.set(key, url, expires_at)
+            for i in positions:
+                urls[i] = url
+        if earliest is None or expires_at < earliest:
+            earliest = expires_at
+
+    if earliest is not None:
+        _note_url_expiry(earliest)
+    return urls
+
+
+def encode_cursor(*values):
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def parse_limit(args, default, maximum):
+    """Read ``limit`` from a query-string mapping, capped at ``maximum``.
+
+    Raises ValueError on bad input.
+    """
+    try:
+        limit = int(args.get("limit", default))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return min(limit, maximum)
+
+
+def parse_page_args(args, default, maximum):
+    """Read ``limit``/``cursor`` from a query-string mapping.
+
+    Returns ``(limit, cursor_values)``; raises ValueError on bad input.
+    """
+    limit = parse_limit(args, default, maximum)
+    cursor = args.get("cursor")
+    return limit, decode_cursor(cursor) if cursor else None
+
+
+def get_limit(default=None):
+    """``parse_limit`` for the current Flask request."""
+    return parse_limit(
+        request.args,
+        default or current_app.config["PAGE_SIZE"],
+        current_app.config["MAX_PAGE_SIZE"],
+    )
+
 
-    return s3.generate_presigned_url(
-        ClientMethod="get_object",
-        Params={"Bucket": bucket_name, "Key": s3_key},
-        ExpiresIn=3600,
+def get_page_args(default=None):
+    """``parse_page_args`` for the current Flask request."""
+    return parse_page_args(
+        request.args,
+        default or current_app.config["PAGE_SIZE"],
+        current_app.config["MAX_PAGE_SIZE"],
     )
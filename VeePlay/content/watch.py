@@ -0,0 +1,137 @@
+import atexit
+import threading
+from datetime import datetime
+from sqlalchemy.dialects import postgresql, sqlite
+from VeePlay import db
+from VeePlay.models import WatchHistory
+
+UPSERT_CHUNK = 1000
+
+
+def upsert_progress(rows):
+    """INSERT ... ON CONFLICT (user_id, content_id) DO UPDATE for many rows."""
+    dialect = db.session.get_bind(WatchHistory).dialect.name
+    insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+    for start in range(0, len(rows), UPSERT_CHUNK):
+        stmt = insert(WatchHistory).values(rows[start : start + UPSERT_CHUNK])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[WatchHistory.user_id, WatchHistory.content_id],
+            set_={
+                "progress": stmt.excluded.progress,
+                "last_watched": stmt.excluded.last_watched,
+            },
+            # a late flush from another worker must not rewind newer progress
+            where=WatchHistory.last_watched <= stmt.excluded.last_watched,
+        )
+        db.session.execute(stmt)
+    db.session.commit()
+
+
+class WatchProgressBuffer:
+    """Coalesces progress ticks per (user, content) and writes them in bulk.
+
+    Only the latest tick for each pair is kept. A background thread flushes
+    every ``interval`` seconds, or as soon as ``max_pending`` pairs are
+    waiting. With ``interval`` set to 0 every tick is upserted immediately.
+
+    If a batch fails its rows are retried one by one, so a single bad row
+    (say, for content deleted since the tick was accepted) cannot hold up
+    the rest; a pair that fails ``max_attempts`` flushes in a row is logged
+    and dropped.
+    """
+
+    def __init__(self, app, interval=5.0, max_pending=500, max_attempts=3):
+        self.app = app
+        self.interval = interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self._pending = {}
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, user_id, content_id, progress):
+        row = {
+            "user_id": user_id,
+            "content_id": content_id,
+            "progress": progress,
+            "last_watched": datetime.utcnow(),
+        }
+        if self.interval <= 0:
+            upsert_progress([row])
+            return
+
+        with self._lock:
+            self._pending[(user_id, content_id)] = row
+            pending = len(self._pending)
+            if self._thread is None:
+                self._start()
+        if pending >= self.max_pending:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write the pending rows; returns how many were written."""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+        with self.app.app_context():
+            try:
+                upsert_progress(list(batch.values()))
+                failed = {}
+            except Exception:
+                db.session.rollback()
+                self.app.logger.warning(
+                    "Flushing %d watch progress rows failed, retrying one by one",
+                    len(batch),
+                )
+                failed = self._flush_rows(batch)
+
+        with self._lock:
+            for key in batch.keys() - failed.keys():
+                self._attempts.pop(key, None)
+            for key, row in failed.items():
+                attempts = self._attempts.get(key, 0) + 1
+                if attempts >= self.max_attempts:
+                    self._attempts.pop(key, None)
+                    self.app.logger.error(
+                        "Dropping watch progress for user %s, content %s "
+                        "after %d failed flushes",
+                        row["user_id"],
+                        row["content_id"],
+                        attempts,
+                    )
+                    continue
+                self._attempts[key] = attempts
+                # keep the failed row unless a newer tick replaced it
+                self._pending.setdefault(key, row)
+        return len(batch) - len(failed)
+
+    def _flush_rows(self, batch):
+        failed = {}
+        for key, row in batch.items():
+            try:
+                upsert_progress([row])
+            except Exception:
+                db.session.rollback()
+                failed[key] = row
+        return failed
+
+    def _start(self):
+        # started lazily so each forked gunicorn worker gets its own thread
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self._flush_quietly)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self._flush_quietly()
+
+    def _flush_quietly(self):
+        try:
+            self.flush()
+        except Exception:
+            self.app.logger.exception("Flushing watch progress failed")
@@ -0,0 +1,188 @@
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.sql.util import find_tables
+
+# tables whose plain SELECTs may be answered by a replica; everything else
+# (users, watch history, outboxes, tokens) always reads its own writes
+REPLICA_TABLES = frozenset({"content", "season", "episode", "video"})
+
+
+def _reads_only_replica_tables(clause):
+    if clause is None or not getattr(clause, "is_select", False):
+        return False
+    names = {table.name for table in find_tables(clause)}
+    return bool(names) and names <= REPLICA_TABLES
+
+
+class RoutingSession(Session):
+    """Sends catalog SELECTs to a healthy replica and everything else to the
+    primary.
+
+    Once a transaction has flushed a write (autoflush runs before the bind
+    is chosen), the rest of it stays on the primary so it sees its own
+    changes. A read that fails on its replica with a connection-level error
+    drops that replica and is run once more on the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self.info.get("wrote")
+            and not self.info.get("primary")
+            and has_app_context()
+            and _reads_only_replica_tables(clause)
+        ):
+            router = getattr(current_app, "replica_router", None)
+            engine = router.pick() if router is not None else None
+            if engine is not None:
+                self.info["replica"] = engine
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def execute(self, *args, **kwargs):
+        return self._with_fallback(super().execute, *args, **kwargs)
+
+    def scalar(self, *args, **kwargs):
+        return self._with_fallback(super().scalar, *args, **kwargs)
+
+    def scalars(self, *args, **kwargs):
+        return self._with_fallback(super().scalars, *args, **kwargs)
+
+    def _with_fallback(self, method, *args, **kwargs):
+        self.info.pop("replica", None)
+        try:
+            return method(*args, **kwargs)
+        except (OperationalError, InterfaceError):
+            replica = self.info.pop("replica", None)
+            if replica is None:
+                raise
+            current_app.replica_router.mark_down(replica)
+            # replica reads only happen before the transaction has written
+            # anything, so rolling back the failed connection loses nothing
+            self.rollback()
+            with use_primary(self):
+                return method(*args, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_written(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_written(session):
+    session.info.pop("wrote", None)
+
+
+@contextmanager
+def use_primary(session):
+    """Keep every query issued inside the block on the primary."""
+    session.info["primary"] = True
+    try:
+        yield
+    finally:
+        session.info.pop("primary", None)
+
+
+class ReplicaRouter:
+    """Round-robins reads over the replicas that passed their last check.
+
+    Every ``check_interval`` seconds a background thread runs ``SELECT 1``
+    on each replica and, with ``max_lag`` > 0, drops replicas whose last
+    replayed transaction is older than ``max_lag`` seconds. A replica that
+    loses its connection mid-query, or that a read fails on, is dropped
+    straight away until the next check. With no healthy replica, ``pick``
+    returns None and reads go to the primary.
+    """
+
+    def __init__(self, app, engines, check_interval=10, max_lag=0):
+        self.app = app
+        self.engines = list(engines)
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self._healthy = list(self.engines)
+        self._cycle = itertools.cycle(self._healthy) if self._healthy else None
+        self._lock = threading.Lock()
+        self._thread = None
+        for engine in self.engines:
+            event.listen(engine, "handle_error", self._on_error)
+
+    def pick(self):
+        if self._thread is None and self.engines and self.check_interval > 0:
+            self._start()
+        with self._lock:
+            if self._cycle is None:
+                return None
+            return next(self._cycle)
+
+    def check(self):
+        healthy = [engine for engine in self.engines if self._is_healthy(engine)]
+        self._set_healthy(healthy)
+        return len(healthy)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "replicas": len(self.engines),
+                "healthy": len(self._healthy),
+            }
+
+    def _is_healthy(self, engine):
+        try:
+            with engine.connect() as conn:
+                if self.max_lag <= 0:
+                    conn.execute(text("SELECT 1"))
+                    return True
+                # an idle replica that has replayed everything is not lagging,
+                # however old its last replayed transaction is
+                lag = conn.execute(
+                    text(
+                        "SELECT CASE WHEN pg_last_wal_receive_lsn() = "
+                        "pg_last_wal_replay_lsn() THEN 0 ELSE COALESCE(EXTRACT("
+                        "EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+                    )
+                ).scalar()
+                return lag <= self.max_lag
+        except Exception as e:
+            self.app.logger.warning(
+                "Replica %s failed its health check: %r", engine.url, e
+            )
+            return False
+
+    def _set_healthy(self, healthy):
+        with self._lock:
+            self._healthy = healthy
+            self._cycle = itertools.cycle(healthy) if healthy else None
+
+    def mark_down(self, engine):
+        with self._lock:
+            if engine not in self._healthy:
+                return
+            healthy = [e for e in self._healthy if e is not engine]
+        self.app.logger.warning(
+            "Replica %s is down; reading from the primary", engine.url
+        )
+        self._set_healthy(healthy)
+
+    def _on_error(self, context):
+        if context.is_disconnect and context.engine is not None:
+            self.mark_down(context.engine)
+
+    def _start(self):
+        # started lazily so each forked gunicorn worker gets its own thread
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.check_interval)
+            self.check()
@@ -0,0 +1,292 @@
+import bisect
+import contextvars
+import threading
+import time
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+FAST_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+# statements longer than this are cut in the slow-request log
+SQL_PREVIEW = 500
+
+_request_stats = contextvars.ContextVar("veeplay_request_stats", default=None)
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds", "statements")
+
+    def __init__(self, keep_statements):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements = [] if keep_statements else None
+
+
+class _Shard:
+    """Metric values written by a single thread."""
+
+    __slots__ = ("counters", "histograms")
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+
+
+class Metrics:
+    """Counters and histograms in Prometheus text format.
+
+    Every thread writes to its own shard without taking a lock; ``render``
+    sums the shards when /metrics is scraped. Values are per process, so
+    scrape each gunicorn worker (or run one) for complete numbers.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+        self._meta = {}
+
+    def describe(self, name, kind, help_text, buckets=None):
+        self._meta[name] = (kind, help_text, buckets)
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name, labels=(), value=1):
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=()):
+        buckets = self._meta[name][2]
+        histograms = self._shard().histograms
+        key = (name, labels)
+        entry = histograms.get(key)
+        if entry is None:
+            entry = histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def collect(self):
+        with self._lock:
+            shards = list(self._shards)
+        counters = {}
+        histograms = {}
+        for shard in shards:
+            # dict.copy() is atomic under the GIL, so no lock is needed
+            for key, value in shard.counters.copy().items():
+                counters[key] = counters.get(key, 0) + value
+            for key, (counts, total, n) in shard.histograms.copy().items():
+                merged = histograms.get(key)
+                if merged is None:
+                    merged = histograms[key] = [[0] * len(counts), 0.0, 0]
+                for i, c in enumerate(list(counts)):
+                    merged[0][i] += c
+                merged[1] += total
+                merged[2] += n
+        return counters, histograms
+
+    def render(self, gauges=()):
+        """Exposition text; ``gauges`` are ``(name, help, labels, value)``."""
+        counters, histograms = self.collect()
+        by_name = {}
+        for (name, labels), value in counters.items():
+            by_name.setdefault(name, []).append((labels, value))
+        for (name, labels), value in histograms.items():
+            by_name.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name in sorted(by_name):
+            kind, help_text, buckets = self._meta[name]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(by_name[name]):
+                if kind == "counter":
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                    continue
+                counts, total, n = value
+                cumulative = 0
+                for bound, count in zip((*buckets, "+Inf"), counts):
+                    cumulative += count
+                    le = labels + (("le", _number(bound)),)
+                    lines.append(f"{name}_bucket{_labels(le)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(labels)} {n}")
+
+        seen = set()
+        for name, help_text, labels, value in gauges:
+            if name not in seen:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} gauge")
+                seen.add(name)
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _number(value):
+    if isinstance(value, str):
+        return value
+    return repr(float(value)) if isinstance(value, (bool, float)) else str(value)
+
+
+metrics = Metrics()
+metrics.describe(
+    "veeplay_http_requests_total", "counter", "Requests by endpoint and status."
+)
+metrics.describe(
+    "veeplay_http_request_duration_seconds",
+    "histogram",
+    "Time from before_request to after_request.",
+    LATENCY_BUCKETS,
+)
+metrics.describe(
+    "veeplay_http_request_db_queries",
+    "histogram",
+    "SQL statements executed per request.",
+    COUNT_BUCKETS,
+)
+metrics.describe(
+    "veeplay_http_request_db_seconds",
+    "histogram",
+    "Time spent in SQL statements per request.",
+    LATENCY_BUCKETS,
+)
+metrics.describe(
+    "veeplay_db_queries_total",
+    "counter",
+    "SQL statements executed, in or out of requests.",
+)
+metrics.describe(
+    "veeplay_db_query_seconds",
+    "histogram",
+    "Duration of single SQL statements.",
+    FAST_BUCKETS,
+)
+metrics.describe(
+    "veeplay_db_pool_wait_seconds",
+    "histogram",
+    "Time spent waiting for a pooled connection.",
+    FAST_BUCKETS,
+)
+metrics.describe(
+    "veeplay_presign_total", "counter", "Presigned URL lookups by cache result."
+)
+metrics.describe(
+    "veeplay_presign_seconds",
+    "histogram",
+    "Time to sign a URL on a presign cache miss.",
+    FAST_BUCKETS,
+)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.observe("veeplay_db_pool_wait_seconds", time.perf_counter() - start)
+
+
+def record_presign(hit, seconds=None):
+    metrics.inc("veeplay_presign_total", (("result", "hit" if hit else "miss"),))
+    if seconds is not None:
+        metrics.observe("veeplay_presign_seconds", seconds)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("veeplay_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("veeplay_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    metrics.inc("veeplay_db_queries_total")
+    metrics.observe("veeplay_db_query_seconds", elapsed)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        if stats.statements is not None:
+            stats.statements.append((elapsed, statement[:SQL_PREVIEW]))
+
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def init_app(app, engines, slow_request_ms=0):
+    """Hook request timing into ``app`` and SQL timing into ``engines``."""
+    for engine in engines:
+        instrument_engine(engine)
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_token = _request_stats.set(RequestStats(slow_request_ms > 0))
+
+    @app.after_request
+    def record_request(response):
+        _finish(app, response.status_code, slow_request_ms)
+        return response
+
+    @app.teardown_request
+    def record_failed_request(exc):
+        # after_request does not run when a view raises
+        if "metrics_start" in g:
+            _finish(app, 500, slow_request_ms)
+
+
+def _finish(app, status, slow_request_ms):
+    start = g.pop("metrics_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    stats = _request_stats.get()
+    _request_stats.reset(g.pop("metrics_token"))
+
+    endpoint = request.endpoint or "unmatched"
+    labels = (("endpoint", endpoint), ("method", request.method))
+    metrics.inc("veeplay_http_requests_total", labels + (("status", str(status)),))
+    metrics.observe("veeplay_http_request_duration_seconds", elapsed, labels)
+    if stats is None:
+        return
+    metrics.observe("veeplay_http_request_db_queries", stats.queries, labels)
+    metrics.observe("veeplay_http_request_db_seconds", stats.db_seconds, labels)
+
+    if slow_request_ms > 0 and elapsed * 1000 >= slow_request_ms:
+        statements = "".join(
+            f"\n  [{seconds * 1000:.1f} ms] {sql}" for seconds, sql in stats.statements
+        )
+        app.logger.warning(
+            "Slow request %s %s: %.1f ms, %d queries, %.1f ms in SQL%s",
+            request.method,
+            request.full_path.rstrip("?"),
+            elapsed * 1000,
+            stats.queries,
+            stats.db_seconds * 1000,
+            statements,
+        )
@@ -1,71 +1,41 @@
-from flask import Blueprint, jsonify
-from VeePlay.models import Content
-from VeePlay.content.utils import generate_presigned_url
+from flask import Blueprint, Response, current_app, jsonify
+from VeePlay.content.utils import get_page_args
+from VeePlay.content.catalog import get_catalog
+from VeePlay.content.serializers import (
+    content_view,
+    render_list,
+    json_response,
+    wants_ndjson,
+    ndjson_page_args,
+    ndjson_response,
+)
+from VeePlay.main.utils import cached_response
+from VeePlay.main.metrics import metrics
 
 main = Blueprint("main", __name__)
 
 
-def serialize_video(video):
-    return {
-        "id": video.id,
-        "s3_path": generate_presigned_url(video.s3_path),
-        "thumbnail_url": video.thumbnail_path,
-        "duration": video.duration,
-    }
-
-
-def serialize_episode(episode):
-    return {
-        "id": episode.id,
-        "title": episode.title,
-        "description": episode.description,
-        "episode_no": episode.episode_no,
-        "video": {
-            "s3_path": generate_presigned_url(episode.s3_path),
-            "thumbnail_url": generate_presigned_url(episode.thumbnail_path),
-            "duration": episode.duration,
-        },
-    }
-
-
-def serialize_season(season):
-    return {
-        "id": season.id,
-        "season_number": season.season_number,
-        "episodes": [serialize_episode(e) for e in season.episodes],
-    }
-
-
-def serialize_content(content):
-    return {
-        "id": content.id,
-        "name": content.name,
-        "description": content.description,
-        "type": content.type,
-        "poster": generate_presigned_url(content.poster),
-        "trailer": generate_presigned_url(content.trailer),
-        "genre": content.genre,
-        "seasons": (
-            [serialize_season(s) for s in content.seasons]
-            if content.type.lower() == "s"  # 'S' for show
-            else []
-        ),
-        "video": (
-            serialize_video(content.movie_video)
-            if content.type.lower() == "m" and content.movie_video
-            else None
-        ),
-    }
-
-
 @main.route("/")
 @main.route("/home")
+@cached_response
 def home():
-    contents = Content.query.all()
-    enumerated = [serialize_content(c) for c in contents]
-    return (
-        jsonify({"status": "success", "contents": enumerated}),
-        200,
+    catalog = get_catalog()
+    try:
+        if wants_ndjson():
+            limit, cursor = ndjson_page_args()
+            entries = catalog.contents.after(cursor, limit)
+            return ndjson_response(catalog, content_view, entries)
+        limit, cursor = get_page_args()
+        contents, next_cursor = catalog.contents.page(limit, cursor)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    return json_response(
+        {
+            "status": "success",
+            "contents": render_list(catalog, content_view, contents),
+            "next_cursor": next_cursor,
+        }
     )
 
 
@@ -80,22 +50,26 @@ def about():
                     "POST   /register                            - Register a new user",
                     "POST   /login                               - Login and get JWT token",
                     "GET    /account                             - Get current user's account details",
+                    "GET    /account/history?limit=&cursor=      - Paginated watch history",
                     "PUT    /account/<email>                     - Edit user account by email",
                     "POST   /forgot-password                     - Send password reset link",
                     "POST   /reset-password/<token>              - Reset password using token",
-                    "GET    /shows                               - List all shows",
-                    "GET    /movies                              - List all movies",
+                    "GET    /shows?limit=&cursor=                - List shows (paginated)",
+                    "GET    /movies?limit=&cursor=               - List movies (paginated)",
                     "GET    /shows/<show_name>                   - Get details of a specific show",
                     "GET    /movies/<movie_name>                 - Get details of a specific movie",
                     "GET    /movies/<movie_name>/video           - Get video for a movie (requires auth)",
                     "GET    /shows/<show>/<season>/<episode>     - Get a specific episode (requires auth)",
+                    "POST   /playback/urls                       - Signed video URLs for many episode/content ids (requires auth)",
                     "GET    /continue-watching                   - Get user's continue watching list (requires auth)",
                     "POST   /watch_history                       - Update watch history (requires auth)",
-                    "GET    /search?q=query                      - Search content by name",
-                    "GET    /filter?genre=genre                  - Filter content by genre",
-                    "GET    /                                     - Homepage with all content",
+                    "GET    /search?q=query                      - Ranked search over names and descriptions",
+                    "GET    /filter?genre=a,b&mode=any|all       - Filter content by one or more genres",
+                    "GET    /genres                              - Genre facet counts with content ids",
+                    "GET    /?limit=&cursor=                      - Homepage content (paginated)",
                     "GET    /home                                 - Same as /",
                     "GET    /about                                - About this API and route listing",
+                    "GET    /metrics                              - Prometheus metrics for this process",
                 ],
             }
         ),
@@ -114,3 +88,54 @@ def status():
         ),
         200,
     )
+
+
+def _cache_gauges():
+    caches = {
+        "presign": current_app.presign_cache,
+        "response": current_app.response_cache,
+        "user": current_app.user_cache,
+    }
+    if current_app.playback is not None:
+        caches["playback"] = current_app.playback
+    stats = {name: cache.stats() for name, cache in caches.items()}
+    fields = {
+        "size": "Entries held by each cache.",
+        "hits": "Cache hits since start.",
+        "misses": "Cache misses since start.",
+        "hit_rate": "Fraction of lookups answered by each cache.",
+    }
+    for field, help_text in fields.items():
+        for name, values in stats.items():
+            yield f"veeplay_cache_{field}", help_text, (("cache", name),), values[field]
+    replicas = current_app.replica_router.stats()
+    yield "veeplay_db_replicas", "Configured read replicas.", (), replicas["replicas"]
+    yield (
+        "veeplay_db_replicas_healthy",
+        "Read replicas passing health checks.",
+        (),
+        replicas["healthy"],
+    )
+    catalog = current_app.catalog.stats()
+    yield "veeplay_catalog_version", "Catalog snapshot builds.", (), catalog["version"]
+    yield "veeplay_catalog_contents", "Titles in the catalog.", (), catalog["contents"]
+    yield (
+        "veeplay_catalog_templates",
+        "Pre-encoded templates in the current snapshot.",
+        (),
+        catalog["templates"],
+    )
+    yield (
+        "veeplay_catalog_age_seconds",
+        "Seconds since the snapshot was built.",
+        (),
+        catalog["age"],
+    )
+
+
+@main.route("/metrics")
+def prometheus_metrics():
+    return Response(
+        metrics.render(_cache_gauges()),
+        mimetype="text/plain; version=0.0.4",
+    )
@@ -0,0 +1,127 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import wraps
+from flask import current_app, request, g, Response
+from VeePlay.content.catalog import get_catalog
+from VeePlay.content.serializers import wants_ndjson
+
+# never hand out a body whose signed URLs expire within this many seconds
+URL_EXPIRY_MARGIN = 60
+
+CachedResponse = namedtuple(
+    "CachedResponse", "body etag mimetype expires_at catalog_version"
+)
+
+
+class ResponseCache:
+    """LRU of serialized response bodies keyed by route and query string."""
+
+    def __init__(self, maxsize=1000, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, catalog_version):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if (
+                entry is not None
+                and entry.expires_at > now
+                and entry.catalog_version == catalog_version
+            ):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+        return None
+
+    def set(self, key, entry):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+def _conditional_response(entry):
+    if request.if_none_match.contains(entry.etag):
+        response = Response(status=304)
+    else:
+        response = Response(entry.body, mimetype=entry.mimetype)
+    response.set_etag(entry.etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = max(0, int(entry.expires_at - time.monotonic()))
+    response.vary.add("Accept")
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def cached_response(view):
+    """Cache a public catalog view's 200 responses and answer If-None-Match.
+
+    Entries expire after RESPONSE_CACHE_TTL seconds, before any presigned URL
+    in the body does, and as soon as a new catalog snapshot is loaded. They
+    are keyed by the representation negotiated from ``Accept``, not the raw
+    header, so every client asking for JSON shares one entry.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        cache = current_app.response_cache
+        version = get_catalog().version
+        key = (
+            request.path,
+            tuple(sorted(request.args.items(multi=True))),
+            wants_ndjson(),
+        )
+        entry = cache.get(key, version)
+        if entry is not None:
+            return _conditional_response(entry)
+
+        g.presign_expires_at = None
+        response = current_app.make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.is_streamed:
+            return response
+
+        now = time.monotonic()
+        expires_at = now + cache.ttl
+        if g.presign_expires_at is not None:
+            expires_at = min(expires_at, g.presign_expires_at - URL_EXPIRY_MARGIN)
+        body = response.get_data()
+        entry = CachedResponse(
+            body,
+            hashlib.blake2b(body, digest_size=16).hexdigest(),
+            response.mimetype,
+            expires_at,
+            version,
+        )
+        if expires_at > now:
+            cache.set(key, entry)
+        return _conditional_response(entry)
+
+    return wrapper
@@ -1,13 +1,19 @@
-from VeePlay import db, login_manager
+from VeePlay import db, login_manager, jwt
 from flask_login import UserMixin
 from sqlalchemy.dialects.postgresql import ARRAY
 from itsdangerous import URLSafeTimedSerializer as Serializer
 from flask import current_app
+from datetime import datetime
 
 
 @login_manager.user_loader
 def user_loader(user_id):
-    return User.query.get(int(user_id))
+    return current_app.user_cache.get(user_id)
+
+
+@jwt.user_lookup_loader
+def jwt_user_loader(jwt_header, jwt_data):
+    return current_app.user_cache.get(jwt_data["sub"])
 
 
 class User(db.Model, UserMixin):
@@ -15,22 +21,34 @@ class User(db.Model, UserMixin):
     username = db.Column(db.String(20), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     img_file = db.Column(db.String(20), nullable=False, default="default.jpg")
+    img_pending = db.Column(db.String(16))
+    img_status = db.Column(db.String(10), nullable=False, default="ready")
     password = db.Column(db.String(60), nullable=False)
 
     def __repr__(self):
         return f"User('{self.username}', '{self.email}', '{self.img_file}')"
 
-    def get_reset_token(self, expires_sec=900):
-        s = Serializer(current_app.config["SECRET_KEY"], expires_sec)
-        return s.dumps({"user_id": self.id}).decode("utf-8")
+    def get_reset_token(self):
+        s = Serializer(current_app.config["SECRET_KEY"], salt="reset-password")
+        return s.dumps({"user_id": self.id})
 
     @staticmethod
     def verify_reset_token(token):
-        s = Serializer(current_app.config["SECRET_KEY"])
+        """The token's user, or None if it is invalid or expired.
+
+        Raises ResetTokenUsed if the token was already redeemed.
+        """
+        from VeePlay.users.tokens import ResetTokenUsed
+
+        s = Serializer(current_app.config["SECRET_KEY"], salt="reset-password")
         try:
-            user_id = s.loads(token)["user_id"]
+            user_id = s.loads(token, max_age=current_app.config["RESET_TOKEN_MAX_AGE"])[
+                "user_id"
+            ]
         except:
             return None
+        if current_app.used_tokens.is_used(token):
+            raise ResetTokenUsed()
         return User.query.get(user_id)
 
 
@@ -41,11 +59,18 @@ class Content(db.Model):
     type = db.Column(db.String(1), nullable=False)
     poster = db.Column(db.String(120), nullable=False)
     trailer = db.Column(db.String(120), nullable=False)
-    genre = db.Column(ARRAY(db.String), nullable=False)
+    # JSON on SQLite so benchmarks/load_test.py can run without Postgres;
+    # genre filtering (/filter, /genres) still needs Postgres
+    genre = db.Column(ARRAY(db.String).with_variant(db.JSON, "sqlite"), nullable=False)
     movie_video_id = db.Column(db.Integer, db.ForeignKey("video.id"), nullable=True)
     movie_video = db.relationship("Video", foreign_keys=[movie_video_id], uselist=False)
     seasons = db.relationship("Season", backref="content", lazy=True)
 
+    __table_args__ = (
+        db.Index("ix_content_genre", genre, postgresql_using="gin"),
+        db.UniqueConstraint("type", "name", name="uq_content_type_name"),
+    )
+
     def __repr__(self):
         return f"<Content(name='{self.name}', type='{self.type}')>"
 
@@ -56,6 +81,12 @@ class Season(db.Model):
     content_id = db.Column(db.Integer, db.ForeignKey("content.id"), nullable=False)
     episodes = db.relationship("Episode", backref="season", lazy=True)
 
+    __table_args__ = (
+        db.UniqueConstraint(
+            "content_id", "season_number", name="uq_season_content_number"
+        ),
+    )
+
     def __repr__(self):
         return f"<Season(season_number={self.season_number}, content_id={self.content_id})>"
 
@@ -70,13 +101,17 @@ class Episode(db.Model):
     season_id = db.Column(db.Integer, db.ForeignKey("season.id"), nullable=False)
     duration = db.Column(db.Integer, nullable=False)
 
+    __table_args__ = (
+        db.UniqueConstraint("season_id", "episode_no", name="uq_episode_season_number"),
+    )
+
     def __repr__(self):
         return f"<Episode(title='{self.title}', episode_no={self.episode_no}, season_id={self.season_id})>"
 
 
 class Video(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    s3_path = db.Column(db.String(200), nullable=False)
+    s3_path = db.Column(db.String(200), nullable=False, unique=True)
     thumbnail_path = db.Column(db.String(200), nullable=False)
     duration = db.Column(db.Integer)
 
@@ -84,21 +119,66 @@ class Video(db.Model):
         return f"<Video(id={self.id}, s3_path='{self.s3_path}')>"
 
 
+class CatalogVersion(db.Model):
+    """Single row bumped by every catalog write, in the writer's transaction.
+
+    Lets each process notice writes made by others (and by ingest-catalog,
+    which bypasses the ORM) without waiting for CATALOG_TTL.
+    """
+
+    __tablename__ = "catalog_version"
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"CatalogVersion({self.version})"
+
+
 class WatchHistory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     content_id = db.Column(db.Integer, db.ForeignKey("content.id"), nullable=False)
     progress = db.Column(db.Integer, default=0)
+    last_watched = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     user = db.relationship("User", backref="watch_history")
     content = db.relationship("Content", backref="watch_history")
 
+    __table_args__ = (
+        db.UniqueConstraint(
+            "user_id", "content_id", name="uq_watch_history_user_content"
+        ),
+        db.Index("ix_watch_history_user_last_watched", user_id, last_watched.desc()),
+    )
+
     def __repr__(self):
         return f"<WatchHistory(user_id={self.user_id}, content_id={self.content_id}, progress={self.progress})>"
 
 
+class MailOutbox(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default="pending")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+
+    __table_args__ = (db.Index("ix_mail_outbox_due", status, next_attempt_at),)
+
+    def __repr__(self):
+        return f"<MailOutbox(id={self.id}, recipient='{self.recipient}', status='{self.status}')>"
+
+
 class UsedTokens(db.Model):
+    __tablename__ = "used_tokens"
+
     id = db.Column(db.Integer, primary_key=True)
-    usedToken = db.Column(db.String(100), nullable=False)
+    digest = db.Column(db.String(64), nullable=False, unique=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
 
     def __repr__(self):
-        return f"UsedTokens('{self.token}')"
+        return f"UsedTokens('{self.digest}', expires_at={self.expires_at})"
@@ -0,0 +1,329 @@
+import io
+import os
+import secrets
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import url_for
+from PIL import Image, ImageOps
+from VeePlay import db
+from VeePlay.models import User
+
+STREAM_CHUNK = 64 * 1024
+# Pillow's encoder settings per output format: (extension, save kwargs)
+FORMATS = {
+    "webp": ("webp", {"format": "WEBP", "quality": 80, "method": 4}),
+    "jpeg": ("jpg", {"format": "JPEG", "quality": 85, "optimize": True}),
+}
+CONTENT_TYPES = {"webp": "image/webp", "jpg": "image/jpeg"}
+DEFAULT_AVATAR = "default.jpg"
+
+
+class AvatarRejected(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class AvatarBusy(Exception):
+    pass
+
+
+class LocalAvatarStore:
+    """Writes avatar variants to a directory served under ``/static``."""
+
+    def __init__(self, root, static_prefix="profile_pics"):
+        self.root = root
+        self.static_prefix = static_prefix
+        os.makedirs(root, exist_ok=True)
+
+    def put(self, name, data, content_type):
+        path = os.path.join(self.root, name)
+        tmp = path + ".part"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def delete(self, name):
+        try:
+            os.remove(os.path.join(self.root, name))
+        except FileNotFoundError:
+            pass
+
+    def url(self, name):
+        return url_for(
+            "static", filename=f"{self.static_prefix}/{name}", _external=True
+        )
+
+
+class S3AvatarStore:
+    """Stores avatar variants in an S3-compatible bucket under ``prefix``."""
+
+    def __init__(self, client, bucket, prefix="profile_pics/"):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def put(self, name, data, content_type):
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self.prefix + name,
+            Body=data,
+            ContentType=content_type,
+            CacheControl="public, max-age=31536000, immutable",
+        )
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + name)
+
+    def url(self, name):
+        from VeePlay.content.utils import generate_presigned_url
+
+        return generate_presigned_url(self.prefix + name)
+
+
+def variant_name(base, size, ext):
+    return f"{base}_{size}.{ext}"
+
+
+def stream_to_staging(upload, staging_dir, max_bytes):
+    """Copy an upload to a staging file in chunks, enforcing ``max_bytes``."""
+    fd, path = tempfile.mkstemp(prefix="avatar-", dir=staging_dir)
+    written = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = upload.stream.read(STREAM_CHUNK)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise AvatarRejected("Image file is too large", 413)
+                f.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    if not written:
+        os.remove(path)
+        raise AvatarRejected("Image file is empty")
+    return path
+
+
+def check_header(path, max_pixels):
+    """Reject files that are not images or would decode past ``max_pixels``.
+
+    Only the header is parsed, so this is cheap enough for the request thread.
+    """
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise AvatarRejected("Image dimensions are too large", 413)
+    except Exception:
+        raise AvatarRejected("File is not a supported image")
+    if width * height > max_pixels:
+        raise AvatarRejected("Image dimensions are too large", 413)
+
+
+def render_variants(path, sizes, formats, max_pixels):
+    """Decode the staged file once and encode it at every size and format.
+
+    Returns ``{(size, ext): (bytes, content_type)}``.
+    """
+    largest = max(sizes)
+    with Image.open(path) as img:
+        if img.width * img.height > max_pixels:
+            raise AvatarRejected("Image dimensions are too large", 413)
+        # JPEG can decode at 1/2, 1/4 or 1/8 scale, which skips most of the
+        # IDCT work for large photos; a no-op for other formats
+        img.draft("RGB", (largest, largest))
+        img = ImageOps.exif_transpose(img)
+        img = img.convert("RGB")
+
+    side = min(img.size)
+    img = ImageOps.fit(img, (side, side))
+
+    variants = {}
+    for size in sorted(sizes, reverse=True):
+        if img.width > size:
+            img = img.resize((size, size), Image.LANCZOS)
+        for fmt in formats:
+            ext, options = FORMATS[fmt]
+            buf = io.BytesIO()
+            img.save(buf, **options)
+            variants[(size, ext)] = (buf.getvalue(), CONTENT_TYPES[ext])
+    return variants
+
+
+class AvatarProcessor:
+    """Stages avatar uploads and renders them on a background thread pool.
+
+    ``submit`` streams the upload to ``staging_dir``, checks the header for
+    decompression bombs and marks the user's new avatar as pending; decoding,
+    resizing to every entry in ``sizes`` and encoding to every format happens
+    on one of ``workers`` threads, which then store the variants and switch
+    ``User.img_file`` over. Pillow releases the GIL while decoding and
+    resampling, so threads are enough here. At most ``workers + max_queue``
+    jobs may be in flight; past that ``submit`` raises AvatarBusy.
+    ``workers=0`` processes during the request.
+    """
+
+    def __init__(
+        self,
+        app,
+        store,
+        staging_dir=None,
+        sizes=(64, 125, 256),
+        formats=("webp", "jpeg"),
+        max_bytes=10 * 1024 * 1024,
+        max_pixels=40_000_000,
+        workers=2,
+        max_queue=16,
+    ):
+        self.app = app
+        self.store = store
+        self.staging_dir = staging_dir or tempfile.gettempdir()
+        self.sizes = tuple(sizes)
+        self.formats = tuple(formats)
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + max_queue)
+        self._executor = None
+        self._lock = threading.Lock()
+        os.makedirs(self.staging_dir, exist_ok=True)
+
+    def submit(self, user, upload):
+        """Stage ``upload`` for ``user`` and return the pending avatar name.
+
+        Commits ``user.img_pending`` before handing the job to a worker.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise AvatarBusy()
+        try:
+            path = stream_to_staging(upload, self.staging_dir, self.max_bytes)
+            try:
+                check_header(path, self.max_pixels)
+                base = secrets.token_hex(8)
+                user.img_pending = base
+                user.img_status = "pending"
+                db.session.commit()
+            except BaseException:
+                os.remove(path)
+                raise
+        except BaseException:
+            self._slots.release()
+            raise
+
+        if self.workers <= 0:
+            try:
+                self._run(user.id, base, path)
+            finally:
+                self._slots.release()
+            db.session.refresh(user)
+            return base
+        future = self._get_executor().submit(self._run, user.id, base, path)
+        future.add_done_callback(lambda _: self._slots.release())
+        return base
+
+    def urls(self, user):
+        """Map each size to its URL(s) for the user's current avatar."""
+        name = user.img_file or DEFAULT_AVATAR
+        if "." in name:
+            # files saved before variants existed live in static/profile_pics
+            url = url_for("static", filename=f"profile_pics/{name}", _external=True)
+            return {str(size): {"jpg": url} for size in self.sizes}
+        return self._urls_for(name)
+
+    def pending_urls(self, base):
+        """URLs the pending avatar will be served from once it is ready."""
+        return self._urls_for(base)
+
+    def _urls_for(self, base):
+        return {
+            str(size): {
+                FORMATS[fmt][0]: self.store.url(
+                    variant_name(base, size, FORMATS[fmt][0])
+                )
+                for fmt in self.formats
+            }
+            for size in self.sizes
+        }
+
+    def _run(self, user_id, base, path):
+        try:
+            with self.app.app_context():
+                self._process(user_id, base, path)
+        except Exception:
+            self.app.logger.exception("Processing avatar %s failed", base)
+
+    def _process(self, user_id, base, path):
+        try:
+            variants = render_variants(path, self.sizes, self.formats, self.max_pixels)
+            for (size, ext), (data, content_type) in variants.items():
+                self.store.put(variant_name(base, size, ext), data, content_type)
+        except Exception:
+            self._finish(user_id, base, failed=True)
+            raise
+        finally:
+            os.remove(path)
+
+        old = self._finish(user_id, base, failed=False)
+        if old is None:
+            # superseded by a newer upload; drop what we just stored
+            self._delete(base)
+        elif old != DEFAULT_AVATAR:
+            self._delete(old)
+
+    def _finish(self, user_id, base, failed):
+        """Promote or fail the pending avatar if it is still ``base``.
+
+        Returns the replaced ``img_file`` on success, else None.
+        """
+        user = db.session.get(User, user_id, with_for_update=True)
+        if user is None or user.img_pending != base:
+            db.session.rollback()
+            return None
+        old = user.img_file
+        user.img_pending = None
+        if failed:
+            user.img_status = "failed"
+        else:
+            user.img_file = base
+            user.img_status = "ready"
+        db.session.commit()
+        self.app.user_cache.invalidate(user_id)
+        return old
+
+    def _delete(self, name):
+        if "." in name:
+            names = [name]
+            store = LocalAvatarStore(
+                os.path.join(self.app.root_path, "static/profile_pics")
+            )
+        else:
+            names = [
+                variant_name(name, size, FORMATS[fmt][0])
+                for size in self.sizes
+                for fmt in self.formats
+            ]
+            store = self.store
+        for n in names:
+            try:
+                store.delete(n)
+            except Exception:
+                self.app.logger.warning("Could not delete avatar file %s", n)
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="avatar"
+                    )
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
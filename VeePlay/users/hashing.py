@@ -0,0 +1,104 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+
+# bcrypt only looks at the first 72 bytes; older bcrypt releases truncated
+# silently, newer ones raise, so truncate to keep existing hashes valid
+BCRYPT_MAX_BYTES = 72
+
+
+class HashingBusy(Exception):
+    pass
+
+
+def _encode(password):
+    return password.encode("utf-8")[:BCRYPT_MAX_BYTES]
+
+
+def hash_password(password, rounds):
+    return bcrypt.hashpw(_encode(password), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def check_password(pw_hash, password):
+    return bcrypt.checkpw(_encode(password), pw_hash.encode("utf-8"))
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded process pool instead of the request thread.
+
+    At most ``workers + max_queue`` hashes may be running or waiting; past
+    that, calls raise HashingBusy immediately so the request can be turned
+    away with a 429 instead of tying up the web worker. A pool broken by a
+    dead worker is replaced and the call retried once. ``workers=0`` hashes
+    inline (useful for development and the CLI).
+    """
+
+    def __init__(self, workers=2, max_queue=4, rounds=12, timeout=10):
+        self.workers = workers
+        self.rounds = rounds
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def generate_password_hash(self, password):
+        return self._run(hash_password, password, self.rounds)
+
+    def check_password_hash(self, pw_hash, password):
+        return self._run(check_password, pw_hash, password)
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        try:
+            return self._attempt(fn, *args)
+        except BrokenProcessPool:
+            # a worker died (OOM kill, segfault) and took the pool with it;
+            # the broken pool has been dropped, so this runs on a fresh one
+            return self._attempt(fn, *args)
+
+    def _attempt(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            executor = self._get_executor()
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._discard_executor(executor)
+            raise
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise HashingBusy()
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            raise
+
+    def _get_executor(self):
+        # created on first use so every gunicorn worker owns its pool; spawn
+        # avoids forking a process that already runs threads
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+        return self._executor
+
+    def _discard_executor(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
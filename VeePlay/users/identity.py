@@ -0,0 +1,153 @@
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask_login import UserMixin
+from VeePlay import db
+from VeePlay.models import User
+
+_UserFields = namedtuple(
+    "_UserFields", "id username email img_file img_pending img_status"
+)
+
+
+class UserRecord(UserMixin, _UserFields):
+    """Read-only snapshot of the ``User`` columns needed to serve a request."""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(
+            user.id,
+            user.username,
+            user.email,
+            user.img_file,
+            user.img_pending,
+            user.img_status,
+        )
+
+
+class RedisUserBackend:
+    """Shares user records between processes through Redis.
+
+    Needs the optional ``redis`` package.
+    """
+
+    def __init__(self, url, ttl=30, prefix="veeplay:user:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("USER_CACHE_REDIS_URL is set but redis is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, user_id):
+        raw = self.client.get(f"{self.prefix}{user_id}")
+        return UserRecord(*json.loads(raw)) if raw else None
+
+    def set(self, record):
+        self.client.set(
+            f"{self.prefix}{record.id}", json.dumps(list(record)), ex=self.ttl
+        )
+
+    def delete(self, user_id):
+        self.client.delete(f"{self.prefix}{user_id}")
+
+
+class UserCache:
+    """Short-lived LRU of ``UserRecord`` keyed by user id.
+
+    Lookups go to the per-process LRU, then the optional shared ``backend``,
+    then the database. Writers call ``invalidate`` after committing; other
+    processes only see the change once their local entry is ``ttl`` seconds
+    old, so keep ``ttl`` short. Missing users are not cached.
+    """
+
+    def __init__(self, maxsize=10000, ttl=30, backend=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        user_id = int(user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[user_id]
+
+        record = self._shared_get(user_id)
+        if record is not None:
+            with self._lock:
+                self.shared_hits += 1
+            self._store(record)
+            return record
+
+        with self._lock:
+            self.misses += 1
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        record = UserRecord.from_user(user)
+        self._store(record)
+        self._shared_call("set", record)
+        return record
+
+    def invalidate(self, user_id):
+        user_id = int(user_id)
+        with self._lock:
+            self._entries.pop(user_id, None)
+        self._shared_call("delete", user_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.shared_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.shared_hits) / total if total else 0.0,
+            }
+
+    def _store(self, record):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[record.id] = (record, time.monotonic() + self.ttl)
+            self._entries.move_to_end(record.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _shared_get(self, user_id):
+        if self.backend is None:
+            return None
+        try:
+            return self.backend.get(user_id)
+        except Exception:
+            # the shared cache is an optimisation; fall back to the database
+            return None
+
+    def _shared_call(self, method, arg):
+        if self.backend is None:
+            return
+        try:
+            getattr(self.backend, method)(arg)
+        except Exception:
+            pass
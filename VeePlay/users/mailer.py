@@ -0,0 +1,165 @@
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from flask_mail import Message
+from VeePlay import db, mail
+from VeePlay.models import MailOutbox
+
+SWEEP_BATCH = 100
+# how long a claimed message is hidden from other workers while it is sent
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+class MailQueue:
+    """Outbox-backed mail dispatch.
+
+    ``enqueue`` stores the message in the ``mail_outbox`` table and hands its
+    id to background workers, so the request returns as soon as the row is
+    committed. Each worker keeps one SMTP connection open between messages
+    and closes it after ``poll_interval`` idle seconds, when it also sweeps
+    the outbox for messages that are due for a retry (including ones left
+    behind by a restarted process). A message is claimed with a conditional
+    UPDATE before sending, so several workers or processes never send the
+    same row twice. Failures are retried with exponential backoff up to
+    ``max_attempts`` times.
+    """
+
+    def __init__(
+        self,
+        app,
+        sender,
+        workers=1,
+        max_attempts=5,
+        retry_backoff=30,
+        poll_interval=30,
+    ):
+        self.app = app
+        self.sender = sender
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.poll_interval = poll_interval
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def enqueue(self, recipient, subject, body):
+        row = MailOutbox(recipient=recipient, subject=subject, body=body)
+        db.session.add(row)
+        db.session.commit()
+
+        if self.workers <= 0:
+            self._close(self._deliver(row.id, None))
+        else:
+            self.start()
+            self._queue.put(row.id)
+        return row.id
+
+    def start(self):
+        if len(self._threads) >= self.workers:
+            return
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        connection = None
+        last_sweep = time.monotonic()
+        while True:
+            if time.monotonic() - last_sweep >= self.poll_interval:
+                self._sweep()
+                last_sweep = time.monotonic()
+            try:
+                outbox_id = self._queue.get(timeout=self.poll_interval)
+            except queue.Empty:
+                connection = self._close(connection)
+                continue
+
+            try:
+                with self.app.app_context():
+                    connection = self._deliver(outbox_id, connection)
+            except Exception:
+                self.app.logger.exception("Mail worker failed on outbox %s", outbox_id)
+                connection = self._close(connection)
+
+    def _sweep(self):
+        try:
+            with self.app.app_context():
+                due = (
+                    db.session.query(MailOutbox.id)
+                    .filter(
+                        MailOutbox.status == "pending",
+                        MailOutbox.next_attempt_at <= datetime.utcnow(),
+                    )
+                    .order_by(MailOutbox.next_attempt_at)
+                    .limit(SWEEP_BATCH)
+                    .all()
+                )
+        except Exception:
+            self.app.logger.exception("Sweeping the mail outbox failed")
+            return
+        for (outbox_id,) in due:
+            self._queue.put(outbox_id)
+
+    def _claim(self, outbox_id):
+        now = datetime.utcnow()
+        claimed = MailOutbox.query.filter(
+            MailOutbox.id == outbox_id,
+            MailOutbox.status == "pending",
+            MailOutbox.next_attempt_at <= now,
+        ).update(
+            {
+                MailOutbox.attempts: MailOutbox.attempts + 1,
+                MailOutbox.next_attempt_at: now + CLAIM_LEASE,
+            },
+            synchronize_session=False,
+        )
+        db.session.commit()
+        return db.session.get(MailOutbox, outbox_id) if claimed else None
+
+    def _deliver(self, outbox_id, connection):
+        row = self._claim(outbox_id)
+        if row is None:
+            return connection
+
+        msg = Message(
+            row.subject, sender=self.sender, recipients=[row.recipient], body=row.body
+        )
+        try:
+            if connection is None:
+                connection = mail.connect()
+                connection.__enter__()
+            connection.send(msg)
+        except Exception as e:
+            connection = self._close(connection)
+            self._failed(row, e)
+            return connection
+
+        row.status = "sent"
+        row.sent_at = datetime.utcnow()
+        row.last_error = None
+        db.session.commit()
+        return connection
+
+    def _failed(self, row, error):
+        row.last_error = repr(error)
+        if row.attempts >= self.max_attempts:
+            row.status = "failed"
+        else:
+            delay = self.retry_backoff * 2 ** (row.attempts - 1)
+            row.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+        db.session.commit()
+        self.app.logger.warning(
+            "Sending outbox %s failed (attempt %s): %r", row.id, row.attempts, error
+        )
+
+    def _close(self, connection):
+        if connection is not None:
+            try:
+                connection.__exit__(None, None, None)
+            except Exception:
+                pass
+        return None
@@ -1,13 +1,72 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from VeePlay.models import User, WatchHistory, UsedTokens
-from VeePlay import mail, db, bcrypt
-from VeePlay.users.utils import savePicture, send_reset_emails
-from VeePlay.content.utils import generate_presigned_url
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import (
+    create_access_token,
+    jwt_required,
+    get_jwt_identity,
+    current_user,
+)
+from sqlalchemy import tuple_
+from werkzeug.exceptions import RequestEntityTooLarge
+from VeePlay.models import User, WatchHistory, Content
+from VeePlay import mail, db
+from VeePlay.users.hashing import HashingBusy
+from VeePlay.users.avatars import AvatarBusy, AvatarRejected
+from VeePlay.users.tokens import ResetTokenUsed
+from VeePlay.users.utils import send_reset_emails
+from VeePlay.content.utils import generate_presigned_url, get_page_args, encode_cursor
 
 users = Blueprint("users", __name__)
 
 
+@users.before_app_request
+def start_mail_workers():
+    # idempotent; also picks up outbox retries left by a previous process
+    current_app.mail_queue.start()
+
+
+@users.errorhandler(HashingBusy)
+def hashing_busy(e):
+    response = jsonify({"message": "Too many requests, please retry shortly"})
+    response.headers["Retry-After"] = "1"
+    return response, 429
+
+
+@users.errorhandler(AvatarBusy)
+def avatar_busy(e):
+    response = jsonify({"message": "Too many image uploads, please retry shortly"})
+    response.headers["Retry-After"] = "5"
+    return response, 429
+
+
+@users.errorhandler(AvatarRejected)
+def avatar_rejected(e):
+    return jsonify({"message": e.message}), e.status
+
+
+@users.errorhandler(ResetTokenUsed)
+def reset_token_used(e):
+    return jsonify({"message": "Reset link has already been used"}), 400
+
+
+@users.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    # raised while parsing a body over MAX_CONTENT_LENGTH
+    return jsonify({"message": "Request body is too large"}), 413
+
+
+def serialize_avatar(user):
+    avatars = current_app.avatar_processor
+    data = {
+        "img_file": user.img_file,
+        "img_status": user.img_status,
+        "img_urls": avatars.urls(user),
+    }
+    if user.img_pending:
+        data["img_pending_urls"] = avatars.pending_urls(user.img_pending)
+    return data
+
+
 @users.route("/register", methods=["POST"])
 def register():
     data = request.get_json()
@@ -18,7 +77,7 @@ def register():
     if User.query.filter_by(email=email).first():
         return jsonify({"message": "Email already exists"}), 409
 
-    hashed_pw = bcrypt.generate_password_hash(password).decode("utf-8")
+    hashed_pw = current_app.password_hasher.generate_password_hash(password)
 
     user = User(
         username=username, email=email, img_file="default.jpg", password=hashed_pw
@@ -35,7 +94,9 @@ def login():
     password = data.get("password")
     user = User.query.filter_by(email=email).first()
 
-    if not user or not bcrypt.check_password_hash(user.password, password):
+    if not user or not current_app.password_hasher.check_password_hash(
+        user.password, password
+    ):
         return jsonify({"message": "Invalid credentials"}), 401
 
     access_token = create_access_token(identity=str(user.id))
@@ -50,24 +111,8 @@ def login():
 @users.route("/account", methods=["GET"])
 @jwt_required()
 def account_details():
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-
-    if not user:
-        return jsonify({"message": "User not found"}), 404
-
-    history_data = []
-    for entry in user.watch_history:
-        history_data.append(
-            {
-                "id": entry.id,
-                "content_id": entry.content_id,
-                "progress": entry.progress,
-                "content_name": entry.content.name,
-                "poster": generate_presigned_url(entry.content.poster),
-                "type": entry.content.type,
-            }
-        )
+    # resolved through app.user_cache by the JWT user loader
+    user = current_user
 
     return (
         jsonify(
@@ -75,14 +120,73 @@ def account_details():
                 "id": user.id,
                 "username": user.username,
                 "email": user.email,
-                "img_file": user.img_file,
-                "watch_history": history_data,
+                **serialize_avatar(user),
             }
         ),
         200,
     )
 
 
+@users.route("/account/history", methods=["GET"])
+@jwt_required()
+def account_history():
+    user_id = int(get_jwt_identity())
+    try:
+        limit, cursor = get_page_args(current_app.config["HISTORY_PAGE_SIZE"])
+        if cursor:
+            last_watched, last_id = cursor
+            if not isinstance(last_id, int):
+                raise ValueError
+            last_watched = datetime.fromisoformat(last_watched)
+    except (TypeError, ValueError):
+        return jsonify({"message": "Invalid limit or cursor"}), 400
+
+    query = (
+        db.session.query(
+            WatchHistory.id,
+            WatchHistory.content_id,
+            WatchHistory.progress,
+            WatchHistory.last_watched,
+            Content.name,
+            Content.poster,
+            Content.type,
+        )
+        .join(Content, WatchHistory.content_id == Content.id)
+        .filter(WatchHistory.user_id == user_id)
+    )
+    if cursor:
+        query = query.filter(
+            tuple_(WatchHistory.last_watched, WatchHistory.id)
+            < tuple_(last_watched, last_id)
+        )
+
+    entries = (
+        query.order_by(WatchHistory.last_watched.desc(), WatchHistory.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        next_cursor = encode_cursor(
+            entries[-1].last_watched.isoformat(), entries[-1].id
+        )
+
+    history_data = [
+        {
+            "id": entry.id,
+            "content_id": entry.content_id,
+            "progress": entry.progress,
+            "last_watched": entry.last_watched.isoformat(),
+            "content_name": entry.name,
+            "poster": generate_presigned_url(entry.poster),
+            "type": entry.type,
+        }
+        for entry in entries
+    ]
+    return jsonify({"watch_history": history_data, "next_cursor": next_cursor}), 200
+
+
 @users.route("/account", methods=["PUT"])
 @jwt_required()
 def edit_info():
@@ -92,8 +196,6 @@ def edit_info():
     if not user:
         return jsonify({"message": "User not found"}), 404
 
-    old_img_file = user.img_file
-
     new_username = request.form.get("username")
     new_email = request.form.get("email")
     new_img_file = request.files.get("img_file")
@@ -107,10 +209,11 @@ def edit_info():
         user.username = new_username
 
     if new_img_file:
-        new_img = savePicture(new_img_file, old_img_file)
-        user.img_file = new_img
-
-    db.session.commit()
+        # commits the other changes along with the pending avatar
+        current_app.avatar_processor.submit(user, new_img_file)
+    else:
+        db.session.commit()
+    current_app.user_cache.invalidate(user.id)
 
     return (
         jsonify(
@@ -120,11 +223,11 @@ def edit_info():
                     "id": user.id,
                     "username": user.username,
                     "email": user.email,
-                    "img_file": user.img_file,
+                    **serialize_avatar(user),
                 },
             }
         ),
-        200,
+        202 if user.img_pending else 200,
     )
 
 
@@ -143,19 +246,26 @@ def forgot_password():
 
 @users.route("/reset-password/<token>", methods=["POST"])
 def reset_password(token):
+    # raises ResetTokenUsed for a link that was already redeemed
     user = User.verify_reset_token(token)
 
     if not user:
         return jsonify({"message": "User not found"}), 404
 
+    expires_at = datetime.utcnow() + timedelta(
+        seconds=current_app.config["RESET_TOKEN_MAX_AGE"]
+    )
+    if not current_app.used_tokens.consume(token, expires_at):
+        # redeemed by a concurrent request since the check above
+        db.session.rollback()
+        raise ResetTokenUsed()
+
     data = request.get_json()
     new_password = data.get("password")
-    user.password = bcrypt.generate_password_hash(new_password).decode("utf-8")
-
-    db.session.commit()
+    user.password = current_app.password_hasher.generate_password_hash(new_password)
 
-    newToken = UsedTokens(usedToken=token)
-    db.session.add(newToken)
+    # the password change and the token redemption commit together
     db.session.commit()
+    current_app.user_cache.invalidate(user.id)
 
     return jsonify({"message": "Password updated successfully"}), 200
@@ -0,0 +1,155 @@
+import hashlib
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from VeePlay import db
+from VeePlay.models import UsedTokens
+
+
+class ResetTokenUsed(Exception):
+    pass
+
+
+def token_digest(token):
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over hex SHA-256 digests.
+
+    The digest is already uniformly distributed, so the ``hashes`` bit
+    positions are just consecutive 4-byte slices of it.
+    """
+
+    def __init__(self, bits, hashes=7):
+        self.bits = bits
+        self.hashes = min(hashes, 8)
+        self._array = bytearray((bits + 7) // 8)
+
+    def _positions(self, digest):
+        raw = bytes.fromhex(digest)
+        for i in range(self.hashes):
+            yield int.from_bytes(raw[i * 4 : i * 4 + 4], "big") % self.bits
+
+    def add(self, digest):
+        for pos in self._positions(digest):
+            self._array[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, digest):
+        return all(
+            self._array[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(digest)
+        )
+
+
+class UsedTokenStore:
+    """Revocation list for single-use password-reset tokens.
+
+    Tokens are stored as SHA-256 digests with the time the token itself
+    expires; ``consume`` inserts with ON CONFLICT DO NOTHING on the unique
+    digest, so a token can be redeemed once even across processes. Rows past
+    their expiry can never match a valid token again and are deleted in
+    batches of ``purge_batch`` every ``purge_interval`` seconds.
+
+    With ``bloom_bits`` > 0, ``is_used`` first consults a per-process Bloom
+    filter built from the unexpired rows and skips the query for tokens that
+    were definitely never redeemed here. Tokens redeemed by another process
+    may be missed by that pre-check, but ``consume`` still rejects them.
+    """
+
+    def __init__(self, app, bloom_bits=1 << 20, purge_batch=1000, purge_interval=3600):
+        self.app = app
+        self.bloom_bits = bloom_bits
+        self.purge_batch = purge_batch
+        self.purge_interval = purge_interval
+        self._bloom = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def is_used(self, token):
+        digest = token_digest(token)
+        bloom = self._get_bloom()
+        if bloom is not None and digest not in bloom:
+            return False
+        return (
+            db.session.query(UsedTokens.id).filter_by(digest=digest).first() is not None
+        )
+
+    def consume(self, token, expires_at):
+        """Record ``token`` as used; False if it already was.
+
+        Runs in the caller's transaction, which must commit it.
+        """
+        digest = token_digest(token)
+        dialect = db.session.get_bind(UsedTokens).dialect.name
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = (
+            insert(UsedTokens)
+            .values(digest=digest, expires_at=expires_at)
+            .on_conflict_do_nothing(index_elements=[UsedTokens.digest])
+            .returning(UsedTokens.id)
+        )
+        inserted = db.session.execute(stmt).first() is not None
+        bloom = self._get_bloom()
+        if bloom is not None:
+            bloom.add(digest)
+        self._start()
+        return inserted
+
+    def purge(self):
+        """Delete expired rows in batches and return how many were removed."""
+        removed = 0
+        while True:
+            batch = (
+                select(UsedTokens.id)
+                .where(UsedTokens.expires_at < datetime.utcnow())
+                .limit(self.purge_batch)
+                .scalar_subquery()
+            )
+            result = db.session.execute(
+                delete(UsedTokens).where(UsedTokens.id.in_(batch))
+            )
+            db.session.commit()
+            removed += result.rowcount
+            if result.rowcount < self.purge_batch:
+                break
+        if self.bloom_bits > 0:
+            # Bloom filters cannot forget, so start over from what is left
+            self._bloom = self._load_bloom()
+        return removed
+
+    def _get_bloom(self):
+        if self.bloom_bits <= 0:
+            return None
+        if self._bloom is None:
+            with self._lock:
+                if self._bloom is None:
+                    self._bloom = self._load_bloom()
+        return self._bloom
+
+    def _load_bloom(self):
+        bloom = BloomFilter(self.bloom_bits)
+        for (digest,) in db.session.query(UsedTokens.digest).filter(
+            UsedTokens.expires_at >= datetime.utcnow()
+        ):
+            bloom.add(digest)
+        return bloom
+
+    def _start(self):
+        # started lazily so each forked gunicorn worker gets its own thread
+        if self._thread is not None or self.purge_interval <= 0:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.purge_interval)
+            try:
+                with self.app.app_context():
+                    self.purge()
+            except Exception:
+                self.app.logger.exception("Purging used reset tokens failed")
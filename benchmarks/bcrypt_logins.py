@@ -0,0 +1,70 @@
+"""Measure how many password checks (logins) per second bcrypt sustains.
+
+Runs check_password_hash through VeePlay's PasswordHasher for each worker
+count and prints throughput overall and per core, e.g.
+
+    python benchmarks/bcrypt_logins.py --rounds 10 12 --workers 1 2 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from VeePlay.users.hashing import PasswordHasher, hash_password  # noqa: E402
+
+
+def run(rounds, workers, duration):
+    hasher = PasswordHasher(workers=workers, max_queue=workers, rounds=rounds)
+    pw_hash = hash_password("correct horse battery staple", rounds)
+    hasher.check_password_hash(pw_hash, "warm up the pool")
+
+    done = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        nonlocal done
+        while time.perf_counter() < deadline:
+            hasher.check_password_hash(pw_hash, "correct horse battery staple")
+            with lock:
+                done += 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(max(workers, 1))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    hasher.shutdown()
+
+    cores = max(min(workers, os.cpu_count() or 1), 1)
+    return {
+        "rounds": rounds,
+        "workers": workers,
+        "cores": cores,
+        "logins": done,
+        "logins_per_sec": round(done / elapsed, 2),
+        "logins_per_sec_per_core": round(done / elapsed / cores, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, nargs="+", default=[12])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    for rounds in args.rounds:
+        for workers in args.workers:
+            print(json.dumps(run(rounds, workers, args.duration)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Write a synthetic JSON-lines catalog manifest for `flask ingest-catalog`.
+
+    python benchmarks/make_catalog_manifest.py --shows 1000 --seasons 5 \
+        --episodes 20 --movies 1000 > /tmp/catalog.jsonl
+    time flask --app run.py ingest-catalog /tmp/catalog.jsonl
+
+The default sizes produce 100k episodes.
+"""
+
+import argparse
+import json
+import random
+import sys
+
+GENRES = ["action", "comedy", "drama", "horror", "romance", "sci-fi", "thriller"]
+
+
+def show(i, seasons, episodes, rng):
+    name = f"Show {i:06d}"
+    return {
+        "type": "S",
+        "name": name,
+        "description": f"Synthetic show number {i}.",
+        "poster": f"posters/show-{i}.jpg",
+        "trailer": f"trailers/show-{i}.mp4",
+        "genre": rng.sample(GENRES, 2),
+        "seasons": [
+            {
+                "season_number": s,
+                "episodes": [
+                    {
+                        "episode_no": e,
+                        "title": f"{name} S{s:02d}E{e:02d}",
+                        "description": f"Episode {e} of season {s}.",
+                        "s3_path": f"shows/{i}/s{s}/e{e}.mp4",
+                        "thumbnail_path": f"shows/{i}/s{s}/e{e}.jpg",
+                        "duration": rng.randint(1200, 3600),
+                    }
+                    for e in range(1, episodes + 1)
+                ],
+            }
+            for s in range(1, seasons + 1)
+        ],
+    }
+
+
+def movie(i, rng):
+    return {
+        "type": "M",
+        "name": f"Movie {i:06d}",
+        "description": f"Synthetic movie number {i}.",
+        "poster": f"posters/movie-{i}.jpg",
+        "trailer": f"trailers/movie-{i}.mp4",
+        "genre": rng.sample(GENRES, 2),
+        "video": {
+            "s3_path": f"movies/{i}.mp4",
+            "thumbnail_path": f"movies/{i}.jpg",
+            "duration": rng.randint(4800, 9000),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shows", type=int, default=1000)
+    parser.add_argument("--seasons", type=int, default=5)
+    parser.add_argument("--episodes", type=int, default=20)
+    parser.add_argument("--movies", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    out = sys.stdout
+    for i in range(args.shows):
+        out.write(json.dumps(show(i, args.seasons, args.episodes, rng)) + "\n")
+    for i in range(args.movies):
+        out.write(json.dumps(movie(i, rng)) + "\n")
+
+
+if __name__ == "__main__":
+    main()
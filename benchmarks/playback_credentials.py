@@ -0,0 +1,85 @@
+"""Time one playback credential per title against presigning every segment.
+
+Issues CloudFront signed cookies (with a throwaway RSA key) and HMAC query
+tokens for a title's path, with and without the grant cache, and compares
+them with presigning each segment of the title, e.g.
+
+    python benchmarks/playback_credentials.py --segments 600
+
+Needs `pip install cryptography`; no AWS account. What the credentials
+allow and deny is checked by tests/test_playback.py.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from botocore.credentials import Credentials  # noqa: E402
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import rsa  # noqa: E402
+from VeePlay.content.playback import (  # noqa: E402
+    CloudFrontCookieSigner,
+    PlaybackAuthorizer,
+    PlaybackTokenSigner,
+)
+from VeePlay.content.signing import SigV4Signer  # noqa: E402
+
+BASE_URL = "https://d111111abcdef8.cloudfront.net"
+MANIFEST = "shows/42/s1/e3/master.m3u8"
+
+
+def make_cloudfront_signer():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    return CloudFrontCookieSigner("K2JCJMDEHXQW5F", private_pem)
+
+
+def per_second(fn, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(i)
+    return round(repeat / (time.perf_counter() - start))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--segments", type=int, default=600, help="per title")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    cookie_signer = make_cloudfront_signer()
+    token_signer = PlaybackTokenSigner("bench-secret")
+    presigner = SigV4Signer(Credentials("bench", "bench"), "veeplay-media", "us-east-1")
+    segments = [f"shows/42/s1/e3/720p/segment_{i:05d}.ts" for i in range(args.segments)]
+    cookie_grants = PlaybackAuthorizer(cookie_signer, BASE_URL)
+    token_grants = PlaybackAuthorizer(token_signer, BASE_URL)
+    titles_per_second = {
+        "presign_every_segment": per_second(
+            lambda i: presigner.sign_many(segments, 3600), 20
+        ),
+        "cookie_uncached": per_second(
+            lambda i: cookie_signer.issue(f"{BASE_URL}/t/{i}/*", 2**31), args.repeat
+        ),
+        "token_uncached": per_second(
+            lambda i: token_signer.issue(f"{BASE_URL}/t/{i}/*", 2**31), args.repeat
+        ),
+        "cookie_cached": per_second(
+            lambda i: cookie_grants.grant(MANIFEST), args.repeat * 10
+        ),
+        "token_cached": per_second(
+            lambda i: token_grants.grant(MANIFEST), args.repeat * 10
+        ),
+    }
+    print(json.dumps({"titles_per_second": titles_per_second}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Time botocore against VeePlay's local SigV4 signer.
+
+Compares botocore, the local signer one key at a time, and sign_many,
+across threads, e.g.
+
+    python benchmarks/presign_signer.py --keys 20000 --threads 1 4 8
+
+That both produce the same URLs is checked by tests/test_signing.py.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import boto3  # noqa: E402
+from botocore.config import Config  # noqa: E402
+from VeePlay.content.signing import SigV4Signer  # noqa: E402
+
+
+def client_and_signer(bucket, region):
+    session = boto3.Session(
+        aws_access_key_id="AKIDEXAMPLE",
+        aws_secret_access_key="wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY",
+        region_name=region,
+    )
+    client = session.client("s3", config=Config(signature_version="s3v4"))
+    return client, SigV4Signer(session.get_credentials(), bucket, region)
+
+
+def timed(threads, keys, sign):
+    chunks = [keys[i::threads] for i in range(threads)]
+    workers = [threading.Thread(target=sign, args=(chunk,)) for chunk in chunks]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return len(keys) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=20000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--batch", type=int, default=50)
+    args = parser.parse_args()
+
+    results = {"urls_per_second": {}}
+
+    client, signer = client_and_signer("veeplay-media", "eu-west-1")
+    keys = [f"shows/{i}/s1/e{i % 20}.mp4" for i in range(args.keys)]
+
+    def with_botocore(chunk):
+        for key in chunk:
+            client.generate_presigned_url(
+                "get_object",
+                Params={"Bucket": "veeplay-media", "Key": key},
+                ExpiresIn=3600,
+            )
+
+    def one_by_one(chunk):
+        for key in chunk:
+            signer.sign(key, 3600)
+
+    def batched(chunk):
+        for i in range(0, len(chunk), args.batch):
+            signer.sign_many(chunk[i : i + args.batch], 3600)
+
+    for threads in args.threads:
+        results["urls_per_second"][threads] = {
+            name: round(timed(threads, keys, fn))
+            for name, fn in (
+                ("botocore", with_botocore),
+                ("local", one_by_one),
+                ("local_batch", batched),
+            )
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
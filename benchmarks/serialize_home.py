@@ -0,0 +1,190 @@
+"""Time /home serialization for a large in-memory catalog.
+
+Compares building dicts and encoding them with jsonify on every request
+(the old path) against the pre-encoded templates in
+VeePlay.content.serializers, cold and warm, e.g.
+
+    python benchmarks/serialize_home.py --items 10000 --repeat 5
+
+URLs are signed locally by VeePlay's SigV4 signer (no network), through
+the presigned URL cache as in production.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from botocore.credentials import Credentials  # noqa: E402
+from flask import Flask, jsonify  # noqa: E402
+from VeePlay.content.catalog import (  # noqa: E402
+    CatalogSnapshot,
+    ContentEntry,
+    EpisodeEntry,
+    SeasonEntry,
+    VideoEntry,
+)
+from VeePlay.content.serializers import (  # noqa: E402
+    content_view,
+    json_response,
+    render_list,
+)
+from VeePlay.content.signing import SigV4Signer  # noqa: E402
+from VeePlay.content.utils import (  # noqa: E402
+    PresignedUrlCache,
+    generate_presigned_url,
+)
+
+
+def make_catalog(items, episodes_per_show):
+    contents = []
+    next_id = 1
+    for i in range(items):
+        if i % 2:
+            video = VideoEntry(i, f"movies/{i}.mp4", f"movies/{i}.jpg", 5400)
+            contents.append(
+                ContentEntry(
+                    i,
+                    f"Movie {i}",
+                    "A movie.",
+                    "M",
+                    f"posters/{i}.jpg",
+                    f"trailers/{i}.mp4",
+                    ("drama",),
+                    (),
+                    video,
+                )
+            )
+            continue
+        episodes = []
+        for e in range(1, episodes_per_show + 1):
+            episodes.append(
+                EpisodeEntry(
+                    next_id,
+                    e,
+                    f"Episode {e}",
+                    "An episode.",
+                    f"shows/{i}/{e}.mp4",
+                    f"shows/{i}/{e}.jpg",
+                    1800,
+                    i,
+                )
+            )
+            next_id += 1
+        season = SeasonEntry(i, 1, i, tuple(episodes))
+        contents.append(
+            ContentEntry(
+                i,
+                f"Show {i}",
+                "A show.",
+                "S",
+                f"posters/{i}.jpg",
+                f"trailers/{i}.mp4",
+                ("comedy",),
+                (season,),
+                None,
+            )
+        )
+    return CatalogSnapshot(contents)
+
+
+def legacy(snapshot):
+    def episode(ep):
+        return {
+            "id": ep.id,
+            "title": ep.title,
+            "description": ep.description,
+            "episode_no": ep.episode_no,
+            "video": {
+                "s3_path": generate_presigned_url(ep.s3_path),
+                "thumbnail_url": generate_presigned_url(ep.thumbnail_path),
+                "duration": ep.duration,
+            },
+        }
+
+    def content(c):
+        return {
+            "id": c.id,
+            "name": c.name,
+            "description": c.description,
+            "type": c.type,
+            "poster": generate_presigned_url(c.poster),
+            "trailer": generate_presigned_url(c.trailer),
+            "genre": c.genre,
+            "seasons": [
+                {
+                    "id": s.id,
+                    "season_number": s.season_number,
+                    "episodes": [episode(e) for e in s.episodes],
+                }
+                for s in c.seasons
+            ],
+            "video": (
+                {
+                    "id": c.movie_video.id,
+                    "s3_path": generate_presigned_url(c.movie_video.s3_path),
+                    "thumbnail_url": c.movie_video.thumbnail_path,
+                    "duration": c.movie_video.duration,
+                }
+                if c.movie_video
+                else None
+            ),
+        }
+
+    items = [content(c) for c in snapshot.contents.entries]
+    return jsonify({"status": "success", "contents": items, "next_cursor": None})
+
+
+def templated(snapshot):
+    return json_response(
+        {
+            "status": "success",
+            "contents": render_list(snapshot, content_view, snapshot.contents.entries),
+            "next_cursor": None,
+        }
+    )
+
+
+def timed(fn, snapshot):
+    start = time.perf_counter()
+    body = fn(snapshot).get_data()
+    return time.perf_counter() - start, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--episodes", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config.update(PRESIGN_EXPIRES=3600)
+    app.s3_signer = SigV4Signer(Credentials("bench", "bench"), "bench", "us-east-1")
+    app.presign_cache = PresignedUrlCache(maxsize=10**7, ttl=1800)
+
+    with app.test_request_context("/home"):
+        snapshot = make_catalog(args.items, args.episodes)
+        # sign every URL once so both paths measure cache hits
+        legacy(snapshot)
+
+        results = {"items": args.items}
+        results["legacy_s"], size = min(
+            timed(legacy, snapshot) for _ in range(args.repeat)
+        )
+        results["template_cold_s"], _ = timed(templated, snapshot)
+        results["template_warm_s"], _ = min(
+            timed(templated, snapshot) for _ in range(args.repeat)
+        )
+        results["body_bytes"] = size
+        results = {
+            k: round(v, 4) if isinstance(v, float) else v for k, v in results.items()
+        }
+        print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
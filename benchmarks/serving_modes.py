@@ -0,0 +1,147 @@
+"""Compare requests per second and latency of running VeePlay servers.
+
+Start the sync (gunicorn) and async (uvicorn) modes on different ports,
+then point this at both with the same paths and concurrency levels, e.g.
+
+    python benchmarks/serving_modes.py \
+        --target sync=http://127.0.0.1:8000 --target async=http://127.0.0.1:8001 \
+        --path /genres --path "/filter?genre=drama" --concurrency 50 500 2000
+
+Every connection keeps one HTTP/1.1 keep-alive request in flight. Pass
+--token to send a JWT (needed for /continue-watching).
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif status not in (204, 304):
+        await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, headers.get("connection", "").lower() != "close"
+
+
+async def client(host, port, requests, deadline, latencies, errors):
+    reader = writer = None
+    i = 0
+    while time.perf_counter() < deadline:
+        if writer is None:
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+            except OSError:
+                errors["connect"] = errors.get("connect", 0) + 1
+                await asyncio.sleep(0.01)
+                continue
+        request = requests[i % len(requests)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            writer.write(request)
+            status, keep_alive = await read_response(reader)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            errors["io"] = errors.get("io", 0) + 1
+            writer.close()
+            writer = None
+            continue
+        latencies.append(time.perf_counter() - start)
+        if status >= 400:
+            errors[status] = errors.get(status, 0) + 1
+        if not keep_alive:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[index]
+
+
+async def run(name, base_url, paths, concurrency, duration, token):
+    url = urlsplit(base_url)
+    host, port = url.hostname, url.port or 80
+    extra = f"Authorization: Bearer {token}\r\n" if token else ""
+    requests = [
+        (
+            f"GET {path} HTTP/1.1\r\nHost: {url.netloc}\r\n"
+            f"Accept: application/json\r\n{extra}\r\n"
+        ).encode("latin-1")
+        for path in paths
+    ]
+
+    latencies = []
+    errors = {}
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(
+        *(
+            client(host, port, requests, deadline, latencies, errors)
+            for _ in range(concurrency)
+        )
+    )
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    def ms(seconds):
+        return round(seconds * 1000, 2) if seconds is not None else None
+
+    return {
+        "target": name,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+        "errors": {str(k): v for k, v in errors.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--target",
+        action="append",
+        required=True,
+        help="name=base_url, repeat for every server to compare",
+    )
+    parser.add_argument("--path", action="append", default=None)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 500])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--token", default=None)
+    args = parser.parse_args()
+
+    paths = args.path or ["/genres"]
+    for concurrency in args.concurrency:
+        for target in args.target:
+            name, _, base_url = target.partition("=")
+            result = asyncio.run(
+                run(name, base_url, paths, concurrency, args.duration, args.token)
+            )
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
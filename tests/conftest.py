@@ -0,0 +1,120 @@
+import os
+import tempfile
+
+# Config reads the environment on import, so this runs before VeePlay
+os.environ.update(
+    SQLALCHEMY_DATABASE_URI="sqlite:///"
+    + os.path.join(tempfile.mkdtemp(prefix="veeplay-tests-"), "test.sqlite"),
+    SECRET_KEY="test" * 8,
+    JWT_SECRET_KEY="test" * 8,
+    AWS_ACCESS_KEY_ID="AKIDEXAMPLE",
+    AWS_SECRET_ACCESS_KEY="wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY",
+    AWS_BUCKET_NAME="veeplay-test",
+    AWS_BUCKET_REGION="us-east-1",
+    BCRYPT_LOG_ROUNDS="4",
+    PASSWORD_HASH_WORKERS="0",
+    MAIL_QUEUE_WORKERS="0",
+    WATCH_FLUSH_INTERVAL="0",
+    AVATAR_WORKERS="0",
+    DB_REPLICA_URLS="",
+    PLAYBACK_AUTH="presign",
+    USER_CACHE_REDIS_URL="",
+)
+
+import pytest  # noqa: E402
+from flask_jwt_extended import create_access_token  # noqa: E402
+from VeePlay import create_app, db  # noqa: E402
+from VeePlay.models import Content, Episode, Season, User, Video  # noqa: E402
+from VeePlay.users.hashing import hash_password  # noqa: E402
+
+PASSWORD = "correct horse battery staple"
+
+
+@pytest.fixture
+def app():
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.app_context():
+        # only the primary; replica binds are set up by the routing tests
+        db.drop_all(bind_key=None)
+        db.create_all(bind_key=None)
+        yield app
+        db.session.remove()
+        db.drop_all(bind_key=None)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def add_show(app):
+    def add_show(name, seasons=1, episodes=2, description=None, genre=("drama",)):
+        show = Content(
+            name=name,
+            description=description or f"{name} description",
+            type="S",
+            poster=f"posters/{name}.jpg",
+            trailer=f"trailers/{name}.mp4",
+            genre=list(genre),
+        )
+        for s in range(1, seasons + 1):
+            season = Season(season_number=s, content=show)
+            for e in range(1, episodes + 1):
+                season.episodes.append(
+                    Episode(
+                        episode_no=e,
+                        title=f"{name} S{s}E{e}",
+                        description=f"Episode {e} of season {s}",
+                        s3_path=f"shows/{name}/s{s}/e{e}.mp4",
+                        thumbnail_path=f"shows/{name}/s{s}/e{e}.jpg",
+                        duration=1800,
+                    )
+                )
+        db.session.add(show)
+        db.session.commit()
+        return show
+
+    return add_show
+
+
+@pytest.fixture
+def add_movie(app):
+    def add_movie(name, description=None, genre=("drama",)):
+        movie = Content(
+            name=name,
+            description=description or f"{name} description",
+            type="M",
+            poster=f"posters/{name}.jpg",
+            trailer=f"trailers/{name}.mp4",
+            genre=list(genre),
+            movie_video=Video(
+                s3_path=f"movies/{name}.mp4",
+                thumbnail_path=f"movies/{name}.jpg",
+                duration=5400,
+            ),
+        )
+        db.session.add(movie)
+        db.session.commit()
+        return movie
+
+    return add_movie
+
+
+@pytest.fixture
+def user(app):
+    user = User(
+        username="viewer",
+        email="viewer@example.com",
+        password=hash_password(PASSWORD, app.config["BCRYPT_LOG_ROUNDS"]),
+    )
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def auth_headers(user):
+    token = create_access_token(identity=str(user.id))
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,86 @@
+import pytest
+
+pytest.importorskip("a2wsgi")
+pytest.importorskip("aiosqlite")
+pytest.importorskip("httpx")
+
+from sqlalchemy.engine import make_url  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from starlette.applications import Starlette  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+from starlette.testclient import TestClient  # noqa: E402
+from VeePlay import db  # noqa: E402
+from VeePlay.asgi import AsyncContent, _with_cors  # noqa: E402
+
+
+@pytest.fixture
+def asgi_client(app):
+    # the asyncpg engine from the lifespan, swapped for the test database
+    handlers = AsyncContent(app)
+    url = make_url(app.config["SQLALCHEMY_DATABASE_URI"])
+    handlers.engine = create_async_engine(url.set(drivername="sqlite+aiosqlite"))
+    asgi = Starlette(
+        routes=[
+            Route("/continue-watching", _with_cors(handlers.continue_watching)),
+        ]
+    )
+    with TestClient(asgi) as client:
+        yield client
+
+
+def test_continue_watching_matches_wsgi(
+    client, asgi_client, add_movie, user, auth_headers
+):
+    movie = add_movie("Arrival")
+    client.post(
+        "/watch_history",
+        json={"content_id": movie.id, "progress": 42},
+        headers=auth_headers,
+    )
+
+    wsgi = client.get("/continue-watching", headers=auth_headers)
+    asgi = asgi_client.get("/continue-watching", headers=auth_headers)
+
+    assert wsgi.status_code == asgi.status_code == 200
+    assert asgi.json() == wsgi.get_json()
+    assert asgi.json()[0]["progress"] == 42
+
+
+def test_deleted_users_token_is_rejected_by_both(
+    app, client, asgi_client, user, auth_headers
+):
+    db.session.delete(user)
+    db.session.commit()
+    app.user_cache.invalidate(user.id)
+
+    wsgi = client.get("/continue-watching", headers=auth_headers)
+    asgi = asgi_client.get("/continue-watching", headers=auth_headers)
+
+    assert wsgi.status_code == asgi.status_code == 401
+    assert asgi.json() == wsgi.get_json()
+
+
+def test_missing_token_is_rejected(asgi_client):
+    assert asgi_client.get("/continue-watching").status_code == 401
+
+
+@pytest.mark.parametrize(
+    "query, status",
+    [({"limit": 1, "cursor": "not a cursor"}, 200), ({"limit": "x"}, 400)],
+)
+def test_only_limit_is_read(
+    client, asgi_client, add_movie, user, auth_headers, query, status
+):
+    for name in ("Arrival", "Dune"):
+        client.post(
+            "/watch_history",
+            json={"content_id": add_movie(name).id, "progress": 1},
+            headers=auth_headers,
+        )
+
+    wsgi = client.get("/continue-watching", query_string=query, headers=auth_headers)
+    asgi = asgi_client.get("/continue-watching", params=query, headers=auth_headers)
+
+    assert wsgi.status_code == asgi.status_code == status
+    if status == 200:
+        assert len(asgi.json()) == len(wsgi.get_json()) == 1
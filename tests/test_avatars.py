@@ -0,0 +1,248 @@
+import io
+import os
+import struct
+import threading
+import zlib
+
+import pytest
+from PIL import Image
+from VeePlay import db
+from VeePlay.models import User
+from VeePlay.users.avatars import AvatarProcessor, LocalAvatarStore
+
+SIZES = (32, 64)
+
+
+def png(width=80, height=60):
+    buf = io.BytesIO()
+    Image.new("RGB", (width, height), "teal").save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def png_header(width, height):
+    """A PNG that declares ``width`` x ``height`` but holds no pixels."""
+
+    def chunk(kind, data):
+        return (
+            struct.pack(">I", len(data))
+            + kind
+            + data
+            + struct.pack(">I", zlib.crc32(kind + data))
+        )
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IEND", b"")
+
+
+class BlockingStore(LocalAvatarStore):
+    """Holds every ``put`` until ``release`` is set."""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.release = threading.Event()
+
+    def put(self, name, data, content_type):
+        assert self.release.wait(10)
+        super().put(name, data, content_type)
+
+
+@pytest.fixture
+def avatars(app, tmp_path):
+    """Swap in an AvatarProcessor that stores under ``tmp_path``."""
+
+    def make(store=None, **options):
+        options = {
+            "staging_dir": str(tmp_path / "staging"),
+            "sizes": SIZES,
+            "formats": ("webp", "jpeg"),
+            "workers": 0,
+            **options,
+        }
+        store = store or LocalAvatarStore(str(tmp_path / "avatars"))
+        app.avatar_processor = AvatarProcessor(app, store, **options)
+        return app.avatar_processor
+
+    yield make
+    release = getattr(app.avatar_processor.store, "release", None)
+    if release is not None:
+        release.set()  # don't leave a worker blocked if the test failed
+    app.avatar_processor.shutdown()
+
+
+def upload(client, auth_headers, data, **form):
+    return client.put(
+        "/account",
+        data={"img_file": (io.BytesIO(data), "avatar.png"), **form},
+        headers=auth_headers,
+        content_type="multipart/form-data",
+    )
+
+
+def stored(processor):
+    return sorted(os.listdir(processor.store.root))
+
+
+def staged(processor):
+    return os.listdir(processor.staging_dir)
+
+
+def test_upload_is_rendered_at_every_size_and_format(client, avatars, auth_headers):
+    processor = avatars()
+
+    response = upload(client, auth_headers, png())
+    body = response.get_json()["user"]
+
+    assert response.status_code == 200
+    assert body["img_status"] == "ready"
+    base = body["img_file"]
+    assert stored(processor) == sorted(
+        f"{base}_{size}.{ext}" for size in SIZES for ext in ("jpg", "webp")
+    )
+    with Image.open(os.path.join(processor.store.root, f"{base}_32.webp")) as img:
+        assert img.size == (32, 32)
+    assert staged(processor) == []
+
+
+def test_pending_upload_becomes_ready(client, avatars, user, auth_headers, tmp_path):
+    store = BlockingStore(str(tmp_path / "avatars"))
+    processor = avatars(store, workers=1)
+
+    response = upload(client, auth_headers, png())
+    pending = response.get_json()["user"]
+
+    assert response.status_code == 202
+    assert pending["img_status"] == "pending"
+    assert pending["img_file"] == "default.jpg"
+    assert set(pending["img_pending_urls"]) == {"32", "64"}
+
+    store.release.set()
+    processor.shutdown()
+    db.session.expire_all()  # the worker committed through its own session
+    account = client.get("/account", headers=auth_headers).get_json()
+
+    assert account["img_status"] == "ready"
+    assert account["img_file"] == db.session.get(User, user.id).img_file
+    assert "img_pending_urls" not in account
+    assert len(stored(processor)) == len(SIZES) * 2
+
+
+def test_undecodable_upload_is_marked_failed(client, avatars, user, auth_headers):
+    processor = avatars()
+    # a valid header, so it passes the request-time check, but no image data
+    response = upload(client, auth_headers, png_header(50, 50))
+    body = response.get_json()["user"]
+
+    assert response.status_code == 200
+    assert body["img_status"] == "failed"
+    assert body["img_file"] == "default.jpg"
+    assert db.session.get(User, user.id).img_pending is None
+    assert stored(processor) == []
+    assert staged(processor) == []
+
+
+def test_superseded_upload_does_not_overwrite_the_newer_one(
+    client, avatars, user, auth_headers, tmp_path
+):
+    store = BlockingStore(str(tmp_path / "avatars"))
+    processor = avatars(store, workers=1)
+
+    older = upload(client, auth_headers, png()).get_json()["user"]
+    newer = upload(client, auth_headers, png(40, 40)).get_json()["user"]
+    store.release.set()
+    processor.shutdown()
+
+    db.session.expire_all()
+    current = db.session.get(User, user.id)
+    newer_base = current.img_file
+    assert older["img_status"] == newer["img_status"] == "pending"
+    assert current.img_status == "ready"
+    assert current.img_pending is None
+    # only the newer upload's variants are left
+    assert {name.split("_")[0] for name in stored(processor)} == {newer_base}
+    assert len(stored(processor)) == len(SIZES) * 2
+
+
+def test_superseded_failure_leaves_the_newer_status(app, avatars, user, tmp_path):
+    processor = avatars()
+    path = tmp_path / "staging" / "old"
+    path.write_bytes(png_header(50, 50))
+    user.img_pending = "newer"
+    user.img_status = "pending"
+    db.session.commit()
+
+    processor._run(user.id, "older", str(path))
+
+    db.session.expire_all()
+    assert db.session.get(User, user.id).img_status == "pending"
+    assert db.session.get(User, user.id).img_pending == "newer"
+    assert not path.exists()
+
+
+def test_upload_over_max_bytes_is_rejected_while_staging(
+    client, avatars, user, auth_headers
+):
+    processor = avatars(max_bytes=1024)
+
+    response = upload(client, auth_headers, png(400, 400) + os.urandom(4096))
+
+    assert response.status_code == 413
+    assert response.get_json() == {"message": "Image file is too large"}
+    assert db.session.get(User, user.id).img_status == "ready"
+    assert staged(processor) == []
+
+
+def test_body_over_max_content_length_is_not_read(app, client, avatars, auth_headers):
+    processor = avatars()
+    too_big = app.config["AVATAR_MAX_BYTES"] + 128 * 1024
+
+    response = upload(client, auth_headers, os.urandom(too_big))
+
+    assert response.status_code == 413
+    assert response.get_json() == {"message": "Request body is too large"}
+    assert staged(processor) == []
+
+
+@pytest.mark.parametrize(
+    "data, max_pixels",
+    [
+        (png_header(20000, 20000), 40_000_000),  # Pillow's own bomb check
+        (png(80, 60), 80 * 60 - 1),
+    ],
+)
+def test_decompression_bombs_are_rejected(
+    client, avatars, user, auth_headers, data, max_pixels
+):
+    processor = avatars(max_pixels=max_pixels)
+
+    response = upload(client, auth_headers, data)
+
+    assert response.status_code == 413
+    assert response.get_json() == {"message": "Image dimensions are too large"}
+    assert db.session.get(User, user.id).img_pending is None
+    assert staged(processor) == []
+
+
+def test_non_images_are_rejected(client, avatars, auth_headers):
+    processor = avatars()
+
+    response = upload(client, auth_headers, b"not an image")
+
+    assert response.status_code == 400
+    assert staged(processor) == []
+
+
+def test_full_queue_gets_429(client, avatars, user, auth_headers, tmp_path):
+    store = BlockingStore(str(tmp_path / "avatars"))
+    processor = avatars(store, workers=1, max_queue=0)
+
+    first = upload(client, auth_headers, png())
+    busy = upload(client, auth_headers, png(40, 40))
+
+    assert first.status_code == 202
+    assert busy.status_code == 429
+    assert busy.headers["Retry-After"] == "5"
+    assert len(staged(processor)) == 1
+    store.release.set()
+    processor.shutdown()
+    db.session.expire_all()
+    assert db.session.get(User, user.id).img_status == "ready"
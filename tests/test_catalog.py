@@ -0,0 +1,79 @@
+import time
+
+from sqlalchemy import insert
+from VeePlay import db
+from VeePlay.content.catalog import bump_catalog_version, read_catalog_version
+from VeePlay.models import Content
+
+
+def names(snapshot):
+    return [c.name for c in snapshot.contents.entries]
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def write_from_another_process():
+    # straight through the engine, so none of this process's ORM events fire
+    with db.engine.begin() as conn:
+        conn.execute(
+            insert(Content).values(
+                name="Elsewhere",
+                description="",
+                type="M",
+                poster="p.jpg",
+                trailer="t.mp4",
+                genre=[],
+            )
+        )
+        bump_catalog_version(conn)
+
+
+def test_orm_catalog_writes_bump_the_version(app, add_movie):
+    assert read_catalog_version() == 0
+
+    add_movie("Arrival")
+    add_movie("Dune")
+
+    assert read_catalog_version() == 2
+
+
+def test_other_processes_writes_are_picked_up(app, add_movie):
+    add_movie("Arrival")
+    catalog = app.catalog
+    catalog.check_interval = 0.01
+    assert names(catalog.get()) == ["Arrival"]
+
+    write_from_another_process()
+    time.sleep(0.02)
+
+    wait_for(lambda: names(catalog.get()) == ["Arrival", "Elsewhere"])
+
+
+def test_unchanged_version_does_not_rebuild(app, add_movie):
+    add_movie("Arrival")
+    catalog = app.catalog
+    catalog.check_interval = 0.01
+    snapshot = catalog.get()
+    checked_at = catalog._checked_at
+    time.sleep(0.02)
+
+    catalog.get()
+    wait_for(lambda: catalog._checked_at > checked_at)
+
+    assert catalog.get() is snapshot
+
+
+def test_version_checks_can_be_disabled(app, add_movie):
+    catalog = app.catalog
+    catalog.check_interval = 0
+    snapshot = catalog.get()
+
+    write_from_another_process()
+    time.sleep(0.02)
+
+    assert catalog.get() is snapshot
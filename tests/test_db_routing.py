@@ -0,0 +1,94 @@
+import pytest
+from sqlalchemy import insert, select
+from VeePlay import create_app, db
+from VeePlay.config import Config
+from VeePlay.db_routing import use_primary
+from VeePlay.models import Content, User
+
+
+def content_row(name):
+    return {
+        "name": name,
+        "description": name,
+        "type": "M",
+        "poster": "p.jpg",
+        "trailer": "t.mp4",
+        "genre": [],
+    }
+
+
+def make_app(monkeypatch, replica_url):
+    monkeypatch.setattr(Config, "SQLALCHEMY_BINDS", {"replica0": replica_url})
+    monkeypatch.setattr(Config, "DB_REPLICA_CHECK_INTERVAL", 0)
+    return create_app()
+
+
+@pytest.fixture
+def routed(monkeypatch, tmp_path):
+    """App with one SQLite replica holding different content than the primary."""
+    app = make_app(monkeypatch, f"sqlite:///{tmp_path / 'replica.sqlite'}")
+    with app.app_context():
+        replica = db.engines["replica0"]
+        db.drop_all()
+        db.create_all()
+        db.metadata.create_all(replica)
+        with replica.begin() as conn:
+            conn.execute(insert(Content), [content_row("On replica")])
+        db.session.execute(insert(Content), [content_row("On primary")])
+        db.session.commit()
+        yield app, replica
+        db.session.remove()
+        db.drop_all()
+
+
+def names():
+    return db.session.scalars(select(Content.name)).all()
+
+
+def test_catalog_reads_go_to_the_replica(routed):
+    assert names() == ["On replica"]
+    assert [c.name for c in Content.query.all()] == ["On replica"]
+
+
+def test_other_tables_and_writes_use_the_primary(routed):
+    db.session.add(User(username="u", email="u@example.com", password="x"))
+    db.session.commit()
+
+    assert db.session.scalars(select(User.email)).all() == ["u@example.com"]
+    with use_primary(db.session):
+        assert names() == ["On primary"]
+
+
+def test_reads_after_a_write_see_it(routed):
+    db.session.add(Content(**content_row("Just added")))
+    db.session.flush()
+
+    assert sorted(names()) == ["Just added", "On primary"]
+    db.session.commit()
+    assert names() == ["On replica"]
+
+
+def test_marked_down_replica_is_skipped(routed):
+    app, replica = routed
+
+    app.replica_router.mark_down(replica)
+
+    assert names() == ["On primary"]
+    assert app.replica_router.stats() == {"replicas": 1, "healthy": 0}
+    app.replica_router.check()
+    assert names() == ["On replica"]
+
+
+def test_failed_replica_read_is_retried_on_the_primary(monkeypatch, tmp_path):
+    # the replica's directory does not exist, so connecting to it fails
+    app = make_app(monkeypatch, f"sqlite:///{tmp_path / 'missing' / 'replica.sqlite'}")
+    with app.app_context():
+        db.drop_all(bind_key=None)
+        db.create_all(bind_key=None)
+        db.session.execute(insert(Content), [content_row("On primary")])
+        db.session.commit()
+
+        assert names() == ["On primary"]
+        assert app.replica_router.stats()["healthy"] == 0
+        db.session.remove()
+        db.drop_all(bind_key=None)
@@ -0,0 +1,40 @@
+import pytest
+from VeePlay.users.hashing import PasswordHasher, check_password
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(workers=1, max_queue=1, rounds=4, timeout=30)
+    yield hasher
+    hasher.shutdown()
+
+
+def kill_workers(hasher):
+    for process in list(hasher._executor._processes.values()):
+        process.kill()
+        process.join()
+
+
+def test_hashes_on_the_pool(hasher):
+    pw_hash = hasher.generate_password_hash("secret")
+
+    assert check_password(pw_hash, "secret")
+    assert hasher.check_password_hash(pw_hash, "secret")
+    assert not hasher.check_password_hash(pw_hash, "wrong")
+
+
+def test_dead_worker_does_not_break_later_logins(hasher):
+    pw_hash = hasher.generate_password_hash("secret")
+    broken = hasher._executor
+    kill_workers(hasher)
+
+    assert hasher.check_password_hash(pw_hash, "secret")
+    assert hasher._executor is not broken
+    assert hasher.check_password_hash(pw_hash, "secret")
+
+
+def test_inline_when_no_workers():
+    hasher = PasswordHasher(workers=0, rounds=4)
+
+    assert hasher.check_password_hash(hasher.generate_password_hash("pw"), "pw")
+    assert hasher._executor is None
@@ -0,0 +1,301 @@
+import csv
+import io
+import json
+import os
+import re
+
+import pytest
+from VeePlay.content import ingest
+from VeePlay.content.ingest import (
+    UPSERT_SQL,
+    CatalogLoader,
+    ManifestError,
+    read_csv,
+    read_jsonl,
+)
+
+SHOW = {
+    "type": "S",
+    "name": "Dark",
+    "description": "Time travel",
+    "poster": "posters/dark.jpg",
+    "trailer": "trailers/dark.mp4",
+    "genre": ["Drama", " Sci-Fi "],
+    "seasons": [
+        {
+            "season_number": 1,
+            "episodes": [
+                {
+                    "episode_no": e,
+                    "title": f"E{e}",
+                    "description": f"Episode {e}",
+                    "s3_path": f"shows/dark/s1/e{e}.mp4",
+                    "thumbnail_path": f"shows/dark/s1/e{e}.jpg",
+                    "duration": 3000,
+                }
+                for e in (1, 2)
+            ],
+        },
+        {"season_number": 2, "episodes": []},
+    ],
+}
+MOVIE = {
+    "type": "M",
+    "name": "Arrival",
+    "description": "Heptapods",
+    "poster": "posters/arrival.jpg",
+    "trailer": "trailers/arrival.mp4",
+    "genre": "Sci-Fi|drama",
+    "video": {
+        "s3_path": "movies/arrival.mp4",
+        "thumbnail_path": "movies/arrival.jpg",
+        "duration": "6960",
+    },
+}
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        if self.connection.fail:
+            raise RuntimeError("upsert failed")
+        self.connection.executed.append(sql)
+
+    def copy_expert(self, sql, buf):
+        table = re.search(r"COPY (\w+)", sql).group(1)
+        self.connection.copies.append((table, list(csv.reader(buf))))
+
+
+class FakeConnection:
+    """Records what CatalogLoader sends to psycopg2."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.executed = []
+        self.copies = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def jsonl(*records):
+    return io.StringIO("".join(json.dumps(r) + "\n\n" for r in records))
+
+
+def test_loader_stages_contents_and_episodes():
+    connection = FakeConnection()
+    loader = CatalogLoader(connection, batch_size=100)
+
+    for line, record in read_jsonl(jsonl(SHOW, MOVIE)):
+        loader.add(line, record)
+    loader.flush()
+
+    contents, episodes = connection.copies
+    assert contents == (
+        "stage_content",
+        [
+            ["S", "Dark", "Time travel", "posters/dark.jpg", "trailers/dark.mp4"]
+            + ['{"drama","sci-fi"}', "", "", ""],
+            ["M", "Arrival", "Heptapods", "posters/arrival.jpg"]
+            + ["trailers/arrival.mp4", '{"sci-fi","drama"}']
+            + ["movies/arrival.mp4", "movies/arrival.jpg", "6960"],
+        ],
+    )
+    assert episodes == (
+        "stage_episode",
+        [
+            ["S", "Dark", "1", "1", "E1", "Episode 1"]
+            + ["shows/dark/s1/e1.mp4", "shows/dark/s1/e1.jpg", "3000"],
+            ["S", "Dark", "1", "2", "E2", "Episode 2"]
+            + ["shows/dark/s1/e2.mp4", "shows/dark/s1/e2.jpg", "3000"],
+            ["S", "Dark", "2", "", "", "", "", "", ""],
+        ],
+    )
+    assert connection.executed == [ingest.STAGING_DDL, UPSERT_SQL]
+    assert loader.report()["contents"] == 2
+    assert loader.report()["episodes"] == 2
+
+
+def test_loader_commits_in_batches():
+    connection = FakeConnection()
+    reports = []
+    loader = CatalogLoader(connection, batch_size=3, progress=reports.append)
+
+    for i in range(4):
+        loader.add(i + 1, {**SHOW, "name": f"Show {i}"})
+    loader.flush()
+
+    # each show is 1 content + 3 episode rows, so every add fills a batch
+    assert loader.batches == 4
+    assert connection.commits == 1 + 4
+    assert [r["contents"] for r in reports] == [1, 2, 3, 4]
+
+
+def test_failed_batch_is_rolled_back():
+    connection = FakeConnection()
+    loader = CatalogLoader(connection)
+    loader.add(1, MOVIE)
+    connection.fail = True
+
+    with pytest.raises(RuntimeError):
+        loader.flush()
+
+    assert connection.rollbacks == 1
+    assert loader.contents == 0
+
+
+@pytest.mark.parametrize(
+    "record, message",
+    [
+        ({**MOVIE, "type": "X"}, 'line 7: type must be "S" or "M"'),
+        ({**MOVIE, "poster": ""}, "line 7: content is missing poster"),
+        ({**MOVIE, "video": {"s3_path": "a.mp4"}}, "video is missing thumbnail_path"),
+        (
+            {**MOVIE, "video": {**MOVIE["video"], "duration": "long"}},
+            "video duration must be an integer",
+        ),
+        ({**SHOW, "seasons": [{"episodes": []}]}, "season is missing season_number"),
+        (
+            {**SHOW, "seasons": [{"season_number": 1, "episodes": [{"title": "x"}]}]},
+            "episode is missing description, s3_path",
+        ),
+    ],
+)
+def test_invalid_records_name_their_line(record, message):
+    loader = CatalogLoader(FakeConnection())
+
+    with pytest.raises(ManifestError, match=re.escape(message)):
+        loader.add(7, record)
+
+
+def test_invalid_json_names_its_line():
+    with pytest.raises(ManifestError, match="line 2: invalid JSON"):
+        list(read_jsonl(io.StringIO('{"type": "M"}\n{oops\n')))
+
+
+def test_csv_rows_are_folded_into_records():
+    manifest = io.StringIO(
+        "type,name,description,poster,trailer,genre,season_number,episode_no,"
+        "title,episode_description,s3_path,thumbnail_path,duration\n"
+        "S,Dark,Time travel,p.jpg,t.mp4,drama|sci-fi,1,1,E1,One,e1.mp4,e1.jpg,3000\n"
+        "S,Dark,Time travel,p.jpg,t.mp4,drama|sci-fi,1,2,E2,Two,e2.mp4,e2.jpg,3000\n"
+        "S,Dark,Time travel,p.jpg,t.mp4,drama|sci-fi,2,,,,,,\n"
+        "M,Arrival,Heptapods,a.jpg,a.mp4,sci-fi,,,,,arrival.mp4,arrival.jpg,6960\n"
+    )
+
+    (show_line, show), (movie_line, movie) = read_csv(manifest)
+
+    assert (show_line, movie_line) == (2, 5)
+    assert [s["season_number"] for s in show["seasons"]] == ["1", "2"]
+    assert [e["title"] for e in show["seasons"][0]["episodes"]] == ["E1", "E2"]
+    assert show["seasons"][1]["episodes"] == []
+    assert movie["video"] == {
+        "s3_path": "arrival.mp4",
+        "thumbnail_path": "arrival.jpg",
+        "duration": "6960",
+    }
+    assert movie["seasons"] == []
+
+
+def test_duplicates_in_a_batch_keep_the_last_row():
+    # DISTINCT ON keeps the first row of each group, so every one of them
+    # must sort the latest staged row first
+    for statement in UPSERT_SQL.split(";"):
+        match = re.search(r"DISTINCT ON \(([^)]*)\)", statement)
+        if match:
+            assert re.search(
+                rf"ORDER BY {re.escape(match.group(1))}, \w*\.?row_no DESC", statement
+            ), statement
+
+
+def test_batches_bump_the_catalog_version():
+    assert UPSERT_SQL.rstrip().endswith(
+        "ON CONFLICT (id) DO UPDATE SET version = catalog_version.version + 1;"
+    )
+
+
+@pytest.fixture
+def fake_loader(monkeypatch):
+    connections = []
+
+    def loader(connection, **kwargs):
+        connections.append(FakeConnection())
+        return CatalogLoader(connections[-1], **kwargs)
+
+    monkeypatch.setattr(ingest, "CatalogLoader", loader)
+    return connections
+
+
+def test_cli_reports_what_it_loaded(app, tmp_path, fake_loader):
+    manifest = tmp_path / "catalog.jsonl"
+    manifest.write_text(jsonl(SHOW, MOVIE).getvalue())
+
+    result = app.test_cli_runner().invoke(
+        args=["ingest-catalog", str(manifest), "--quiet"]
+    )
+
+    assert result.exit_code == 0, result.output
+    report = json.loads(result.output.strip().splitlines()[-1])
+    assert (report["contents"], report["episodes"]) == (2, 2)
+
+
+def test_cli_rejects_a_bad_manifest(app, tmp_path, fake_loader):
+    manifest = tmp_path / "catalog.csv"
+    manifest.write_text("type,name\nX,Broken\n")
+
+    result = app.test_cli_runner().invoke(args=["ingest-catalog", str(manifest)])
+
+    assert result.exit_code == 1
+    assert 'line 2: type must be "S" or "M"' in result.output
+
+
+@pytest.mark.skipif(
+    not os.getenv("TEST_POSTGRES_URL"),
+    reason="set TEST_POSTGRES_URL to a scratch Postgres database",
+)
+def test_ingest_against_postgres():
+    from sqlalchemy import create_engine, text
+    from VeePlay import db
+
+    engine = create_engine(os.environ["TEST_POSTGRES_URL"])
+    db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+    raw = engine.raw_connection()
+    try:
+        loader = CatalogLoader(raw.driver_connection)
+        for line, record in enumerate(
+            [MOVIE, {**MOVIE, "description": "Last one wins"}, SHOW], 1
+        ):
+            loader.add(line, record)
+        loader.flush()
+        loader.add(1, SHOW)
+        loader.flush()
+    finally:
+        raw.close()
+
+    with engine.connect() as conn:
+        assert (
+            conn.scalar(text("SELECT description FROM content WHERE type = 'M'"))
+            == "Last one wins"
+        )
+        assert conn.scalar(text("SELECT count(*) FROM episode")) == 2
+        assert conn.scalar(text("SELECT count(*) FROM season")) == 2
+        assert conn.scalar(text("SELECT version FROM catalog_version")) == 2
+    db.metadata.drop_all(engine)
+    engine.dispose()
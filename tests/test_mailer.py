@@ -0,0 +1,108 @@
+import socket
+import time
+from datetime import datetime
+
+import pytest
+from VeePlay import db, mail
+from VeePlay.models import MailOutbox
+from VeePlay.users.mailer import MailQueue
+
+controller = pytest.importorskip("aiosmtpd.controller")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Inbox:
+    def __init__(self):
+        self.messages = []
+        self.connections = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        # smtplib greets once per connection
+        self.connections += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def use_smtp(app, port):
+    app.config.update(
+        MAIL_SERVER="127.0.0.1",
+        MAIL_PORT=port,
+        MAIL_USE_SSL=False,
+        MAIL_USE_TLS=False,
+        MAIL_SUPPRESS_SEND=False,
+    )
+    mail.init_app(app)
+
+
+@pytest.fixture
+def inbox(app):
+    inbox = Inbox()
+    server = controller.Controller(inbox, hostname="127.0.0.1", port=free_port())
+    server.start()
+    use_smtp(app, server.port)
+    yield inbox
+    server.stop()
+
+
+def outbox():
+    db.session.expire_all()
+    return MailOutbox.query.order_by(MailOutbox.id).all()
+
+
+def test_forgot_password_sends_through_outbox(client, user, inbox):
+    response = client.post("/forgot-password", json={"email": user.email})
+
+    assert response.status_code == 200
+    [envelope] = inbox.messages
+    assert envelope.rcpt_tos == [user.email]
+    assert b"/reset-password/" in envelope.content
+    [row] = outbox()
+    assert (row.status, row.attempts) == ("sent", 1)
+    assert row.sent_at is not None
+
+
+def test_workers_reuse_one_connection(app, inbox):
+    queue = MailQueue(app, sender="noreply@example.com", workers=1, poll_interval=60)
+    for i in range(3):
+        queue.enqueue(f"user{i}@example.com", "Hi", "Body")
+
+    deadline = time.monotonic() + 10
+    while len(inbox.messages) < 3 and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    assert sorted(e.rcpt_tos[0] for e in inbox.messages) == [
+        f"user{i}@example.com" for i in range(3)
+    ]
+    assert inbox.connections == 1
+
+
+def test_failed_sends_back_off_then_give_up(app):
+    use_smtp(app, free_port())  # nothing listens there
+    queue = MailQueue(app, sender="noreply@example.com", workers=0, max_attempts=2)
+
+    outbox_id = queue.enqueue("user@example.com", "Hi", "Body")
+
+    [row] = outbox()
+    assert (row.status, row.attempts) == ("pending", 1)
+    assert row.next_attempt_at > datetime.utcnow()
+    assert row.last_error
+
+    # the retry is not due yet, so delivering again does nothing
+    queue._deliver(outbox_id, None)
+    assert outbox()[0].attempts == 1
+
+    row.next_attempt_at = datetime.utcnow()
+    db.session.commit()
+    queue._deliver(outbox_id, None)
+
+    [row] = outbox()
+    assert (row.status, row.attempts) == ("failed", 2)
@@ -0,0 +1,157 @@
+import logging
+import re
+import threading
+import time
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, text
+from VeePlay.main.metrics import Metrics, init_app
+
+SAMPLE = re.compile(r"^([a-z_]+)(\{.*\})? (\S+)$")
+
+
+def parse(body):
+    """``{name: kind}`` and ``[(name, labels, value)]`` from exposition text."""
+    kinds, samples = {}, []
+    for line in body.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            kinds[name] = kind
+        elif not line.startswith("#"):
+            name, labels, value = SAMPLE.match(line).groups()
+            samples.append((name, labels or "", float(value)))
+    return kinds, samples
+
+
+def test_render_exposition_format():
+    m = Metrics()
+    m.describe("t_requests_total", "counter", "Requests.")
+    m.describe("t_seconds", "histogram", "Latency.", (0.1, 1))
+    m.inc("t_requests_total", (("path", 'a"b\\c\n'),), 2)
+    for value in (0.05, 0.1, 0.5, 3):
+        m.observe("t_seconds", value, (("method", "GET"),))
+
+    assert m.render([("t_up", "Up.", (), True)]) == (
+        "# HELP t_requests_total Requests.\n"
+        "# TYPE t_requests_total counter\n"
+        't_requests_total{path="a\\"b\\\\c\\n"} 2\n'
+        "# HELP t_seconds Latency.\n"
+        "# TYPE t_seconds histogram\n"
+        't_seconds_bucket{method="GET",le="0.1"} 2\n'
+        't_seconds_bucket{method="GET",le="1"} 3\n'
+        't_seconds_bucket{method="GET",le="+Inf"} 4\n'
+        't_seconds_sum{method="GET"} 3.65\n'
+        't_seconds_count{method="GET"} 4\n'
+        "# HELP t_up Up.\n"
+        "# TYPE t_up gauge\n"
+        "t_up 1.0\n"
+    )
+
+
+def test_shards_from_every_thread_are_summed():
+    m = Metrics()
+    m.describe("t_total", "counter", "Total.")
+    m.describe("t_values", "histogram", "Values.", (1,))
+    start = threading.Barrier(8)
+
+    def work():
+        start.wait()
+        for _ in range(1000):
+            m.inc("t_total")
+            m.observe("t_values", 2)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    counters, histograms = m.collect()
+    assert len(m._shards) == 8
+    assert counters == {("t_total", ()): 8000}
+    assert histograms == {("t_values", ()): [[0, 8000], 16000.0, 8000]}
+
+
+def test_scrape_reports_requests_and_queries(client, add_show):
+    add_show("Dark")
+    for _ in range(3):
+        assert client.get("/home").status_code == 200
+    client.get("/no-such-page")
+
+    response = client.get("/metrics")
+    kinds, samples = parse(response.get_data(as_text=True))
+
+    assert response.mimetype == "text/plain"
+    assert kinds["veeplay_http_requests_total"] == "counter"
+    assert kinds["veeplay_http_request_duration_seconds"] == "histogram"
+    assert kinds["veeplay_cache_hits"] == "gauge"
+    values = {(name, labels): value for name, labels, value in samples}
+    home = 'endpoint="main.home",method="GET"'
+    requests = {
+        labels: value
+        for (name, labels), value in values.items()
+        if name == "veeplay_http_requests_total"
+    }
+    assert requests[f'{{{home},status="200"}}'] >= 3
+    assert requests['{endpoint="unmatched",method="GET",status="404"}'] >= 1
+
+    buckets = [
+        (labels, value)
+        for name, labels, value in samples
+        if name == "veeplay_http_request_duration_seconds_bucket"
+        and labels.startswith(f"{{{home},")
+    ]
+    assert buckets[-1][0].endswith('le="+Inf"}')
+    counts = [value for _, value in buckets]
+    assert counts == sorted(counts)
+    assert (
+        counts[-1]
+        == values["veeplay_http_request_duration_seconds_count", f"{{{home}}}"]
+    )
+    assert values["veeplay_db_queries_total", ""] > 0
+
+
+@pytest.fixture
+def timed_app():
+    """A bare app with one SQL statement and a 20 ms nap per request."""
+
+    def make(slow_request_ms):
+        app = Flask("timed")
+        engine = create_engine("sqlite://")
+        init_app(app, [engine], slow_request_ms=slow_request_ms)
+
+        @app.route("/nap")
+        def nap():
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 42"))
+            time.sleep(0.02)
+            return "ok"
+
+        return app
+
+    return make
+
+
+def test_slow_requests_are_logged_with_their_sql(timed_app, caplog):
+    app = timed_app(slow_request_ms=10)
+
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        app.test_client().get("/nap?x=1")
+
+    (record,) = caplog.records
+    assert record.getMessage().startswith("Slow request GET /nap?x=1: ")
+    assert ", 1 queries, " in record.getMessage()
+    assert "] SELECT 42" in record.getMessage()
+
+
+@pytest.mark.parametrize("slow_request_ms", [0, 10_000])
+def test_requests_under_the_threshold_are_not_logged(
+    timed_app, caplog, slow_request_ms
+):
+    app = timed_app(slow_request_ms)
+
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        app.test_client().get("/nap")
+
+    assert caplog.records == []
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+from VeePlay.content import serializers
+
+NDJSON = {"Accept": "application/x-ndjson"}
+
+
+@pytest.fixture
+def catalog(add_show, add_movie, monkeypatch):
+    # small chunks so records are split across several writes
+    monkeypatch.setattr(serializers, "STREAM_CHUNK", 512)
+    for i in range(6):
+        add_show(f"Show {i}", seasons=2, episodes=2, description=f"Line\n{i}")
+        add_movie(f"Movie {i}", description=f'"Quoted" {i}')
+
+
+def stream(client, url, **query):
+    response = client.get(url, headers=NDJSON, query_string=query)
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    body = response.get_data()
+    assert body.endswith(b"\n")
+    return [json.loads(line) for line in body.decode("utf-8").split("\n")[:-1]]
+
+
+@pytest.mark.parametrize(
+    "url, key",
+    [("/home", "contents"), ("/shows", "shows"), ("/movies", "movies")],
+)
+def test_lines_match_the_json_payload(client, catalog, url, key):
+    payload = client.get(url, query_string={"limit": 200}).get_json()
+
+    assert stream(client, url) == payload[key]
+    assert len(payload[key]) in (6, 12)
+
+
+def test_limit_and_cursor_select_a_slice(client, catalog):
+    first_page = client.get("/home", query_string={"limit": 5}).get_json()
+    rest = client.get(
+        "/home", query_string={"limit": 200, "cursor": first_page["next_cursor"]}
+    ).get_json()
+
+    assert stream(client, "/home", limit=5) == first_page["contents"]
+    assert stream(client, "/home", cursor=first_page["next_cursor"]) == rest["contents"]
+
+
+@pytest.mark.parametrize("query", [{"limit": "0"}, {"cursor": "!!!"}])
+def test_bad_args_get_a_json_400(client, catalog, query):
+    response = client.get("/movies", headers=NDJSON, query_string=query)
+
+    assert response.status_code == 400
+    assert response.mimetype == "application/json"
+    assert "message" in response.get_json()
@@ -0,0 +1,50 @@
+import pytest
+
+
+@pytest.fixture
+def catalog(add_show, add_movie):
+    # interleaved so neither listing has consecutive ids
+    for i in range(7):
+        add_show(f"Show {i}")
+        add_movie(f"Movie {i}")
+
+
+def walk(client, url, key, limit):
+    pages = []
+    cursor = None
+    while True:
+        query = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        body = client.get(url, query_string=query).get_json()
+        pages.append([entry["name"] for entry in body[key]])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("limit", [1, 3, 7, 50])
+@pytest.mark.parametrize(
+    "url, key, prefix", [("/shows", "shows", "Show"), ("/movies", "movies", "Movie")]
+)
+def test_pages_cover_every_title_once(client, catalog, url, key, prefix, limit):
+    pages = walk(client, url, key, limit)
+
+    assert [name for page in pages for name in page] == [
+        f"{prefix} {i}" for i in range(7)
+    ]
+    assert all(len(page) == limit for page in pages[:-1])
+    assert 0 < len(pages[-1]) <= limit
+
+
+@pytest.mark.parametrize("url", ["/shows", "/movies"])
+@pytest.mark.parametrize(
+    "query",
+    [
+        {"cursor": "!!!"},
+        {"cursor": "WyJhIl0"},
+        {"cursor": "e30"},
+        {"limit": "0"},
+        {"limit": "x"},
+    ],
+)
+def test_bad_page_args_are_rejected(client, catalog, url, query):
+    assert client.get(url, query_string=query).status_code == 400
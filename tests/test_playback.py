@@ -0,0 +1,255 @@
+import time
+
+import pytest
+from VeePlay.content.playback import (
+    PlaybackAuthorizer,
+    PlaybackTokenSigner,
+    resource_matches,
+    resource_path,
+)
+
+BASE_URL = "https://d111111abcdef8.cloudfront.net"
+MANIFEST = "shows/42/s1/e3/master.m3u8"
+SEGMENT = f"{BASE_URL}/shows/42/s1/e3/720p/segment_00017.ts"
+
+
+def flip(encoded):
+    return ("B" if encoded[0] == "A" else "A") + encoded[1:]
+
+
+@pytest.mark.parametrize(
+    "s3_path, expected",
+    [
+        ("shows/42/s1/e3/master.m3u8", "shows/42/s1/e3/*"),
+        ("movies/7/stream.MPD", "movies/7/*"),
+        ("movies/7.mp4", "movies/7.mp4"),
+        ("master.m3u8", "master.m3u8"),
+    ],
+)
+def test_resource_path(s3_path, expected):
+    assert resource_path(s3_path) == expected
+
+
+def test_wildcards_stay_inside_their_directory():
+    pattern = f"{BASE_URL}/shows/42/s1/e3/*"
+
+    assert resource_matches(pattern, SEGMENT)
+    assert not resource_matches(pattern, f"{BASE_URL}/shows/42/s1/e4/master.m3u8")
+    assert not resource_matches(pattern, f"{BASE_URL}/shows/42/s1/e3")
+    assert not resource_matches(f"{BASE_URL}/movies/7.mp4", f"{BASE_URL}/movies/70.mp4")
+
+
+@pytest.fixture
+def token_grant():
+    signer = PlaybackTokenSigner("test-secret")
+    return signer, PlaybackAuthorizer(signer, BASE_URL).grant(MANIFEST)
+
+
+def test_token_covers_the_title(token_grant):
+    signer, grant = token_grant
+    token = grant["credential"]["token"]
+
+    assert grant["manifest_url"] == f"{BASE_URL}/{MANIFEST}"
+    assert grant["credential"]["resource"] == f"{BASE_URL}/shows/42/s1/e3/*"
+    assert signer.verify(token, grant["manifest_url"])
+    assert signer.verify(token, SEGMENT)
+    assert signer.verify(token, f"{BASE_URL}/shows/42/s1/e3/1080p.m3u8")
+
+
+def test_token_rejects_other_paths(token_grant):
+    signer, grant = token_grant
+    token = grant["credential"]["token"]
+
+    assert not signer.verify(token, f"{BASE_URL}/shows/42/s1/e4/master.m3u8")
+    assert not signer.verify(token, "https://evil.example/shows/42/s1/e3/master.m3u8")
+
+
+def test_token_expires(token_grant):
+    signer, grant = token_grant
+    expires = grant["credential"]["expires"]
+
+    assert signer.verify(grant["credential"]["token"], SEGMENT, now=expires - 1)
+    assert not signer.verify(grant["credential"]["token"], SEGMENT, now=expires)
+
+
+def test_token_rejects_tampering(token_grant):
+    signer, grant = token_grant
+    policy, signature = grant["credential"]["token"].split(".")
+    # a policy for every title, re-using the signature of the narrow one
+    _, wide = PlaybackTokenSigner("other").issue(f"{BASE_URL}/*", 2**31).split(".")
+
+    assert not signer.verify(f"{policy}.{flip(signature)}", SEGMENT)
+    assert not signer.verify(f"{wide}.{signature}", SEGMENT)
+    assert not PlaybackTokenSigner("other").verify(f"{policy}.{signature}", SEGMENT)
+    assert not signer.verify("garbage", SEGMENT)
+
+
+def test_grants_are_cached_per_title():
+    authorizer = PlaybackAuthorizer(PlaybackTokenSigner("test-secret"), BASE_URL)
+
+    first = authorizer.grant(MANIFEST)
+    again = authorizer.grant("shows/42/s1/e3/master.m3u8")
+    other = authorizer.grant("shows/42/s1/e4/master.m3u8")
+
+    assert again["credential"] is first["credential"]
+    assert other["credential"] is not first["credential"]
+    assert authorizer.stats()["hits"] == 1
+
+
+class TestCloudFrontCookies:
+    @pytest.fixture
+    def keys(self):
+        pytest.importorskip("cryptography")
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
+        def pair():
+            key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+            private = key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            )
+            public = key.public_key().public_bytes(
+                serialization.Encoding.PEM,
+                serialization.PublicFormat.SubjectPublicKeyInfo,
+            )
+            return private, public
+
+        return pair(), pair()
+
+    @pytest.fixture
+    def grant(self, keys):
+        from VeePlay.content.playback import CloudFrontCookieSigner
+
+        (private, _), _ = keys
+        signer = CloudFrontCookieSigner("K2JCJMDEHXQW5F", private)
+        return PlaybackAuthorizer(signer, BASE_URL).grant(MANIFEST)
+
+    def verify(self, cookies, url, public_keys, now=None):
+        from VeePlay.content.playback import verify_cloudfront_cookies
+
+        return verify_cloudfront_cookies(cookies, url, public_keys, now)
+
+    def test_cookies_cover_the_title(self, keys, grant):
+        (_, public), _ = keys
+        cookies = grant["credential"]["cookies"]
+        public_keys = {"K2JCJMDEHXQW5F": public}
+
+        assert grant["credential"]["type"] == "cookie"
+        assert set(cookies) == {
+            "CloudFront-Policy",
+            "CloudFront-Signature",
+            "CloudFront-Key-Pair-Id",
+        }
+        assert self.verify(cookies, grant["manifest_url"], public_keys)
+        assert self.verify(cookies, SEGMENT, public_keys)
+        assert not self.verify(
+            cookies, f"{BASE_URL}/shows/42/s1/e4/master.m3u8", public_keys
+        )
+        assert not self.verify(
+            cookies, SEGMENT, public_keys, now=grant["credential"]["expires"]
+        )
+
+    def test_cookies_reject_tampering_and_unknown_keys(self, keys, grant):
+        (_, public), (_, other_public) = keys
+        cookies = grant["credential"]["cookies"]
+        tampered = {
+            **cookies,
+            "CloudFront-Signature": flip(cookies["CloudFront-Signature"]),
+        }
+
+        assert not self.verify(tampered, SEGMENT, {"K2JCJMDEHXQW5F": public})
+        assert not self.verify(cookies, SEGMENT, {"K2JCJMDEHXQW5F": other_public})
+        assert not self.verify(cookies, SEGMENT, {"OTHER": public})
+        assert not self.verify({}, SEGMENT, {"K2JCJMDEHXQW5F": public})
+
+
+def test_episode_route_returns_one_credential(app, client, add_show, auth_headers):
+    app.playback = PlaybackAuthorizer(PlaybackTokenSigner("test-secret"), BASE_URL)
+    add_show("Dark", seasons=1, episodes=2)
+
+    body = client.get("/shows/Dark/1/1", headers=auth_headers).get_json()
+
+    assert body["manifest_url"] == f"{BASE_URL}/shows/Dark/s1/e1.mp4"
+    assert body["credential"]["type"] == "query"
+    assert app.playback.signer.verify(
+        body["credential"]["token"], body["manifest_url"], time.time()
+    )
+    assert "s3_path" not in body
+
+
+@pytest.fixture
+def batch(client, auth_headers):
+    def batch(**body):
+        return client.post("/playback/urls", json=body, headers=auth_headers)
+
+    return batch
+
+
+def test_batch_returns_episodes_movies_and_whole_shows(batch, add_show, add_movie):
+    dark = add_show("Dark", seasons=2, episodes=2)
+    lost = add_show("Lost", seasons=1, episodes=3)
+    arrival = add_movie("Arrival")
+    single = lost.seasons[0].episodes[1]
+
+    response = batch(
+        episode_ids=[single.id, single.id], content_ids=[dark.id, arrival.id]
+    )
+    body = response.get_json()
+
+    assert response.status_code == 200
+    assert set(body["episodes"]) == {str(single.id)} | {
+        str(ep.id) for season in dark.seasons for ep in season.episodes
+    }
+    entry = body["episodes"][str(single.id)]
+    assert (entry["show_id"], entry["title"]) == (lost.id, "Lost S1E2")
+    assert "shows/Lost/s1/e2.mp4" in entry["s3_path"]
+    assert "movies/Arrival.mp4" in body["movies"][str(arrival.id)]["s3_path"]
+    assert body["missing"] == {"episode_ids": [], "content_ids": []}
+
+
+def test_batch_reports_unknown_ids(batch, add_show):
+    dark = add_show("Dark")
+
+    body = batch(episode_ids=[404], content_ids=[dark.id, 405]).get_json()
+
+    assert len(body["episodes"]) == 2
+    assert body["movies"] == {}
+    assert body["missing"] == {"episode_ids": [404], "content_ids": [405]}
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        # too long to be read at all, even though none of it is an id
+        {"episode_ids": ["x"] * 4},
+        {"episode_ids": [1, 2], "content_ids": [3, 4]},
+        # one show stands for its four episodes
+        {"content_ids": ["show"]},
+    ],
+)
+def test_batch_is_capped(app, batch, add_show, body):
+    app.config["PLAYBACK_BATCH_SIZE"] = 3
+    show = add_show("Dark", seasons=2, episodes=2)
+    body = {k: [show.id if i == "show" else i for i in v] for k, v in body.items()}
+
+    response = batch(**body)
+
+    assert response.status_code == 400
+    assert response.get_json() == {"message": "At most 3 videos per request"}
+
+
+@pytest.mark.parametrize(
+    "body",
+    [{"episode_ids": "1"}, {"episode_ids": [True]}, {"content_ids": [1, "2"]}],
+)
+def test_batch_rejects_bad_ids(batch, body):
+    response = batch(**body)
+
+    assert response.status_code == 400
+    assert "must be a list of integers" in response.get_json()["message"]
+
+
+def test_batch_needs_a_token(client):
+    assert client.post("/playback/urls", json={}).status_code == 401
@@ -0,0 +1,73 @@
+import pytest
+from VeePlay.content import utils
+from VeePlay.content.utils import PresignedUrlCache, generate_presigned_urls
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(utils, "time", clock)
+    return clock
+
+
+class CountingSigner:
+    def __init__(self):
+        self.calls = []
+
+    def sign_many(self, keys, expires_in):
+        self.calls.append(list(keys))
+        return [f"https://signed/{key}?n={len(self.calls)}" for key in keys]
+
+
+def test_entries_are_refreshed_before_the_url_expires(clock):
+    cache = PresignedUrlCache(maxsize=10, ttl=1800)
+    cache.set("a.mp4", "url", clock.now + 3600)
+
+    clock.now += 1799
+    assert cache.get("a.mp4") == ("url", 1000.0 + 3600)
+    clock.now += 1
+    assert cache.get("a.mp4") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(clock):
+    cache = PresignedUrlCache(maxsize=2, ttl=60)
+    cache.set("a", "url-a", clock.now + 120)
+    cache.set("b", "url-b", clock.now + 120)
+    cache.get("a")
+    cache.set("c", "url-c", clock.now + 120)
+
+    assert cache.get("b") is None
+    assert cache.get("a")[0] == "url-a"
+    assert cache.get("c")[0] == "url-c"
+    assert cache.stats()["size"] == 2
+
+
+def test_zero_size_or_ttl_disables_the_cache(clock):
+    for cache in (PresignedUrlCache(maxsize=0), PresignedUrlCache(ttl=0)):
+        cache.set("a", "url", clock.now + 60)
+        assert cache.get("a") is None
+
+
+def test_generate_presigned_urls_resigns_after_the_refresh_window(app, clock):
+    app.s3_signer = CountingSigner()
+    app.presign_cache = PresignedUrlCache(maxsize=10, ttl=1800)
+
+    with app.test_request_context():
+        first = generate_presigned_urls(["a.mp4", "b.mp4", "a.mp4"])
+        assert first[0] == first[2]
+        assert generate_presigned_urls(["b.mp4"]) == [first[1]]
+
+        clock.now += 1800
+        again = generate_presigned_urls(["a.mp4"])
+
+    assert again != [first[0]]
+    assert app.s3_signer.calls == [["a.mp4", "b.mp4"], ["a.mp4"]]
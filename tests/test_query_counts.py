@@ -0,0 +1,58 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from VeePlay import db
+
+# the catalog_version row, contents joined with movie videos, then one
+# IN-query for seasons and one for episodes (see content.queries.catalog_query)
+SNAPSHOT_QUERIES = 4
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+
+def seed(add_show, add_movie, titles):
+    for i in range(titles):
+        add_show(f"Show {i}", seasons=2, episodes=3)
+        add_movie(f"Movie {i}")
+
+
+@pytest.mark.parametrize("titles", [1, 10])
+def test_cold_home_loads_catalog_in_constant_queries(
+    app, client, add_show, add_movie, titles
+):
+    seed(add_show, add_movie, titles)
+
+    with count_queries() as statements:
+        response = client.get("/home?limit=200")
+
+    assert response.status_code == 200
+    assert len(response.get_json()["contents"]) == 2 * titles
+    assert len(statements) == SNAPSHOT_QUERIES
+
+
+@pytest.mark.parametrize(
+    "path", ["/home", "/shows/Show 3", "/movies/Movie 3", "/search?q=show"]
+)
+def test_warm_catalog_reads_run_no_queries(app, client, add_show, add_movie, path):
+    seed(add_show, add_movie, 5)
+    app.catalog.rebuild()
+    app.response_cache.clear()
+
+    with count_queries() as statements:
+        response = client.get(path)
+
+    assert response.status_code == 200
+    assert statements == []
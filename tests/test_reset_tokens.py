@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+from VeePlay import db
+from VeePlay.models import UsedTokens
+from VeePlay.users.hashing import check_password
+
+
+def test_reset_link_works_once(app, client, user):
+    token = user.get_reset_token()
+
+    first = client.post(f"/reset-password/{token}", json={"password": "new-secret"})
+    second = client.post(f"/reset-password/{token}", json={"password": "again"})
+
+    assert first.status_code == 200
+    assert second.status_code == 400
+    assert second.get_json() == {"message": "Reset link has already been used"}
+    db.session.refresh(user)
+    assert check_password(user.password, "new-secret")
+
+
+def test_concurrently_redeemed_link_gets_400(app, client, user):
+    token = user.get_reset_token()
+    password = user.password
+    # redeemed by another request after this one's is_used check
+    app.used_tokens.is_used = lambda token: False
+    app.used_tokens.consume(token, datetime.utcnow() + timedelta(minutes=15))
+    db.session.commit()
+
+    response = client.post(f"/reset-password/{token}", json={"password": "late"})
+
+    assert response.status_code == 400
+    db.session.refresh(user)
+    assert user.password == password
+
+
+def test_bad_or_expired_links_get_404(app, client, user):
+    token = user.get_reset_token()
+    app.config["RESET_TOKEN_MAX_AGE"] = -1
+
+    for link in (token, "not-a-token"):
+        response = client.post(f"/reset-password/{link}", json={"password": "x"})
+        assert response.status_code == 404
+
+
+def test_consume_rejects_replays(app):
+    store = app.used_tokens
+    expires_at = datetime.utcnow() + timedelta(minutes=15)
+
+    assert not store.is_used("token-a")
+    assert store.consume("token-a", expires_at)
+    db.session.commit()
+
+    assert store.is_used("token-a")
+    assert not store.consume("token-a", expires_at)
+    assert not store.is_used("token-b")
+
+
+def test_purge_removes_expired_digests(app):
+    store = app.used_tokens
+    store.purge_batch = 2
+    now = datetime.utcnow()
+    for i in range(5):
+        store.consume(f"old-{i}", now - timedelta(minutes=1))
+    store.consume("live", now + timedelta(minutes=15))
+    db.session.commit()
+
+    assert store.purge() == 5
+    assert db.session.query(UsedTokens).count() == 1
+    assert store.is_used("live")
+    assert not store.is_used("old-0")
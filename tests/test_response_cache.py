@@ -0,0 +1,74 @@
+import pytest
+
+
+@pytest.fixture
+def movie(add_movie):
+    return add_movie("Arrival")
+
+
+def test_etag_is_answered_with_304(client, movie):
+    first = client.get("/movies/Arrival")
+    again = client.get(
+        "/movies/Arrival", headers={"If-None-Match": first.headers["ETag"]}
+    )
+
+    assert first.status_code == 200
+    assert first.cache_control.public and first.cache_control.max_age > 0
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == first.headers["ETag"]
+    assert (
+        client.get("/movies/Arrival", headers={"If-None-Match": '"stale"'}).data
+        == first.data
+    )
+
+
+def test_accept_variants_share_one_entry(app, client, movie):
+    accepts = ["application/json", "*/*", "application/json, text/plain, */*", None]
+    bodies = {
+        client.get("/movies/Arrival", headers={"Accept": accept} if accept else {}).data
+        for accept in accepts
+    }
+
+    assert len(bodies) == 1
+    assert app.response_cache.stats()["size"] == 1
+    assert app.response_cache.stats()["hits"] == len(accepts) - 1
+
+
+def test_ndjson_is_not_served_from_the_json_entry(client, movie):
+    client.get("/movies")
+    streamed = client.get("/movies", headers={"Accept": "application/x-ndjson"})
+
+    assert streamed.mimetype == "application/x-ndjson"
+
+
+def test_new_catalog_snapshot_invalidates(app, client, add_movie, movie):
+    before = client.get("/movies")
+    add_movie("Dune")
+    app.catalog.rebuild()
+
+    after = client.get("/movies", headers={"If-None-Match": before.headers["ETag"]})
+
+    assert after.status_code == 200
+    assert after.headers["ETag"] != before.headers["ETag"]
+    assert [m["name"] for m in after.get_json()["movies"]] == ["Arrival", "Dune"]
+
+
+def test_entries_expire_before_their_presigned_urls(app, client, movie):
+    # URLs valid for 90s; bodies must go stale 60s (URL_EXPIRY_MARGIN) earlier
+    app.config["PRESIGN_EXPIRES"] = 90
+
+    response = client.get("/movies/Arrival")
+
+    assert response.cache_control.max_age <= 30
+    assert app.response_cache.stats()["size"] == 1
+
+
+def test_bodies_with_nearly_expired_urls_are_not_cached(app, client, movie):
+    app.config["PRESIGN_EXPIRES"] = 30
+
+    response = client.get("/movies/Arrival")
+
+    assert response.status_code == 200
+    assert response.cache_control.max_age == 0
+    assert app.response_cache.stats()["size"] == 0
@@ -0,0 +1,95 @@
+from collections import namedtuple
+
+from VeePlay.content.search import SearchIndex
+
+Doc = namedtuple("Doc", "id name description")
+
+
+def index(*names, descriptions=None):
+    descriptions = descriptions or {}
+    return SearchIndex(
+        Doc(i, name, descriptions.get(name, "")) for i, name in enumerate(names, 1)
+    )
+
+
+def names(entries):
+    return [e.name for e in entries]
+
+
+def test_exact_then_prefix_then_substring_then_fuzzy():
+    idx = index("Star Trek", "Lone Star", "Star", "Stardust", "Stair Story")
+
+    entries, has_more = idx.search("star")
+
+    assert names(entries[:4]) == ["Star", "Star Trek", "Stardust", "Lone Star"]
+    assert has_more is False
+
+
+def test_name_match_outranks_description_match():
+    idx = index(
+        "Night Shift",
+        "Dark Harbour",
+        descriptions={"Dark Harbour": "A night watchman on the docks."},
+    )
+
+    entries, _ = idx.search("night")
+
+    assert names(entries) == ["Night Shift", "Dark Harbour"]
+
+
+def test_typos_still_match():
+    idx = index("Breaking Bad", "The Crown", "Stranger Things")
+
+    assert names(idx.search("braking bad")[0])[0] == "Breaking Bad"
+    assert names(idx.search("strnger things")[0])[0] == "Stranger Things"
+
+
+def test_short_substrings_match_like_ilike():
+    idx = index("Lone Star", "Tango", "Dune")
+
+    entries, _ = idx.search("ta")
+
+    assert set(names(entries)) == {"Lone Star", "Tango"}
+
+
+def test_substring_outside_candidate_window_ranks_first():
+    # every filler shares more trigrams with the query than "Star Trek" does
+    fillers = [f"Tarot Trees {i}" for i in range(300)]
+    idx = index(*fillers, "Star Trek")
+
+    entries, _ = idx.search("tar tre", limit=5)
+
+    assert names(entries)[0] == "Star Trek"
+
+
+def test_unrelated_query_matches_nothing():
+    assert index("Star Trek", "Dune").search("zzzz") == ([], False)
+
+
+def test_search_pages_with_cursor(client, add_show, add_movie):
+    for i in range(5):
+        add_show(f"Mystery {i}")
+        add_movie(f"Mystery Film {i}")
+
+    seen = []
+    cursor = None
+    while True:
+        url = "/search?q=mystery&limit=3" + (f"&cursor={cursor}" if cursor else "")
+        body = client.get(url).get_json()
+        page = [c["name"] for c in body["shows"] + body["movies"]]
+        assert 0 < len(page) <= 3
+        seen += page
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(seen) == 10
+    assert set(seen) == {f"Mystery {i}" for i in range(5)} | {
+        f"Mystery Film {i}" for i in range(5)
+    }
+
+
+def test_search_rejects_bad_cursor(client, add_show):
+    add_show("Mystery")
+
+    assert client.get("/search?q=mystery&cursor=nope").status_code == 400
@@ -0,0 +1,132 @@
+import pytest
+from flask import jsonify
+from VeePlay.content.catalog import (
+    CatalogSnapshot,
+    ContentEntry,
+    EpisodeEntry,
+    SeasonEntry,
+    VideoEntry,
+)
+from VeePlay.content.serializers import (
+    _NONCE,
+    Template,
+    Url,
+    content_view,
+    episode_view,
+    json_response,
+    movie_view,
+    render_list,
+    show_view,
+    summary_view,
+)
+from VeePlay.content.utils import generate_presigned_url
+
+# quotes, backslashes, control characters, a NUL-wrapped string shaped like
+# a template placeholder, and HTML that must pass through untouched
+ASCII_TEXT = (
+    'He said "hi" \\ back\n\t\r\b\f \x00 \x1f </script> ' f"\x00{_NONCE}0\x00 {{}}[],:"
+)
+# plus DEL, line/paragraph separators and non-ASCII text, which jsonify only
+# leaves unescaped with ensure_ascii off
+UNICODE_TEXT = ASCII_TEXT + " \x7f \u2028 \u2029 ü 漢字 😀"
+
+
+def entities(text):
+    episode = EpisodeEntry(
+        7, 1, text, text, f"shows/{text}/e1.mp4", "shows/e1.jpg", 1800, 3
+    )
+    show = ContentEntry(
+        1,
+        text,
+        text,
+        "S",
+        "posters/show.jpg",
+        "",  # no trailer: rendered as null
+        (text, "drama"),
+        (SeasonEntry(3, 1, 1, (episode,)),),
+        None,
+    )
+    movie = ContentEntry(
+        2,
+        text,
+        text,
+        "M",
+        f"posters/{text}.jpg",
+        "trailers/movie.mp4",
+        (),
+        (),
+        VideoEntry(5, "movies/movie.mp4", text, 5400),
+    )
+    return show, movie, episode
+
+
+def presigned(value):
+    """``value`` with every Url replaced by its URL, as jsonify would see it."""
+    if isinstance(value, Url):
+        return generate_presigned_url(value.key) if value.key else None
+    if isinstance(value, dict):
+        return {k: presigned(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [presigned(v) for v in value]
+    return value
+
+
+def cases(text):
+    show, movie, episode = entities(text)
+    return [
+        (content_view, (show,)),
+        (content_view, (movie,)),
+        (summary_view, (movie,)),
+        (show_view, (show,)),
+        (movie_view, (movie,)),
+        (episode_view, (show, episode)),
+    ]
+
+
+@pytest.fixture
+def ctx(app):
+    with app.test_request_context():
+        yield app
+
+
+def jsonify_bytes(obj):
+    return jsonify(obj).get_data().rstrip(b"\n")
+
+
+@pytest.mark.parametrize("case", range(6))
+def test_templates_match_jsonify(ctx, case):
+    view, args = cases(ASCII_TEXT)[case]
+
+    assert Template(view(*args)).render() == jsonify_bytes(presigned(view(*args)))
+
+
+@pytest.mark.parametrize("case", range(6))
+def test_templates_match_jsonify_for_unicode(ctx, case):
+    # responses are UTF-8 rather than \\u-escaped, which is jsonify with
+    # ensure_ascii off
+    ctx.json.ensure_ascii = False
+    view, args = cases(UNICODE_TEXT)[case]
+
+    assert Template(view(*args)).render() == jsonify_bytes(presigned(view(*args)))
+
+
+def test_spliced_envelope_matches_jsonify(ctx):
+    ctx.json.ensure_ascii = False
+    show, movie, _ = entities(UNICODE_TEXT)
+    snapshot = CatalogSnapshot([show, movie])
+    body = {"contents": None, "next_cursor": UNICODE_TEXT, "status": "success"}
+
+    response = json_response(
+        {**body, "contents": render_list(snapshot, content_view, [show, movie])}
+    )
+    expected = {
+        **body,
+        "contents": [presigned(content_view(c)) for c in (show, movie)],
+    }
+
+    assert response.get_data() == jsonify_bytes(expected)
+    # rendered a second time from the snapshot's cached templates
+    again = json_response(
+        {**body, "contents": render_list(snapshot, content_view, [show, movie])}
+    )
+    assert again.get_data() == response.get_data()
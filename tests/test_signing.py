@@ -0,0 +1,78 @@
+import calendar
+import random
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import boto3
+import pytest
+from botocore.config import Config
+from VeePlay.content.signing import SigV4Signer, s3_base_url
+
+BUCKETS = ["veeplay-media", "veeplay.media", "abc", "a--b", "1-2.3"]
+REGIONS = ["us-east-1", "eu-west-1", "ap-south-1", None]
+TOKENS = [None, "FQoGZXIvYXdzE/token+value=="]
+KEY_CHARS = "abcXYZ019 -_.~/+=&?%#@!$'()*,;:üé漢"
+
+
+def client_and_signer(bucket, region, token=None):
+    session = boto3.Session(
+        aws_access_key_id="AKIDEXAMPLE",
+        aws_secret_access_key="wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY",
+        aws_session_token=token,
+        region_name=region,
+    )
+    client = session.client("s3", config=Config(signature_version="s3v4"))
+    return client, SigV4Signer(session.get_credentials(), bucket, region)
+
+
+def botocore_url(client, bucket, key, expires):
+    """botocore's URL and the second it was signed at."""
+    url = client.generate_presigned_url(
+        "get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=expires
+    )
+    amz_date = parse_qs(urlsplit(url).query)["X-Amz-Date"][0]
+    return url, calendar.timegm(time.strptime(amz_date, "%Y%m%dT%H%M%SZ"))
+
+
+@pytest.mark.parametrize("token", TOKENS)
+@pytest.mark.parametrize("region", REGIONS)
+@pytest.mark.parametrize("bucket", BUCKETS)
+def test_urls_match_botocore_byte_for_byte(bucket, region, token):
+    client, signer = client_and_signer(bucket, region, token)
+    rng = random.Random(f"{bucket}{region}{token}")
+    for _ in range(50):
+        key = "".join(rng.choice(KEY_CHARS) for _ in range(rng.randint(1, 40)))
+        expires = rng.choice([60, 3600, 604800])
+        expected, now = botocore_url(client, bucket, key, expires)
+
+        assert signer.sign(key, expires, now=now) == expected
+
+
+def test_sign_many_matches_sign():
+    _, signer = client_and_signer("veeplay-media", "eu-west-1")
+    keys = [f"shows/{i}/s1/e{i}.mp4" for i in range(20)]
+    now = time.time()
+
+    assert signer.sign_many(keys, 3600, now=now) == [
+        signer.sign(key, 3600, now=now) for key in keys
+    ]
+
+
+def test_signing_key_is_derived_once_per_day():
+    _, signer = client_and_signer("veeplay-media", "eu-west-1")
+    day = calendar.timegm((2026, 10, 17, 0, 0, 0))
+
+    signer.sign("a.mp4", 60, now=day + 10)
+    key = signer._signing_key
+    signer.sign("b.mp4", 60, now=day + 3600)
+    assert signer._signing_key is key
+    signer.sign("c.mp4", 60, now=day + 86400)
+    assert signer._signing_key is not key
+
+
+@pytest.mark.parametrize(
+    "bucket", ["ab", "Upper", "under_score", "192.168.1.1", "-dash", "", None]
+)
+def test_legacy_bucket_names_are_left_to_boto3(bucket):
+    with pytest.raises(ValueError):
+        s3_base_url(bucket, "us-east-1")
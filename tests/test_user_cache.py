@@ -0,0 +1,150 @@
+import sys
+
+import pytest
+from VeePlay import db
+from VeePlay.models import User
+from VeePlay.users import identity
+from VeePlay.users.identity import UserCache, UserRecord
+
+
+class DictBackend:
+    """Stands in for RedisUserBackend; shared by every cache given it."""
+
+    def __init__(self):
+        self.records = {}
+
+    def get(self, user_id):
+        return self.records.get(user_id)
+
+    def set(self, record):
+        self.records[record.id] = record
+
+    def delete(self, user_id):
+        self.records.pop(user_id, None)
+
+
+class DownBackend:
+    def __getattr__(self, name):
+        def unavailable(*args):
+            raise ConnectionError("redis is down")
+
+        return unavailable
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_lookups_are_cached_and_counted(app, user):
+    cache = UserCache(maxsize=10, ttl=30)
+
+    first = cache.get(user.id)
+    again = cache.get(str(user.id))
+
+    assert first == UserRecord.from_user(user)
+    assert again is first
+    assert cache.stats() == {
+        "size": 1,
+        "maxsize": 10,
+        "hits": 1,
+        "shared_hits": 0,
+        "misses": 1,
+        "hit_rate": 0.5,
+    }
+
+
+def test_entries_expire_after_ttl(app, user, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(identity, "time", clock)
+    cache = UserCache(maxsize=10, ttl=30)
+    cache.get(user.id)
+
+    clock.now += 30
+    cache.get(user.id)
+
+    assert cache.stats()["misses"] == 2
+
+
+def test_missing_users_are_not_cached(app):
+    cache = UserCache()
+
+    assert cache.get(999) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_profile_change_is_seen_at_once(client, user, auth_headers):
+    client.get("/account", headers=auth_headers)
+
+    client.put("/account", data={"username": "renamed"}, headers=auth_headers)
+    account = client.get("/account", headers=auth_headers).get_json()
+
+    assert account["username"] == "renamed"
+
+
+def test_password_reset_invalidates(app, client, user, auth_headers):
+    client.get("/account", headers=auth_headers)
+    misses = app.user_cache.stats()["misses"]
+
+    client.post(
+        f"/reset-password/{user.get_reset_token()}", json={"password": "new-secret"}
+    )
+    client.get("/account", headers=auth_headers)
+
+    assert app.user_cache.stats()["misses"] == misses + 1
+
+
+def test_deleted_user_gets_401(app, client, user, auth_headers):
+    client.get("/account", headers=auth_headers)
+    db.session.delete(user)
+    db.session.commit()
+    app.user_cache.invalidate(user.id)
+
+    response = client.get("/account", headers=auth_headers)
+
+    assert response.status_code == 401
+
+
+def test_shared_backend_serves_other_processes(app, user):
+    backend = DictBackend()
+    here, there = UserCache(backend=backend), UserCache(backend=backend)
+
+    here.get(user.id)
+    assert there.get(user.id) == here.get(user.id)
+    assert there.stats()["shared_hits"] == 1
+
+    here.invalidate(user.id)
+    assert backend.records == {}
+
+
+def test_unreachable_backend_falls_back_to_the_database(app, user):
+    cache = UserCache(backend=DownBackend())
+
+    assert cache.get(user.id) == UserRecord.from_user(user)
+    cache.invalidate(user.id)
+    assert cache.get(user.id) == UserRecord.from_user(user)
+    assert cache.stats()["misses"] == 2
+
+
+def test_redis_backend_needs_redis(monkeypatch):
+    monkeypatch.setitem(sys.modules, "redis", None)
+
+    with pytest.raises(RuntimeError):
+        identity.RedisUserBackend("redis://localhost:6379/0")
+
+
+def test_least_recently_used_users_are_evicted(app, user):
+    other = User(username="other", email="other@example.com", password="x")
+    db.session.add(other)
+    db.session.commit()
+    cache = UserCache(maxsize=1)
+
+    cache.get(user.id)
+    cache.get(other.id)
+
+    assert cache.stats()["size"] == 1
+    cache.get(user.id)
+    assert cache.stats()["misses"] == 3
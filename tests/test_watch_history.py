@@ -0,0 +1,105 @@
+import pytest
+from sqlalchemy import event
+from VeePlay import db
+from VeePlay.content.watch import WatchProgressBuffer
+from VeePlay.models import WatchHistory
+
+
+class ManualBuffer(WatchProgressBuffer):
+    """Only flushes when told to."""
+
+    def _start(self):
+        pass
+
+
+@pytest.fixture
+def foreign_keys(app):
+    # SQLite only enforces them when asked, per connection
+    def enable(dbapi_connection, _):
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+    event.listen(db.engine, "connect", enable)
+    db.engine.dispose()
+    yield
+    event.remove(db.engine, "connect", enable)
+    db.session.remove()
+    db.engine.dispose()
+
+
+def progress(user):
+    return db.session.execute(
+        db.select(WatchHistory.content_id, WatchHistory.progress).where(
+            WatchHistory.user_id == user.id
+        )
+    ).all()
+
+
+def test_ticks_upsert_one_row_per_title(client, add_movie, user, auth_headers):
+    movie = add_movie("Arrival")
+
+    for seconds in (10, 20, 30):
+        response = client.post(
+            "/watch_history",
+            json={"content_id": movie.id, "progress": seconds},
+            headers=auth_headers,
+        )
+        assert response.status_code == 200
+
+    assert progress(user) == [(movie.id, 30)]
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"data": "null", "content_type": "application/json"},
+        {"data": "not json", "content_type": "application/json"},
+        {"json": {"content_id": "1", "progress": 5}},
+        {"json": {"content_id": True, "progress": 5}},
+        {"json": {"content_id": 1, "progress": False}},
+        {"json": {"progress": 5}},
+    ],
+)
+def test_bad_bodies_get_400(client, user, auth_headers, kwargs):
+    response = client.post("/watch_history", headers=auth_headers, **kwargs)
+
+    assert response.status_code == 400
+    assert progress(user) == []
+
+
+def test_unknown_content_gets_404(client, user, auth_headers):
+    response = client.post(
+        "/watch_history",
+        json={"content_id": 999, "progress": 5},
+        headers=auth_headers,
+    )
+
+    assert response.status_code == 404
+
+
+def test_a_bad_row_does_not_block_the_batch(app, add_movie, user, foreign_keys):
+    kept = add_movie("Arrival")
+    buffer = ManualBuffer(app, interval=60, max_attempts=2)
+
+    buffer.add(user.id, kept.id, 30)
+    buffer.add(user.id, 999, 10)  # content deleted after the tick was accepted
+
+    assert buffer.flush() == 1
+    assert progress(user) == [(kept.id, 30)]
+
+    buffer.add(user.id, kept.id, 40)
+    assert buffer.flush() == 1
+    assert progress(user) == [(kept.id, 40)]
+    # the bad row has now failed max_attempts flushes and is gone
+    assert buffer.flush() == 0
+
+
+def test_failed_rows_are_retried_until_they_succeed(app, add_movie, user, foreign_keys):
+    movie = add_movie("Arrival")
+    buffer = ManualBuffer(app, interval=60, max_attempts=3)
+    buffer.add(user.id, movie.id + 1, 10)
+
+    assert buffer.flush() == 0
+    add_movie("Dune")  # the content id the tick refers to now exists
+
+    assert buffer.flush() == 1
+    assert progress(user) == [(movie.id + 1, 10)]